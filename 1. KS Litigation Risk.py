@@ -7,19 +7,19 @@ Load Libraries
 import numpy as np
 import pandas as pd
 import uuid
-import sys
 
 if uuid.getnode() == 190070690681122:
-	sys.path.append('/Users/antonis/dropbox/python/custom modules')
-	import Antonis_Modules as ak
 	wrds_loc = '/Users/Antonis/Dropbox/Projects/WRDS data/zip files/202106'
 	main_loc = '/Users/Antonis/Dropbox/Projects/Litigation Reputation'
 elif uuid.getnode() in [118933448243835, 113780617493, 963350075783]:
-	sys.path.append('E:/dropbox/python/custom modules')
-	import Antonis_Modules as ak
 	wrds_loc = 'G:/WRDS data/zip files/202106'
 	main_loc = 'E:/Dropbox/Projects/Litigation Reputation'
 
+from litrep import ksfit
+from litrep.industries import classify, dummies
+from litrep.ks import KS_COEFS, MonthlyReturns, ks_index, logistic
+from litrep.panels import expand, shift
+
 
 #%%
 '''
@@ -44,10 +44,7 @@ comp_df = (pd
 			)
 
 # Lag Data
-comp_df = (comp_df
-			.merge(comp_df[['gvkey','fyear','at','sale','datadate']].assign(fyear = lambda x: x['fyear'] + 1), 
-					on = ['gvkey', 'fyear'], how='left', suffixes = ['', '_py'])       
-			)
+comp_df = shift(comp_df, ['at', 'sale', 'datadate'], 'gvkey', 'fyear', 1, '_py')
 			
 #%%
 '''
@@ -77,8 +74,7 @@ linktable_df = (pd
 				)
 
 # Create a timeseries and merge
-linktable_ts_df = (ak
-                   .create_ts_v2(linktable_df, 'linkdt', 'linkenddt', 'M')
+linktable_ts_df = (expand(linktable_df, 'linkdt', 'linkenddt', 'M')
                    .rename(columns={'date': 'datadate'})
                    )
 
@@ -108,8 +104,7 @@ msenames_df = (pd
 				.drop(['start_temp'], axis = 1)
 				)
 
-msenames_ts_df = (ak
-                  .create_ts_v2(msenames_df, 'namedt', 'nameendt', 'M')
+msenames_ts_df = (expand(msenames_df, 'namedt', 'nameendt', 'M')
                   .rename(columns={'date': 'datadate'})
                   )
 			
@@ -124,21 +119,11 @@ Create vars
 '''
 
 comp_df = (comp_df
-			.assign(# KS Industries
-					FPS = lambda x: np.where( ( (2833<=x["siccd"]) & (x["siccd"]<=2836) ) |
-											  ( (8731<=x["siccd"]) & (x["siccd"]<=8734) ) |
-											  ( (3570<=x["siccd"]) & (x["siccd"]<=3577) ) |
-											  ( (7370<=x["siccd"]) & (x["siccd"]<=7374) ) |
-											  ( (3600<=x["siccd"]) & (x["siccd"]<=3674) ) |
-											  ( (5200<=x["siccd"]) & (x["siccd"]<=5961) ) ,
-											  1,0),
-					# BS Industries
-                    Biotech=lambda x: np.where( (2833 <= x['siccd']) & (x['siccd'] <= 2836), 1, 0),
-                    CompHrdw=lambda x: np.where( (3570 <= x['siccd']) & (x['siccd'] <= 3577), 1, 0),
-                    Electronics=lambda x: np.where( (3600 <= x['siccd']) & (x['siccd'] <= 3674), 1, 0),
-                    Retail=lambda x: np.where( (5200 <= x['siccd']) & (x['siccd'] <= 5961), 1, 0),
-                    CompSoft=lambda x: np.where( (7371 <= x['siccd']) & (x['siccd'] <= 7379), 1, 0),
-					sales_gr = lambda x: (x['sale'] - x['sale_py']) / x['at_py'],
+			# KS Industries
+			.assign(FPS = lambda x: classify(x['siccd'], 'fps'))
+			# BS Industries
+			.pipe(lambda x: pd.concat([x, dummies(x['siccd'], 'bhagat').set_index(x.index)], axis=1))
+			.assign(sales_gr = lambda x: (x['sale'] - x['sale_py']) / x['at_py'],
 					ln_at = lambda x: np.log(x['at']) )
 			.drop(['siccd', 'sale', 'sale_py', 'at_py', 'at'], axis = 1)
 			)
@@ -154,89 +139,56 @@ msf_df = (pd
 		  .read_parquet('{}/crsp_msf_20210621.gzip'.format(wrds_loc),
 						columns=['permno', 'ret', 'date', 'vol','cfacshr','shrout', 'prc'])
 		  .assign(date=lambda x: pd.to_datetime(x['date']))
-		  .assign(date=lambda x: x['date'] + pd.offsets.MonthEnd(0)) # Date refers to last trading day, not month date
-          .assign(dollar_turnover=lambda x: x['prc'].abs() * x['vol'])
 		  )
 msi_df = (pd
 		  .read_parquet('{}/crsp_msi_20210621.gzip'.format(wrds_loc), columns=['date', 'vwretd'])
 		  .assign(date=lambda x: pd.to_datetime(x['date']))
-		  .assign(date=lambda x: x['date'] + pd.offsets.MonthEnd(0))
 		  )
 
-# Temp compustat timeseries
-temp_df = (comp_df
-			.filter(['gvkey', 'fyear', 'permno', 'datadate_py', 'datadate'])
-			# Offset day by one so it start in the next year
-			.assign(datadate_py = lambda x: x['datadate_py'] + pd.offsets.DateOffset(1))
-			.dropna()
-		  )
-temp_ts_df = ak.create_ts_v2(temp_df, 'datadate_py', 'datadate', 'M')
+# Running sums per permno (dates are matched by month - they refer to the last trading day, not month end)
+returns = MonthlyReturns(msf_df, msi_df)
+del msf_df, msi_df
 
-# Bring in returns
-temp_ts_df = (temp_ts_df
-				.merge(msf_df, on=['permno', 'date'], how='inner')
-				.merge(msi_df, on=['date'], how='left')
-			)
+# car, bhar, std_ret, ret_skewness, turnover and dollar_turnover_sc over the months of each fiscal year (starting the day
+# after the prior year end), with volume adjusted to the shares of the first month with cfacshr and shrout
+returns_df = returns.window(comp_df['permno'], comp_df['datadate_py'] + pd.offsets.DateOffset(1), comp_df['datadate'])
 
-shr_temp_df = (temp_ts_df
-			   .filter(['gvkey', 'fyear', 'date', 'cfacshr', 'shrout'])
-               .sort_values(by=['gvkey','fyear', 'date'])
-               .dropna()
-               .drop_duplicates(subset=['gvkey', 'fyear'], keep='first')
-               .rename(columns={'cfacshr': 'startingcfacshr',
-                                'shrout': 'startingshrout'})
-               )
-
-# Calculate variables of interest - bhar, car, std_ret, turnover
-temp_ts_df = (temp_ts_df
-				.assign(ret_adj = lambda x: x['ret'] - x['vwretd'],
-						log_ret = lambda x: np.log(1 + x['ret']),
-						log_vwretd = lambda x: np.log(1 + x['vwretd']))
-				# Beginning of period values for adjusting shares
-				.merge(shr_temp_df, on=['gvkey', 'fyear'], how='left')
-				# Adjust Volume
-				.assign(vol = lambda x: np.where(x['cfacshr'] != x['startingcfacshr'], 
-												x['vol']*(x['cfacshr']/x['startingcfacshr']),
-												x['vol']))
-				# Calculate turnover - actual in tens vs shrout in thousands
-				.assign(turnover = lambda x: x['vol'] / (10 * x['startingshrout']),
-                        dollar_turnover_sc = lambda x: x['dollar_turnover'] / (x['startingshrout'] * 1000) )
-				# Summarize
-				.groupby(['gvkey','fyear'], as_index=False)
-				.agg({'ret_adj': 'sum', 'log_ret': 'sum', 'log_vwretd': 'sum', 'ret': ['std','skew'],
-					  'turnover': 'sum', 'dollar_turnover_sc': 'sum'})
-			)
+comp_df = pd.concat([comp_df, returns_df.set_index(comp_df.index)], axis=1)
+del returns, returns_df
 
-temp_ts_df.columns = temp_ts_df.columns.map(''.join)
-temp_ts_df = (temp_ts_df
-				.rename(columns={'ret_adjsum':'car','log_retsum':'sum_log_ret', 
-								 'log_vwretdsum':'sum_log_vwretd', 
-								 'retstd':'std_ret', 'retskew':'ret_skewness',
-								 'turnoversum': 'turnover',
-                                 'dollar_turnover_scsum': 'dollar_turnover_sc'})
-				.assign(bhar = lambda x: np.exp(x['sum_log_ret']) - np.exp(x['sum_log_vwretd']))
-				.filter(['gvkey', 'fyear', 'car', 'std_ret', 'bhar',  'ret_skewness', 'turnover', 'dollar_turnover_sc'])
-			)
 
-comp_df = pd.merge(comp_df, temp_ts_df, on=['gvkey','fyear'], how='left')
-del temp_ts_df, msf_df, msi_df, temp_df, shr_temp_df
+#%%
+'''
+Get in lag data
+'''
+
+comp_df = shift(comp_df, ['ln_at', 'sales_gr', 'car', 'ret_skewness', 'std_ret', 'turnover', 'bhar', 'dollar_turnover_sc',
+                          'Biotech', 'CompHrdw', 'Electronics', 'Retail', 'CompSoft'],
+                'gvkey', 'fyear', 1, '_py', how='inner')
+
+# Model inputs (read by python -m litrep.ksfit, which writes the coefficient table of the fitted models below)
+(comp_df
+ .filter(['gvkey', 'fyear', 'datadate_py', 'datadate'] + ksfit.TERMS)
+ .to_parquet(f'{main_loc}/3. Data/2. Processed Data/19b. KS features - 20210621.gzip', compression='gzip', index=False))
 
 
 #%%
 '''
-Get in lag data and calculate probabilities
+Calculate probabilities
 '''
 
+# Coefficients: 'paper' (Kim and Skinner 2012 model (3)), or 'full' / 'rolling' from the table python -m litrep.ksfit
+# writes from the 19b features above
+ks_model = 'paper'
+if ks_model == 'paper':
+	ks = lambda x: ks_index(x, KS_COEFS)
+else:
+	coef_df = ksfit.load_coefficients(f'{main_loc}/3. Data/2. Processed Data/19c. KS coefficients - 20210621.gzip', ks_model)
+	ks = lambda x: ksfit.predict_index(x, coef_df, ks_model)
+
 comp_df = (comp_df
-           .merge( (comp_df
-                    .filter(['gvkey', 'fyear', 'ln_at', 'sales_gr', 'car', 'ret_skewness', 'std_ret', 'turnover',
-                             'bhar', 'dollar_turnover_sc', 'Biotech', 'CompHrdw', 'Electronics', 'Retail', 'CompSoft'])
-                    .assign(fyear = lambda x: x['fyear'] + 1) ),
-                   on=['gvkey', 'fyear'], how='inner', suffixes=['', '_py'])
-           .assign(KS = lambda x: -7.883 + 0.566*x['FPS'] + 0.518*x['ln_at_py'] + 0.982*x['sales_gr_py']
-                                  + 0.379*x['car_py'] - 0.108*x['ret_skewness_py'] + 25.635*x['std_ret_py']
-                                  + 0.00007*x['turnover_py']/1000,
-                   KSLitRisk = lambda x: ( np.exp(x['KS'])/(1+np.exp(x['KS'])) ) )
+           .assign(KS = ks,
+                   KSLitRisk = lambda x: logistic(x['KS']) )
            .filter(['gvkey', 'fyear', 'KS', 'KSLitRisk'])
            )
 
@@ -8,12 +8,18 @@ from datetime import datetime
 import numpy as np
 import os
 import pandas as pd
-import pandasql as ps
-import statsmodels.api as sm
-import sys
 
-sys.path.append('E:/Dropbox/Python/Custom Modules')
-import Antonis_Modules as ak
+from litrep import warehouse, wrds
+from litrep.arcube import ARCube
+from litrep.calendar import TradingCalendar
+from litrep.candidates import candidate_pairs
+from litrep.featurestore import FeatureStore
+from litrep.fundamentals import Fundamentals
+from litrep.intervals import interval_join
+from litrep.linktable import LinkResolver
+from litrep.panels import expand, shift
+from litrep.rangemax import RangeMax
+from litrep.sample import keep_sample, matched_panel, select_controls
 
 pd.set_option('display.max_columns', 999,
               'display.width', 1000)
@@ -94,9 +100,8 @@ del rep1_df
 print(len(rep_df))
 
 # Prior Year's Data
-rep_df = (rep_df
-          .merge(rep_df[['gvkey', 'Year', 'FirmLink', 'Score']].assign(Year=lambda x: x['Year'] + 1),
-                 on=['gvkey', 'Year'], how='left', suffixes=['_t', '_tm1'])
+rep_df = (shift(rep_df, ['FirmLink', 'Score'], 'gvkey', 'Year', 1, '_tm1')
+          .rename(columns={'FirmLink': 'FirmLink_t', 'Score': 'Score_t'})
           .assign(Score_chg=lambda x: x['Score_t'] - x['Score_tm1'])
           )
 
@@ -131,18 +136,8 @@ Combine Reputation Data with Lawsuits --- If no reputation score, the rows for t
 '''
 
 # First score published at least 6 months after Filing Date
-sqlcode = '''
-            select a.*, b.*
-            from sued_df as a left join rep_df as b
-            on a.gvkey = b.gvkey and
-                b.DateOfPub_tm1 < a.FILING_DATE_p6m and
-                a.FILING_DATE_p6m <= b.DateOfPub_t
-          '''
-post_df = ps.sqldf(sqlcode, locals())
-for i in ['DateOfPub_t', 'DateOfPub_tm1', 'DateOfPub_tp1', 'LOSS_START_DATE', 'LOSS_END_DATE', 'FILING_DATE',
-          'LOSS_START_DATE_p6m', 'LOSS_END_DATE_p6m', 'FILING_DATE_p6m', 'DISPOSITION_DATE_p6m', 'DISPOSITION_DATE',
-          'PostDispositionEnd', 'PreClassStart']:
-	post_df[i] = pd.to_datetime(post_df[i])
+post_df = interval_join(sued_df, rep_df, 'FILING_DATE_p6m', 'DateOfPub_tm1', 'DateOfPub_t',
+                        left_on='GVKEY', right_on='gvkey', closed='right', keep='first')
 post_df = (post_df
            .sort_values(by=['MSCAD_ID', 'DateOfPub_t'])
            # Shouldn't have any, but just in case
@@ -151,18 +146,8 @@ post_df = (post_df
            )
 
 # Report score published prior to Filing Date
-sqlcode = '''
-            select a.*, b.*
-            from sued_df as a left join rep_df as b
-            on a.gvkey = b.gvkey and
-                b.DateOfPub_t < a.FILING_DATE and
-                a.FILING_DATE <= b.DateOfPub_tp1
-          '''
-pre_df = ps.sqldf(sqlcode, locals())
-for i in ['DateOfPub_t', 'DateOfPub_tm1', 'DateOfPub_tp1', 'LOSS_START_DATE', 'LOSS_END_DATE', 'FILING_DATE',
-          'LOSS_START_DATE_p6m', 'LOSS_END_DATE_p6m', 'FILING_DATE_p6m', 'DISPOSITION_DATE_p6m', 'DISPOSITION_DATE',
-          'PostDispositionEnd', 'PreClassStart']:
-	pre_df[i] = pd.to_datetime(pre_df[i])
+pre_df = interval_join(sued_df, rep_df, 'FILING_DATE', 'DateOfPub_t', 'DateOfPub_tp1',
+                       left_on='GVKEY', right_on='gvkey', closed='right', keep='last')
 pre_df = (pre_df
           .sort_values(by=['MSCAD_ID', 'DateOfPub_t'])
           # Shouldn't have any, but just in case
@@ -194,6 +179,42 @@ comb_df = (pre_df
            )
 
 
+#%%
+'''
+Compustat Data - built before identifying potential matches as it is also used to screen them
+'''
+
+comp_df = (wrds
+           # Usual filters are applied while scanning the file
+           .load_funda(columns=['gvkey', 'datadate', 'fyear', 'prcc_f', 'sich', 'csho', 'at', 'ceq', 'ib', 'lt', 'xrd', 'capx',
+                                'aqc', 'sppe', 'sale'])
+           .assign(log_at=lambda x: np.log(x['at']),
+                   btm=lambda x: x['ceq'] / (x['prcc_f'] * x['csho']),
+                   roa=lambda x: x['ib'] / x['at'],
+                   lt_at=lambda x: x['lt'] / x['at'],
+                   log_mve=lambda x: np.log(x['prcc_f'] * x['csho']),
+                   )
+           )
+comp_df[['xrd', 'capx', 'aqc', 'sppe']] = comp_df[['xrd', 'capx', 'aqc', 'sppe']].fillna(0)
+
+# Bring in cik from initial funda used as those CIKs are more accurate for the older filings
+company_df = (pd
+              .read_stata(r'G:\WRDS data\comp_company_20190221.dta', columns=['gvkey', 'cik'])
+              .assign(gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
+              )
+comp_df = comp_df.merge(company_df, on=['gvkey'], how='left')
+del company_df
+
+# Point-in-time lookup: fiscal year in effect on a date (datadate <= date < next year's datadate, or datadate + 12
+# months) with prior year values as py_ columns (py_at, py_roa, py_sale_gr, py_datadate, ...)
+funda = (Fundamentals(comp_df)
+         # Investment - per Biddle, Hilary, and Verdi (2009) - and other growth measures:
+         .assign(investment=lambda x: ( (x['xrd'] + x['capx'] + x['aqc'] - x['sppe']) * 100 ) / x['py_at'],
+                 sale_gr=lambda x: (x['sale'] - x['py_sale']) / x['py_sale'])
+         )
+del comp_df
+
+
 #%%
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
 									IDENTIFY POTENTIAL MATCHES AND COMBINE WITH SUED
@@ -226,17 +247,32 @@ non_sued_df = (rep_df
                )
 del litig_df
 
-# Bring in all non-sued firms in a given year to sued firms WITH REPUTATION DATA AVAILABLE FOR BOTH YEARS (all potential matches)
-all_matches_df = (comb_df
-                  .copy()
-                  # Keep matches with reputation data available
-                  .dropna(subset=['DateOfPub_t'])
-                  .assign(count=lambda x: x.groupby(['MSCAD_ID'])['Score_t'].transform('count'))
-                  .query('count == 2')
-                  .drop(['count'], axis=1)
-                  # Keep only main cols and bring in info for potential matches
-                  .filter(['MSCAD_ID', 'DateOfPub_t', 'LOSS_START_DATE', 'LOSS_END_DATE', 'FILING_DATE'])
-                  .merge(non_sued_df, on=['DateOfPub_t'], how='left')
+# Firm-years that can provide a potential match: reputation score, full Compustat data and a CRSP link. Pairs are still
+# screened below (and for permno and crash risk later on), this only avoids creating the pairs that cannot survive
+linked_gvkeys = set(wrds.load_linktable(gvkeys=set(non_sued_df['gvkey']))['gvkey'])
+eligible_df = (funda.lookup(non_sued_df.dropna(subset=['Score_t']).filter(['gvkey', 'DateOfPub_t']).drop_duplicates(),
+                             'DateOfPub_t', ['at', 'btm', 'roa', 'py_sale_gr', 'py_roa'], how='inner')
+               .dropna()
+               .loc[lambda x: x['gvkey'].isin(linked_gvkeys)]
+               .filter(['gvkey', 'DateOfPub_t'])
+               )
+
+# Sued firms WITH REPUTATION DATA AVAILABLE FOR BOTH YEARS
+cases_df = (comb_df
+            .copy()
+            # Keep matches with reputation data available
+            .dropna(subset=['DateOfPub_t'])
+            .assign(count=lambda x: x.groupby(['MSCAD_ID'])['Score_t'].transform('count'))
+            .query('count == 2')
+            .drop(['count'], axis=1)
+            # Keep only main cols
+            .filter(['MSCAD_ID', 'DateOfPub_t', 'LOSS_START_DATE', 'LOSS_END_DATE', 'FILING_DATE'])
+            )
+
+# Bring in the non-sued firms eligible in both years of each case (all potential matches)
+all_matches_df = (cases_df
+                  .merge(candidate_pairs(cases_df, eligible_df), on=['MSCAD_ID'], how='inner')
+                  .merge(non_sued_df, on=['gvkey', 'DateOfPub_t'], how='inner')
                   # Ensure available data for both years for the potential matches
                   .assign(count=lambda x: x.groupby(['MSCAD_ID', 'gvkey'])['Score_t'].transform('count'))
                   .query('count == 2')
@@ -247,7 +283,7 @@ all_matches_df = (comb_df
                           Sued_sample=0)
                   )
 
-del pre_df, post_df, non_sued_df
+del pre_df, post_df, non_sued_df, linked_gvkeys, eligible_df, cases_df
 
 
 #%%
@@ -279,26 +315,16 @@ del all_matches_df, comb_df
 							    BRING IN PERMNO AROUND CLASS PERIOD END - DROP MISSING ONLY FOR NON-SUED
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
 
-# CRSP - Compustat linktable
-linktable_df = (pd
-                # Import Linktable and keep relevant flags
-                .read_parquet('G:/Wrds data/zip files/202106/crsp_ccmxpf_linktable_20210621.gzip')
-                .query("linktype  in ['LU', 'LC', 'LN', 'LS'] and linkprim in ['P', 'C']")
-                .assign(linkdt=lambda x: pd.to_datetime(x['linkdt']),
-                        linkenddt=lambda x: pd.to_datetime(x['linkenddt'].fillna('2021-06-21')),
-                        gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
-                )
-
-# Bring in Permno as well
-sqlcode = '''
-            select a.MSCAD_ID, a.gvkey, b.lpermno as permno
-            from main_df as a left join linktable_df as b
-            on a.gvkey = b.gvkey and
-                date(b.linkdt) <= date(a.LOSS_END_DATE) and
-                date(a.LOSS_END_DATE) <= date(b.linkenddt)
-            where a.Post = 0
-          '''
-temp_df = ps.sqldf(sqlcode, locals())
+# CRSP - Compustat linktable (relevant flags and firms only)
+link = LinkResolver.from_wrds(gvkeys=set(main_df['gvkey']))
+
+# Bring in Permno as well - if more than one link on LOSS_END_DATE keep the last permno as before
+temp_df = (main_df
+           .query('Post == 0')
+           .filter(['MSCAD_ID', 'gvkey', 'LOSS_END_DATE'])
+           .pipe(link.merge_permno, 'LOSS_END_DATE', prefer='highest')
+           .drop(['LOSS_END_DATE'], axis=1)
+           )
 main_df = (main_df
            .merge(temp_df, on=['MSCAD_ID', 'gvkey'], how='left')
            # Drop only if missing permno and is a potential matched firm (i.e., keep sued firms no matter what)
@@ -310,7 +336,7 @@ main_df = (main_df
            .drop_duplicates(subset=['MSCAD_ID', 'gvkey', 'Post'], keep='last')
            )
 
-del temp_df
+del temp_df, link
 
 
 #%%
@@ -318,75 +344,15 @@ del temp_df
 								BRING IN COMPUSTAT DATA BOTH TO SUED AS WELL AS TO POTENTIAL MATCHES
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
 
-'''
-Compustat Data
-'''
-comp_df = (pd
-           .read_parquet(r'G:\WRDS data\zip files\202106\comp_funda_20210621.gzip',
-                         columns=['gvkey', 'datadate', 'fyear', 'indfmt', 'datafmt', 'popsrc', 'consol', 'curcd', 'prcc_f',
-                                  'sich', 'csho', 'at', 'ceq', 'ib', 'lt', 'xrd', 'capx', 'aqc', 'sppe', 'sale'])
-           .query('indfmt == "INDL" and datafmt == "STD" and popsrc == "D" and consol == "C" and curcd == "USD"')
-           .assign(datadate=lambda x: pd.to_datetime(x['datadate']),
-                   gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'),
-                   log_at=lambda x: np.log(x['at']),
-                   btm=lambda x: x['ceq'] / (x['prcc_f'] * x['csho']),
-                   roa=lambda x: x['ib'] / x['at'],
-                   lt_at=lambda x: x['lt'] / x['at'],
-                   log_mve=lambda x: np.log(x['prcc_f'] * x['csho']),
-                   )
-           )
-comp_df[['xrd', 'capx', 'aqc', 'sppe']] = comp_df[['xrd', 'capx', 'aqc', 'sppe']].fillna(0)
-
-# Bring in cik from initial funda used as those CIKs are more accurate for the older filings
-company_df = (pd
-              .read_stata(r'G:\WRDS data\comp_company_20190221.dta', columns=['gvkey', 'cik'])
-              .assign(gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
-              )
-comp_df = comp_df.merge(company_df, on=['gvkey'], how='left')
-del company_df
-
-# Identify when the next year ends
-comp_df = (comp_df
-           .merge(comp_df[['gvkey', 'fyear', 'datadate']].assign(fyear=lambda x: x['fyear']-1).rename(columns={'datadate': 'ny_datadate'}),
-                  on=['gvkey', 'fyear'], how='left')
-           .assign(ny_datadate=lambda x: x['ny_datadate'].fillna(x['datadate'] + pd.offsets.DateOffset(months=12)))
-           )
-
-# Identify prior year's total assets, sales, roa, etc
-comp_df = (comp_df
-           .merge( (comp_df[['gvkey', 'fyear', 'at', 'sale', 'roa', 'datadate']]
-                    .assign(fyear=lambda x: x['fyear']+1).rename(columns={'at': 'py_at',
-                                                                          'sale': 'py_sale',
-                                                                          'roa': 'py_roa',
-                                                                          'datadate': 'py_datadate',})),
-                   on=['gvkey', 'fyear'], how='left')
-           )
-
-# Investment - per Biddle, Hilary, and Verdi (2009) - and other growth measures:
-comp_df = (comp_df
-           .assign(investment=lambda x: ( (x['xrd'] + x['capx'] + x['aqc'] - x['sppe']) * 100 ) / x['py_at'],
-                   sale_gr=lambda x: (x['sale'] - x['py_sale']) / x['py_sale'])
-           )
-
-# Get lead and lags vars needed
-comp_df = (comp_df
-           # Identify prior year's sales growth
-           .merge(comp_df[['gvkey', 'fyear', 'sale_gr']].assign(fyear=lambda x: x['fyear']+1).rename(columns={'sale_gr': 'py_sale_gr'}),
-                  on=['gvkey', 'fyear'], how='left')
-           )
 # Merge with our sample
-sqlcode =   '''
-            select a.MSCAD_ID, a.gvkey, a.Post, b.fyear, b.at, b.log_at, b.btm, b.roa, b.cik, b.datadate, b.sich, b.lt_at, 
-                   b.investment, b.sale_gr, b.py_roa, b.py_sale_gr, b.py_datadate, b.log_mve
-            from main_df as a left join comp_df as b
-            on a.gvkey = b.gvkey and 
-               b.datadate <= a.DateOfPub_t and
-               a.DateOfPub_t < b.ny_datadate
-            '''
-temp_df = ps.sqldf(sqlcode, locals())
+# Fiscal year with datadate <= DateOfPub_t < ny_datadate
+temp_df = (funda.lookup(main_df[['MSCAD_ID', 'gvkey', 'Post', 'DateOfPub_t']], 'DateOfPub_t',
+                        ['fyear', 'at', 'log_at', 'btm', 'roa', 'cik', 'datadate', 'sich', 'lt_at', 'investment',
+                         'sale_gr', 'py_roa', 'py_sale_gr', 'py_datadate', 'log_mve'])
+           .drop(['DateOfPub_t'], axis=1)
+           )
 main_df = (main_df
            .merge(temp_df, on=['MSCAD_ID', 'gvkey', 'Post'], how='left')
-           .assign(datadate=lambda x: pd.to_datetime(x['datadate']))
            # Keep if either sued or if potential matches have data available both pre and post
            .assign(full_data=lambda x: np.where( x[['at', 'btm', 'roa', 'py_sale_gr', 'py_roa']].isnull().sum(axis=1) == 0, 1, 0),
                    sum_full_data=lambda x: x.groupby(['MSCAD_ID', 'gvkey'])['full_data'].transform('sum'))
@@ -395,147 +361,32 @@ main_df = (main_df
            )
 
 print(len(main_df))
-del temp_df
+del temp_df, funda
 
 
 #%%
 '''
-Let's compute stock price crash risk as well - we follow Hsu, Wang, and whipple 2021 JAE
+Read CRSP daily prices once for the market values below (damages) - only the permnos the linktable can map our firms to
 '''
 
-# Create yearly daily dataset
-cr_df = (main_df
-         .filter(['gvkey', 'fyear', 'datadate', 'py_datadate'])
-         .drop_duplicates()
-         .assign(py_datadate=lambda x: pd.to_datetime(x['py_datadate']),
-                 year_start=lambda x: x['py_datadate'] + pd.DateOffset(days=1))
-         .drop(['py_datadate'], axis=1)
-         .dropna()
-         .reset_index(drop=True)
-         )
-cr_ts_df = ak.create_ts(cr_df, 'year_start', 'datadate', 'D').drop(['index'], axis=1)
-# Keep only if on a Friday as we summarize to Fridays
-cr_ts_df = cr_ts_df[cr_ts_df['date'].dt.weekday == 4]
-
-# Bring in permnos over the year
-rel_gvkey_set = set(cr_df['gvkey'])
-linktable_df = (pd
-                # Import Linktable and keep relevant flags
-                .read_parquet('G:/Wrds data/zip files/202106/crsp_ccmxpf_linktable_20210621.gzip')
-                .query("linktype  in ['LU', 'LC', 'LN', 'LS'] and linkprim in ['P', 'C']")
-                .assign(linkdt=lambda x: pd.to_datetime(x['linkdt']),
-                        linkenddt=lambda x: pd.to_datetime(x['linkenddt'].fillna('2021-06-21')),
-                        gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
-                .rename(columns={'lpermno': 'permno'})
-                # Keep relevant obs
-                .query('gvkey in @rel_gvkey_set')
-                # If ending prior to 1990, then drop --- If starting prior to that then change
-                .query('linkenddt >= "1990-01-01"')
-                .assign(temp=pd.to_datetime('1990-01-01'),
-                        linkdt=lambda x: np.where(x['linkdt'].dt.year < 1990, x['temp'], x['linkdt']))
-                .filter(['gvkey', 'permno', 'linkdt', 'linkenddt'])
-                )
-linktable_ts_df = ak.create_ts(linktable_df, 'linkdt', 'linkenddt', 'D').drop(['index'], axis=1)
-cr_ts_df = cr_ts_df.merge(linktable_ts_df, on=['gvkey', 'date'], how='inner')
-del rel_gvkey_set, linktable_ts_df, linktable_df
-
-# Import returns data
-dsi_df = (pd
-          .read_parquet(r'G:/WRDS data/zip files/202106/crsp_dsi_20210621.gzip', columns=['date', 'vwretd'])
-          .assign(date=lambda x: pd.to_datetime(x['date']))
-          # Move all days to Fridays
-          .assign(date=lambda x: np.where(x['date'].dt.weekday == 4, x['date'], x['date'] + pd.offsets.Week(weekday=4)))
-          # Summarize by week
-          .dropna()
-          .assign(vwretd=lambda x: x['vwretd'] + 1)
-          .groupby(['date'], as_index=False).agg(weekly_vwretd_t=('vwretd', 'prod'))
-          .assign(weekly_vwretd_t=lambda x: x['weekly_vwretd_t'] - 1)
-          .sort_values(by=['date'])
-          .assign(tr_week_id=lambda x: range(0, len(x)))
-          )
-# Bring in leads as lags --- I use unq_id in case a whole week was a non-trading week (i.e., 9/11 etc)
-dsi_df = (dsi_df
-          # Prior week and the week before
-          .merge(dsi_df.assign(tr_week_id=lambda x: x['tr_week_id'] + 1).drop(['date'], axis=1), on=['tr_week_id'], how='left',
-                 suffixes=['', 'm1'])
-          .merge(dsi_df.assign(tr_week_id=lambda x: x['tr_week_id'] + 2).drop(['date'], axis=1), on=['tr_week_id'], how='left',
-                 suffixes=['', 'm2'])
-          # Following week and the week after
-          .merge(dsi_df.assign(tr_week_id=lambda x: x['tr_week_id'] - 1).drop(['date'], axis=1), on=['tr_week_id'], how='left',
-                 suffixes=['', 'p1'])
-          .merge(dsi_df.assign(tr_week_id=lambda x: x['tr_week_id'] - 2).drop(['date'], axis=1), on=['tr_week_id'], how='left',
-                 suffixes=['', 'p2'])
-          )
-
-rel_permno_set = set(cr_ts_df['permno'])
-dsf_df = (pd
-          .read_parquet(r'G:/WRDS data/zip files/202106/crsp_dsf_20210621.gzip', columns=['date', 'ret', 'permno'])
-          .assign(date=lambda x: pd.to_datetime(x['date']),
-                  permno=lambda x: pd.to_numeric(x['permno'], downcast='integer'))
-          .query('date >= "1990-01-01" and permno in @rel_permno_set')
-          # Move all days to Fridays
-          .assign(date=lambda x: np.where(x['date'].dt.weekday == 4, x['date'], x['date'] + pd.offsets.Week(weekday=4)))
-          # Summarize by week
-          .dropna()
-          .assign(ret=lambda x: x['ret'] + 1)
-          .groupby(['permno', 'date'], as_index=False).agg(cum_ret=('ret', 'prod'))
-          .assign(cum_ret=lambda x: x['cum_ret'] - 1)
+dsf_df = (warehouse
+          .load_dsf(columns=['permno', 'date', 'prc', 'shrout'], start='1985-01-01',
+                    permnos=set(wrds.load_linktable(gvkeys=set(main_df['gvkey']))['permno']))
+          .assign(MVE=lambda x: x['prc'].abs() * x['shrout'])
+          .drop(['prc', 'shrout'], axis=1)
           )
 
-cr_ts_df = (cr_ts_df
-            .merge(dsi_df, on=['date'], how='inner')
-            .merge(dsf_df, on=['permno', 'date'], how='inner')
-            .sort_values(by=['gvkey', 'fyear', 'date'])
-            # Ensure at least 20 obs pre gvkey-fyear group
-            .dropna(subset=['cum_ret', 'weekly_vwretd_tm2', 'weekly_vwretd_tm1', 'weekly_vwretd_t', 'weekly_vwretd_tp1',
-                            'weekly_vwretd_tp2'])
-            .assign(gvkey_fyear=lambda x: x.apply(lambda y: f'{y["gvkey"]} - {y["fyear"]}', axis=1),
-                    obs=lambda x: x.groupby(['gvkey', 'fyear'])['cum_ret'].transform('count'))
-            .query('obs >= 20')
-            .drop(['obs'], axis=1)
-            .reset_index(drop=True)
-            )
-
-del dsf_df, dsi_df, rel_permno_set
-
-# Run regressions by gvkey-fyear
-def regress(input_df):
-	# Include -1 to exclude the intercept
-	model = sm.formula.ols('cum_ret ~ weekly_vwretd_tm2 + weekly_vwretd_tm1 + weekly_vwretd_t + weekly_vwretd_tp1 + weekly_vwretd_tp2',
-	                       data=input_df).fit()
-	predict = model.predict(input_df)
-	return predict
 
+#%%
+'''
+Let's compute stock price crash risk as well - we follow Hsu, Wang, and whipple 2021 JAE. NSKEW and DUVOL of the fiscal year
+(and the daily return volatility below) come from the firm-year feature store (python -m litrep.featurestore build)
+'''
 
-predictions_df = (cr_ts_df
-                  .groupby(['gvkey_fyear']).apply(regress)
-                  .reset_index()
-                  .drop(['gvkey_fyear'], axis=1)
-                  .set_index('level_1') # level_1 correpsonds to iloc of the main dataset
-                  .rename(columns={0: 'pred_cum_ret'})
-                  )
-cr_ts_df = (cr_ts_df
-            .merge(predictions_df, left_index=True, right_index=True, how='inner')
-            .assign(resid_cum_ret=lambda x: x['cum_ret'] - x['pred_cum_ret'],
-                    resid=lambda x: np.log(x['resid_cum_ret'] + 1),
-                    resid2=lambda x: x['resid'] * x['resid'],
-                    resid3=lambda x: x['resid'] * x['resid'] * x['resid'],
-                    mean_resid=lambda x: x.groupby(['gvkey', 'fyear'])['resid'].transform('mean'),
-                    resid_d=lambda x: np.where(x['resid'] < x['mean_resid'], x['resid'], np.nan),
-                    resid_u=lambda x: np.where(x['resid'] > x['mean_resid'], x['resid'], np.nan))
-            .groupby(['gvkey', 'fyear'], as_index=False).agg(n=('resid', 'count'),
-                                                             resid3_sum=('resid3', 'sum'),
-                                                             resid2_sum=('resid2', 'sum'),
-                                                             resid_d_std=('resid_d', 'std'),
-                                                             resid_u_std=('resid_u', 'std'))
-            .assign(nskew_PrCrRisk=lambda x: -1 * ( x['n'] * ( (x['n']-1)**(3/2) ) * x['resid3_sum'] ) /
-                                             ( (x['n']-1) * (x['n']-2) * (x['resid2_sum']**(3/2))),
-                    duvol_PrCrRisk=lambda x: np.log(x['resid_d_std']/x['resid_u_std']))
-            .filter(['gvkey', 'fyear', 'nskew_PrCrRisk', 'duvol_PrCrRisk'])
-            )
+features = FeatureStore.open(fyears=set(main_df['fyear'].dropna()))
 
-main_df = (main_df
-           .merge(cr_ts_df, on=['gvkey', 'fyear'], how='left')
+main_df = (features
+           .lookup(main_df, ['nskew_PrCrRisk', 'duvol_PrCrRisk'])
            # Keep if either sued or if potential matches have data available both pre and post for stock price crash risk
            .assign(full_data=lambda x: np.where( x['nskew_PrCrRisk'].notnull(), 1, 0),
                    sum_full_data=lambda x: x.groupby(['MSCAD_ID', 'gvkey'])['full_data'].transform('sum'))
@@ -544,7 +395,6 @@ main_df = (main_df
            )
 
 print(len(main_df))
-del cr_ts_df, cr_df, predictions_df
 
 
 #%%
@@ -552,56 +402,8 @@ del cr_ts_df, cr_df, predictions_df
 Let's also calculate daily return volatility - given data for Stock price crash risk, this variable shouldn't cause any sample attrition
 '''
 
-# Create yearly daily dataset
-ret_vol_df = (main_df
-              .filter(['gvkey', 'fyear', 'datadate', 'py_datadate'])
-              .drop_duplicates()
-              .assign(py_datadate=lambda x: pd.to_datetime(x['py_datadate']),
-                      year_start=lambda x: x['py_datadate'] + pd.DateOffset(days=1))
-              .drop(['py_datadate'], axis=1)
-              .dropna()
-              .reset_index(drop=True)
-              )
-ret_vol_ts_df = ak.create_ts(ret_vol_df, 'year_start', 'datadate', 'D').drop(['index'], axis=1)
-
-# Bring in permnos over the year
-rel_gvkey_set = set(ret_vol_df['gvkey'])
-linktable_df = (pd
-                # Import Linktable and keep relevant flags
-                .read_parquet('G:/Wrds data/zip files/202106/crsp_ccmxpf_linktable_20210621.gzip')
-                .query("linktype  in ['LU', 'LC', 'LN', 'LS'] and linkprim in ['P', 'C']")
-                .assign(linkdt=lambda x: pd.to_datetime(x['linkdt']),
-                        linkenddt=lambda x: pd.to_datetime(x['linkenddt'].fillna('2021-06-21')),
-                        gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
-                .rename(columns={'lpermno': 'permno'})
-                # Keep relevant obs
-                .query('gvkey in @rel_gvkey_set')
-                # If ending prior to 1990, then drop --- If starting prior to that then change
-                .query('linkenddt >= "1990-01-01"')
-                .assign(temp=pd.to_datetime('1990-01-01'),
-                        linkdt=lambda x: np.where(x['linkdt'].dt.year < 1990, x['temp'], x['linkdt']))
-                .filter(['gvkey', 'permno', 'linkdt', 'linkenddt'])
-                )
-linktable_ts_df = ak.create_ts(linktable_df, 'linkdt', 'linkenddt', 'D').drop(['index'], axis=1)
-ret_vol_ts_df = ret_vol_ts_df.merge(linktable_ts_df, on=['gvkey', 'date'], how='inner')
-del rel_gvkey_set, linktable_ts_df, linktable_df
-
-# Import returns data
-rel_permno_set = set(ret_vol_ts_df['permno'])
-dsf_df = (pd
-          .read_parquet(r'G:/WRDS data/zip files/202106/crsp_dsf_20210621.gzip', columns=['date', 'ret', 'permno'])
-          .assign(date=lambda x: pd.to_datetime(x['date']),
-                  permno=lambda x: pd.to_numeric(x['permno'], downcast='integer'))
-          .query('date >= "1990-01-01" and permno in @rel_permno_set')
-          )
-ret_vol_ts_df = (ret_vol_ts_df
-                 .merge(dsf_df, on=['permno', 'date'], how='inner')
-                 .groupby(['gvkey', 'fyear'], as_index=False).agg(StdDailyRet=('ret', 'std'))
-                 )
-
-main_df = main_df.merge(ret_vol_ts_df, on=['gvkey', 'fyear'], how='left')
-
-del ret_vol_ts_df, ret_vol_df, dsf_df
+main_df = features.lookup(main_df, ['StdDailyRet'])
+del features
 
 
 #%%
@@ -621,6 +423,7 @@ print(f'Number of obs after when starting to identify control firms: {len(main_d
 Bring in KS variable
 '''
 
+# Scored in 1. KS Litigation Risk.py with the coefficient model chosen there
 ks_df = (pd
          .read_parquet('./2. Processed Data/19. KS variables - 20210621.gzip')
          .drop(['KS'], axis=1)
@@ -635,27 +438,13 @@ del ks_df
 Calculate returns during the one month period leading to CLASS PERIOD END
 '''
 
-# Import returns data
-dsi_df = (pd
-          .read_parquet(r'G:/WRDS data/zip files/202106/crsp_dsi_20210621.gzip')
-          .assign(date=lambda x: pd.to_datetime(x['date']))
-          )
-dsf_df = (pd
-          .read_parquet(r'G:/WRDS data/zip files/202106/crsp_dsf_20210621.gzip', columns=['date', 'ret', 'permno', 'prc', 'shrout'])
-          .assign(date=lambda x: pd.to_datetime(x['date']),
-                  permno=lambda x: pd.to_numeric(x['permno'], downcast='integer'),
-                  MVE=lambda x: x['prc'].abs() * x['shrout'])
-          .drop(['prc', 'shrout'], axis=1)
-          .query('date >= "1985-01-01"')
-          )
-linktable_df = (pd
-                # Import Linktable and keep relevant flags
-                .read_parquet('G:/Wrds data/zip files/202106/crsp_ccmxpf_linktable_20210621.gzip')
-                .query("linktype  in ['LU', 'LC', 'LN', 'LS'] and linkprim in ['P', 'C']")
-                .assign(linkdt=lambda x: pd.to_datetime(x['linkdt']),
-                        linkenddt=lambda x: pd.to_datetime(x['linkenddt'].fillna('2021-06-21')),
-                        gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
-                )
+# Import Linktable (relevant flags and firms in our sample only)
+linktable_df = wrds.load_linktable(gvkeys=set(main_df['gvkey']))
+link = LinkResolver(linktable_df)
+
+# Abnormal returns from the AR cube (MVE from the daily prices above)
+dsi_df = warehouse.load_dsi(columns=['date', 'vwretd'])
+cube = ARCube.open()
 
 # Create a panel data for our dataset
 ret_df = (main_df
@@ -668,29 +457,15 @@ ret_df = (main_df
           .assign(start_date=lambda x: x['LOSS_END_DATE'] - pd.DateOffset(months=1) + pd.DateOffset(days=1))
           .dropna(subset=['start_date', 'LOSS_END_DATE'])
           )
-ret_df = ak.create_ts(ret_df, 'start_date', 'LOSS_END_DATE', 'D')
-
-# Bring in relevant permno on each day
-sqlcode = '''
-            select a.*, b.lpermno as permno
-            from ret_df as a left join linktable_df as b
-            on a.gvkey = b.gvkey and
-                date(b.linkdt) <= date(a.date) and
-                date(a.date) <= date(b.linkenddt)
-          '''
-ret_df = ps.sqldf(sqlcode, locals())
+ret_df = expand(ret_df, 'start_date', 'LOSS_END_DATE', 'D')
 
 # Returns over relevant period
 ret_df = (ret_df
-          .dropna(subset=['permno'])
-          # Shouldn't have any, but just in case
-          .sort_values(by=['MSCAD_ID', 'gvkey', 'date', 'permno'])
-          .drop_duplicates(subset=['MSCAD_ID', 'gvkey', 'date'])
-          # Bring in returns
-          .assign(date=lambda x: pd.to_datetime(x['date']))
-          .merge(dsf_df, on=['permno', 'date'], how='inner')
-          .merge(dsi_df[['date', 'vwretd']], on=['date'], how='left')
-          .assign(ar=lambda x: x['ret'] - x['vwretd'])
+          # Bring in relevant permno on each day (lowest permno if more than one link)
+          .pipe(link.merge_permno, 'date', how='inner')
+          # Days with a CRSP daily record and their abnormal returns (a missing return adds 0 to car and sorts last)
+          .merge(dsf_df[['permno', 'date']], on=['permno', 'date'], how='inner')
+          .assign(ar=lambda x: cube.values(x['permno'], x['date']))
           # Day with the lowest return
           .sort_values(by=['MSCAD_ID', 'gvkey', 'ar', 'date'])
           .assign(LowestRetDateInd=lambda x: np.where(x.groupby(['MSCAD_ID', 'gvkey']).cumcount() == 0, 1, 0))
@@ -706,7 +481,7 @@ ret_df = (ret_df
 # Merge back to the matching dataframe
 main_df = main_df.merge(ret_df, on=['MSCAD_ID', 'gvkey'], how='left')
 
-del ret_df
+del ret_df, cube
 
 
 # %%
@@ -725,57 +500,43 @@ dmg_df = (main_df
           .assign(
 	start_date=lambda x: np.where(x['Sued_sample'] == 1, x['LOSS_START_DATE'], x['LowestRetDate'] - pd.DateOffset(years=1)
 	                              + pd.DateOffset(days=1)),
-	end_date=lambda x: np.where(x['Sued_sample'] == 1, x['LOSS_END_DATE'], x['LowestRetDate']),
-	end_date_copy=lambda x: x['end_date'])
-          .filter(['MSCAD_ID', 'gvkey', 'Sued_sample', 'start_date', 'end_date', 'end_date_copy'])
+	end_date=lambda x: np.where(x['Sued_sample'] == 1, x['LOSS_END_DATE'], x['LowestRetDate']))
+          .filter(['MSCAD_ID', 'gvkey', 'Sued_sample', 'start_date', 'end_date'])
           .dropna()
           )
-dmg_df = ak.create_ts(dmg_df, 'start_date', 'end_date', 'D').drop(['index'], axis=1)
-
-# Bring in relevant permno on each day
-sqlcode = '''
-            select a.*, b.lpermno as permno
-            from dmg_df as a left join linktable_df as b
-            on a.gvkey = b.gvkey and
-                date(b.linkdt) <= date(a.date) and
-                date(a.date) <= date(b.linkenddt)
-          '''
-dmg_df = ps.sqldf(sqlcode, locals())
-dmg_df = (dmg_df
-          # Shouldn't have any dups, but just in case
-          .sort_values(by=['MSCAD_ID', 'gvkey', 'date', 'permno'])
-          .drop_duplicates(subset=['MSCAD_ID', 'gvkey', 'date'])
-          # Max MVE during class period
-          .assign(date=lambda x: pd.to_datetime(x['date']))
-          .merge(dsf_df, on=['permno', 'date'], how='inner')
-          .groupby(['MSCAD_ID', 'gvkey', 'Sued_sample', 'end_date_copy'], as_index=False).agg(Max_MVE=('MVE', 'max'))
-          .rename(columns={'end_date_copy': 'end_date'})
-          .assign(end_date=lambda x: pd.to_datetime(x['end_date']))
-          )
 
-# Create a panel with 15 days following class period end or lowest return date for control firms
-post_df = (pd
-           .concat([dmg_df.assign(date=lambda x: x['end_date'] + pd.DateOffset(days=i)) for i in range(1, 16)])
+# Max MVE during the period, without expanding it into days
+mve_index = RangeMax(dsf_df, 'permno', 'MVE')
+
+def max_mve(period_df):
+
+	return (period_df
+	        # Split the period where the linked permno changes (lowest permno if more than one link)
+	        .pipe(link.permno_spans, 'start_date', 'end_date')
+	        .assign(Max_MVE=lambda x: mve_index.max(x['permno'], x['span_start'], x['span_end']),
+	                n_days=lambda x: mve_index.count(x['permno'], x['span_start'], x['span_end']))
+	        # Max MVE during class period (over the spans with returns data)
+	        .query('n_days > 0')
+	        .groupby(['MSCAD_ID', 'gvkey', 'Sued_sample', 'end_date'], as_index=False).agg(Max_MVE=('Max_MVE', 'max'))
+	        )
+
+period_df = dmg_df
+dmg_df = max_mve(period_df)
+
+# Create a panel with the trading days in the 15 days following class period end or lowest return date for control firms
+post_df = (TradingCalendar
+           .from_dsi(dsi_df)
+           .expand(dmg_df.assign(start=lambda x: x['end_date'] + pd.DateOffset(days=1),
+                                 stop=lambda x: x['end_date'] + pd.DateOffset(days=15)),
+                   'start', 'stop')
            .filter(['MSCAD_ID', 'gvkey', 'date'])
            .sort_values(by=['MSCAD_ID', 'gvkey', 'date'])
            .reset_index(drop=True)
            )
-# Bring in relevant permno on each day
-sqlcode = '''
-            select a.*, b.lpermno as permno
-            from post_df as a left join linktable_df as b
-            on a.gvkey = b.gvkey and
-                date(b.linkdt) <= date(a.date) and
-                date(a.date) <= date(b.linkenddt)
-          '''
-post_df = ps.sqldf(sqlcode, locals())
 post_df = (post_df
-           .assign(date=lambda x: pd.to_datetime(x['date']))
-           # Shouldn't have any dups, but just in case
-           .sort_values(by=['MSCAD_ID', 'gvkey', 'date', 'permno'])
-           .drop_duplicates(subset=['MSCAD_ID', 'gvkey', 'date'])
+           # Bring in relevant permno on each day (lowest permno if more than one link)
+           .pipe(link.merge_permno, 'date')
            # Keep first post MVE
-           .assign(date=lambda x: pd.to_datetime(x['date']))
            .merge(dsf_df, on=['permno', 'date'], how='inner')
            .sort_values(by=['MSCAD_ID', 'gvkey', 'date'])
            .drop_duplicates(subset=['MSCAD_ID', 'gvkey'], keep='first')
@@ -787,12 +548,30 @@ dmg_df = (dmg_df
           .assign(Max_Damages=lambda x: (x['Max_MVE'] - x['PostMVE']) / 1000,
                   log_max_dmgs=lambda x: np.where(x['Max_Damages'] < 0, 0, np.log(x['Max_Damages'])),
                   Post=1)
-          .filter(['MSCAD_ID', 'gvkey', 'Post', 'PostMVE', 'Max_Damages', 'log_max_dmgs'])
           )
 
+# Alternative damage windows (dmgs_col of the sensitivity grid, see litrep.grid): max MVE over the last 3, 6 and 12 months
+# of the period only (log_max_dmgs_3m, log_max_dmgs_6m, log_max_dmgs_12m), same PostMVE
+dmg_windows = [3, 6, 12]
+for m in dmg_windows:
+	alt_df = (max_mve(period_df.assign(start_date=lambda x: np.maximum(x['start_date'], x['end_date'] - pd.DateOffset(months=m)
+	                                                                                    + pd.DateOffset(days=1))))
+	          .filter(['MSCAD_ID', 'gvkey', 'Max_MVE'])
+	          .rename(columns={'Max_MVE': 'alt_Max_MVE'})
+	          )
+	dmg_df = (dmg_df
+	          .merge(alt_df, on=['MSCAD_ID', 'gvkey'], how='left')
+	          .assign(alt_dmgs=lambda x: (x['alt_Max_MVE'] - x['PostMVE']) / 1000)
+	          .assign(**{f'log_max_dmgs_{m}m': lambda x: np.where(x['alt_dmgs'] < 0, 0, np.log(x['alt_dmgs']))})
+	          .drop(['alt_Max_MVE', 'alt_dmgs'], axis=1)
+	          )
+
+dmg_df = dmg_df.filter(['MSCAD_ID', 'gvkey', 'Post', 'PostMVE', 'Max_Damages', 'log_max_dmgs']
+                       + [f'log_max_dmgs_{m}m' for m in dmg_windows])
+
 main_df = main_df.merge(dmg_df, on=['MSCAD_ID', 'gvkey', 'Post'], how='left')
 
-del dmg_df, dsf_df, dsi_df, linktable_df, post_df
+del dmg_df, period_df, alt_df, mve_index, dsf_df, dsi_df, linktable_df, link, post_df
 
 
 #%%
@@ -802,52 +581,12 @@ Time to apply our criteria
 '''
 
 
-match_df = (main_df
-            # We care about pre-period KS and then contemporaneous CAR around class period end and Log Max Damages
-            .query('Post == 0')
-            .filter(['MSCAD_ID', 'gvkey', 'Sued_sample', 'KSLitRisk', 'log_at'])
-            # Bring in right CAR and Damages info
-            .merge(main_df.query('Post == 1')[['MSCAD_ID', 'gvkey', 'car', 'log_max_dmgs']], on=['MSCAD_ID', 'gvkey'], how='left')
-            # Keep obs that have available data for all variables of interest --- Ensure both sued and control firms available
-            .dropna(subset=['car', 'KSLitRisk', 'log_max_dmgs'])
-            .assign(max_sued=lambda x: x.groupby(['MSCAD_ID'])['Sued_sample'].transform('max'),
-                    min_sued=lambda x: x.groupby(['MSCAD_ID'])['Sued_sample'].transform('min') )
-            .query('max_sued == 1 and min_sued == 0')
-            .drop(['max_sued'], axis=1)
-            # Create relevant groups
-            .sort_values(by=['MSCAD_ID', 'Sued_sample'])
-
-            # --------------------- Groupings --------------------------
-
-            # Returns
-            .assign(car_gr=lambda x: x.groupby(['MSCAD_ID'])['car'].transform(lambda y: pd.qcut(y, 20, labels=range(1, 21))),
-                    temp_gr=lambda x: np.where(x['Sued_sample'] == 1, x['car_gr'], np.nan),
-                    sued_car_gr=lambda x: x.groupby(['MSCAD_ID'])['temp_gr'].transform('max'))
-            .query('sued_car_gr == car_gr')
-
-            # KS
-            .assign(KSLitRisk_gr=lambda x: x.groupby(['MSCAD_ID'])['KSLitRisk'].transform(lambda y: pd.qcut(y, 2, labels=range(1, 3))),
-                    temp_gr=lambda x: np.where(x['Sued_sample'] == 1, x['KSLitRisk_gr'], np.nan),
-                    sued_KSLitRisk_gr=lambda x: x.groupby(['MSCAD_ID'])['temp_gr'].transform('max') )
-            .query('sued_KSLitRisk_gr == KSLitRisk_gr')
+# Inputs of the control firm selection (also the inputs of the sensitivity grid, see litrep.grid)
+main_df.to_parquet(f'{os.getcwd()}/2. Processed Data/1. Matching inputs_20220428.gzip', compression='gzip', index=False)
 
-            )
-
-# Closest log damages difference
-match_df = (match_df
-            .assign(temp_log_max_dmgs=lambda x: np.where(x['Sued_sample']==1, x['log_max_dmgs'], np.nan),
-                    sued_log_max_dmgs=lambda x: x.groupby(['MSCAD_ID'])['temp_log_max_dmgs'].transform('max'),
-                    log_max_dmgs_diff=lambda x: np.abs(x['log_max_dmgs'] - x['sued_log_max_dmgs']))
-            # Closest KS
-            .query('Sued_sample == 0')
-            .sort_values(by=['MSCAD_ID', 'log_max_dmgs_diff', 'gvkey'])
-            .drop_duplicates(subset=['MSCAD_ID'], keep='first')
-            .assign(ContrFirm=1)
-            .filter(['MSCAD_ID', 'gvkey', 'ContrFirm'])
-            )
-
-# Transfer to main dataframe
-main_df = main_df.merge(match_df, on=['MSCAD_ID', 'gvkey'], how='left')
+# Same CAR (20 groups) and KS (2 groups) group as the sued firm within the case, then closest log damages difference
+# (lowest gvkey on ties)
+main_df = select_controls(main_df, car_bins=20, ks_bins=2, dmgs_col='log_max_dmgs')
 
 print(f'Number of obs after bringing in control firm flag: {len(main_df)}')
 
@@ -856,41 +595,9 @@ print(f'Number of obs after bringing in control firm flag: {len(main_df)}')
 Done with criteria! => Match_df contains the relevant pairs
 '''
 
-main_df = (main_df
-           .assign(car=lambda x: np.where(x['Post']==0, 0, x['car']),
-                   Max_Damages=lambda x: np.where(x['Post']==0, 0, x['Max_Damages']))
-           # Keep matches and sued sample only
-           .query('Sued_sample == 1 or ContrFirm == 1')
-           )
-
-# Create a dummy as to whether part of settled or dismissed
-main_df = (main_df
-           .merge(main_df[(main_df['Post']==1) & (main_df['CASESTATUS'].notnull())][['MSCAD_ID', 'Settled', 'Dismissed']],
-                  on=['MSCAD_ID'], how='left', suffixes=['', '_sample'])
-           )
-
-
-#%%
-'''
-Settlement to PostMVE ratio
-'''
-
-main_df = (main_df
-           .assign(SettleToMVE=lambda x: x['SETTLEMENT_AMOUNT'] / (x['PostMVE'] * 1000), # settlement in actual $, PostMVE in $K,
-                   SettledOver05MVE=lambda x: np.where( (x['SettleToMVE'] >= 0.005) & (x['Settled'] == 1), 1, 0) )
-           .assign(SettledOver05MVE=lambda x: np.where( (x['SettleToMVE'].isnull()) & (x['Settled'] == 1),
-                                                        np.nan, x['SettledOver05MVE']))
-           .assign(SettledOver05MVE=lambda x: x.groupby(['MSCAD_ID', 'gvkey'])['SettledOver05MVE'].transform('max'),
-                   SettledUnder05MVE=lambda x: np.where( (x['SettledOver05MVE'] == 0) & (x['Settled'] == 1), 1, 0),
-                   Post_SettledOver05MVE=lambda x: x['SettledOver05MVE'] * x['Post'],
-                   Post_SettledUnder05MVE=lambda x: x['SettledUnder05MVE'] * x['Post'],
-                   # 50M or 05MVE
-                   SettledOver05MVEor50M=lambda x: np.where( ( (x['SETTLEMENT_AMOUNT'] > 50000000) | (x['SettledOver05MVE'] == 1) ) &
-                                                             (x['Settled'] == 1), 1, 0),
-                   Post_SettledOver05MVEor50M=lambda x: x['Post'] * x['SettledOver05MVEor50M'],
-                   SettledUnder05MVEor50M=lambda x: np.where( (x['SettledOver05MVEor50M'] != 1) & (x['Settled'] == 1), 1, 0),
-                   Post_SettledUnder05MVEor50M=lambda x: x['Post'] * x['SettledUnder05MVEor50M'])
-           )
+# Sued and control firms only (car and Max_Damages 0 pre), Settled_sample / Dismissed_sample and the settlement to PostMVE
+# ratio dummies
+main_df = matched_panel(main_df)
 
 
 #%%
@@ -898,16 +605,9 @@ main_df = (main_df
 Keep sample of interest
 '''
 
-main_df = (main_df
-           .query('FILING_DATE <= "2011-09-18"')
-           .query('FILING_DATE >= "1996-01-01"')
-           .query('Sued_sample == 1 or ContrFirm == 1')
-           .dropna(subset=['roa', 'btm', 'log_at', 'lt_at', 'Score_t', 'car', 'duvol_PrCrRisk', 'StdDailyRet'])
-           # Keep if they have observations both pre and post for both matched and treated
-           .assign(count=lambda x: x.groupby(['MSCAD_ID'])['gvkey'].transform('count'))
-           .query('count == 4')
-           .drop(['count'], axis=1)
-           )
+# Cases filed 1996-01-01 to 2011-09-18, sued and control firm both with data pre and post
+main_df = keep_sample(main_df, filing_start='1996-01-01', filing_end='2011-09-18',
+                      required=['roa', 'btm', 'log_at', 'lt_at', 'Score_t', 'car', 'duvol_PrCrRisk', 'StdDailyRet'])
 
 
 #%%
@@ -9,17 +9,14 @@ from datetime import datetime
 import numpy as np
 import os
 import pandas as pd
-import pandasql as ps
 import platform
-import sys
-from tqdm import tqdm
 
-if platform.system() == 'Windows':
-	sys.path.append('E:/Dropbox/Python/Custom Modules')
-elif platform.system() == 'Darwin':
-	sys.path.append('/users/antoniskartapanis/Dropbox/Python/Custom Modules')
-
-import Antonis_Modules as ak
+from litrep import wrds
+from litrep.arcube import ARCube
+from litrep.industries import sic2
+from litrep.linktable import LinkResolver
+from litrep.intervals import interval_join
+from litrep.peers import IndustryPeers
 
 pd.set_option('display.max_columns', 999,
               'display.width', 1000)
@@ -55,15 +52,11 @@ Identify permno and industry
 
 
 # LinkTable
-linktable_df = (pd
-                # Import Linktable and keep relevant flags
-                .read_parquet('{}/crsp_ccmxpf_linktable_20210621.gzip'.format(wrds_loc))
-                .query("linktype  in ['LU', 'LC', 'LN', 'LS'] and linkprim in ['P', 'C']")
-                .assign(linkdt=lambda x: pd.to_datetime(x['linkdt']),
-                        linkenddt=lambda x: pd.to_datetime(x['linkenddt']))
-                # Replace missing end date with file date and keep only relevant columns past 1990
-                .assign(linkenddt=lambda x: x['linkenddt'].fillna(pd.to_datetime('2021-06-21')))
-                .filter(['gvkey', 'lpermno', 'linkdt', 'linkenddt'])
+linktable_df = (wrds
+                # Import Linktable, keep relevant flags and only firms in our sample (missing end date is set to file date)
+                .load_linktable(gvkeys=set(main_df['gvkey']), wrds_loc=wrds_loc)
+                # Keep only relevant columns past 1990
+                .filter(['gvkey', 'permno', 'linkdt', 'linkenddt'])
                 .query('linkenddt >= "1990-01-01"')
                 # If start date prior to 1990, then make it 1990
                 .assign(start_temp=pd.to_datetime('1990-01-01'),
@@ -71,36 +64,22 @@ linktable_df = (pd
                                                   x['start_temp'],
                                                   x['linkdt']))
                 .drop(['start_temp'], axis=1)
-                # Take care of permno
-                .rename(columns={'lpermno': 'permno'})
-                .assign(permno=lambda x: pd.to_numeric(x['permno'], downcast='integer'))
-                # Numeric gvkey and keep only those in our sample
-                .assign(gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
-                .query('gvkey in @main_df.gvkey.unique()')
                 )
 
-# Create a timeseries and merge
-linktable_ts_df = (ak
-                   .create_ts_v2(linktable_df, 'linkdt', 'linkenddt', 'D')
-                   .rename(columns={'date': 'end_date'})
-                   )
-
+# Permno linked on end_date (lowest permno if more than one link)
 main_df = (main_df
-           .merge(linktable_ts_df, on=['gvkey', 'end_date'], how='left')
+           .pipe(LinkResolver(linktable_df).merge_permno, 'end_date')
            .sort_values(by=['MSCAD_ID', 'gvkey', 'permno'])
            .drop_duplicates(subset=['MSCAD_ID', 'gvkey'], keep='first')
            )
 
-del linktable_df, linktable_ts_df
+del linktable_df
 
 
 # Bring in historical data from CRSP
-dsenames_df = (pd
-               .read_parquet('{}/crsp_dsenames_20210621.gzip'.format(wrds_loc),
-                             columns=['permno', 'namedt', 'nameendt', 'siccd'])
-               .assign(namedt=lambda x: pd.to_datetime(x['namedt']),
-                       nameendt=lambda x: pd.to_datetime(x['nameendt']),
-                       sic2=lambda x: x['siccd']//100)
+dsenames_df = (wrds
+               .load_names('crsp_dsenames', columns=['permno', 'namedt', 'nameendt', 'siccd'], wrds_loc=wrds_loc)
+               .assign(sic2=lambda x: sic2(x['siccd']))
                .query('nameendt >= "1990-01-01"')
                .drop(['siccd'], axis=1)
                # If start date prior to 1990, then make it 1990
@@ -111,18 +90,12 @@ dsenames_df = (pd
                .drop(['start_temp'], axis=1)
                )
 
-dsenames_ts_df = (ak
-                  .create_ts_v2(dsenames_df, 'namedt', 'nameendt', 'D')
-                  .rename(columns={'date': 'end_date'})
-                  )
-
+# Industry of the permno on end_date
 main_df = (main_df
-           .merge(dsenames_ts_df, on=['permno', 'end_date'], how='left')
+           .pipe(interval_join, dsenames_df, 'end_date', 'namedt', 'nameendt', on='permno')
            .assign(sic2=lambda x: pd.to_numeric(x['sic2'], downcast='integer'))
            )
 
-del dsenames_df
-
 
 #%%
 '''
@@ -130,44 +103,30 @@ Create a panel and bring in all potential matches
 '''
 
 
-# Load Data
-dsi_df = (pd
-          .read_parquet('{}/crsp_dsi_20210621.gzip'.format(wrds_loc), columns=['date', 'vwretd'])
-          .assign(date=lambda x: pd.to_datetime(x['date']))
-          )
-dsf_df = (pd
-          .read_parquet('{}/crsp_dsf_20210621.gzip'.format(wrds_loc),
-                        columns=['permno', 'ret', 'date'])
-          .assign(date=lambda x: pd.to_datetime(x['date']))
-          .merge(dsi_df, on=['date'], how='left')
-          .assign(ar=lambda x: x['ret'] - x['vwretd'])
-          .drop(['ret', 'vwretd'], axis=1)
-          .dropna(subset=['ar'])
-          )
-del dsi_df
+# Industry membership intervals and abnormal returns (ret - vwretd) of every permno and trading day
+peers = IndustryPeers(dsenames_df, ARCube.open(wrds_loc=wrds_loc))
 
 
 def get_industry_car(input_df):
 
-	return (ak
-	        .create_ts_v2(input_df, 'start_date', 'end_date', 'D')
-	        # Bring in returns --- We first bring in all permnos that have the same sic2 on that date and then we bring in returns
-	        .merge(dsenames_ts_df.rename(columns={'end_date': 'date'}), on=['date', 'sic2'], how='left', suffixes=['_orig', ''])
-	        .merge(dsf_df, on=['permno', 'date'], how='left')
-	        # Calculate Cumulative Abnormal Returns for each firm --- Remember we care about MSCAD_ID-gvkey as each MSCAD_ID has multiple
-	        # firms given the entropy balance design
-	        .sort_values(by=['MSCAD_ID', 'gvkey', 'date', 'permno'])
-	        .groupby(['MSCAD_ID', 'gvkey', 'permno'], as_index=False)['ar'].sum()
-	        # Now across all industry firms, find average and median
-	        .groupby(['MSCAD_ID', 'gvkey'], as_index=False).agg(AvgIndustryCAR=('ar', 'mean'),
-	                                                            MedianIndustryCAR=('ar', 'median'))
+	# CAR of every permno with the same sic2 over [start_date, end_date] (days in the industry only) --- Remember we care about
+	# MSCAD_ID-gvkey as each MSCAD_ID has multiple firms given the entropy balance design. Then, across all industry firms, the
+	# average and median
+	ind_car_df = peers.car(input_df, 'sic2', 'start_date', 'end_date')
+
+	return (input_df
+	        .filter(['MSCAD_ID', 'gvkey'])
+	        .assign(AvgIndustryCAR=ind_car_df['mean'],
+	                MedianIndustryCAR=ind_car_df['median'])
+	        .dropna(subset=['AvgIndustryCAR'])
+	        .drop_duplicates(subset=['MSCAD_ID', 'gvkey'])
 	        )
 
 
 ind_ar_df = get_industry_car(main_df)
 main_df = main_df.merge(ind_ar_df, on=['MSCAD_ID', 'gvkey'], how='left')
 
-del dsf_df, dsenames_ts_df
+del peers, dsenames_df
 
 
 #%%
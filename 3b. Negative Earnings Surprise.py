@@ -8,11 +8,12 @@
 import numpy as np
 import os
 import pandas as pd
-import pandasql as ps
-import sys
 
-sys.path.append('E:/Dropbox/Python/Custom Modules')
-import Antonis_Modules as ak
+from litrep import warehouse, wrds
+from litrep.intervals import asof_join
+from litrep.linktable import LinkResolver
+from litrep.panels import expand
+from litrep.quarters import QuarterIndex
 
 pd.set_option('display.max_columns', 100,
               'display.width', 1000)
@@ -48,36 +49,25 @@ del sued_df
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
 
 # Load quarterly compustat
-compq_df = (pd
-            .read_parquet(f'{wrds_loc}/comp_fundq_20210621.gzip',
-                          columns=['gvkey', 'indfmt', 'datafmt', 'popsrc', 'consol', 'curcdq', 'rdq', 'datadate', 'ibq', 'fyearq',
-                                   'fqtr'])
-            # Usual filters
-            .query('indfmt == "INDL" and datafmt == "STD" and popsrc == "D" and consol == "C" and curcdq == "USD"')
+compq_df = (wrds
+            # Usual filters are applied while scanning the file
+            .load_fundq(columns=['gvkey', 'rdq', 'datadate', 'ibq', 'fyearq', 'fqtr'], gvkeys=set(main_df['gvkey']),
+                        wrds_loc=wrds_loc)
             .drop_duplicates(subset=['gvkey', 'rdq'])
-            # Fix Datadate format
-            .assign(rdq=lambda x: pd.to_datetime(x['rdq']),
-                    datadate=lambda x: pd.to_datetime(x['datadate']),
-                    gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'),
-                    fyq=lambda x: (x['fyearq']-1) * 4 + x['fqtr'])
+            .assign(fyq=lambda x: (x['fyearq']-1) * 4 + x['fqtr'])
             .filter(['gvkey', 'rdq', 'datadate', 'fyq', 'ibq'])
             .dropna(subset=['gvkey', 'rdq'])
-            .assign(date=lambda x: x['rdq'])
             )
 
 # Identify negative new using prior year's same quarter's earnings
-compq_df = (compq_df
-            .merge(compq_df[['gvkey', 'fyq', 'ibq']].assign(fyq=lambda x: x['fyq'] + 4), on=['gvkey', 'fyq'], how='left',
-                   suffixes=['', '_pq4'])
+quarters = (QuarterIndex(compq_df)
+            .assign(ibq_pq4=lambda x: x.shifted('ibq', -4))
             .assign(NegSurpriseIbq=lambda x: np.where(x['ibq'] < x['ibq_pq4'], 1, 0))
             .assign(NegSurpriseIbq=lambda x: np.where(x[['ibq', 'ibq_pq4']].isnull().max(axis=1), np.nan, x['NegSurpriseIbq']))
-            .filter(['gvkey', 'date', 'rdq', 'datadate', 'NegSurpriseIbq'])
-            .drop_duplicates()
             )
 
-# Keep only one observation per Case-gvkey; create a panel dataset for the 10 days leading up to and including loss end date (or
-# date with lowest return for the control firms) and bring in compustat data if rdq date within that period (rdq date has been renamed
-# to date)
+# Keep only one observation per Case-gvkey; bring in compustat data if the rdq date is within the 10 days leading up to and including
+# loss end date (or date with lowest return for the control firms) - the rdq date is the panel date
 panel_df = (main_df
             .query('Post == 1')
             .assign(end_date=lambda x: np.where(x['Sued_sample']==1, x['LOSS_END_DATE'], x['LowestRetDate']),
@@ -86,15 +76,15 @@ panel_df = (main_df
             .reset_index(drop=True)
             .dropna()
             )
-panel_df = (ak
-            .create_ts(panel_df, 'start_date', 'end_date', 'D')
-            .merge(compq_df, on=['gvkey', 'date'], how='inner')
+panel_df = (quarters
+            .announced(panel_df, 'start_date', 'end_date', columns=['rdq', 'datadate', 'NegSurpriseIbq'])
+            .assign(date=lambda x: x['rdq'])
 			.sort_values(by=['MSCAD_ID', 'gvkey', 'NegSurpriseIbq'])
 			.drop_duplicates(subset=['MSCAD_ID', 'gvkey'], keep='last')
             .filter(['MSCAD_ID', 'date', 'gvkey', 'rdq', 'datadate', 'NegSurpriseIbq'])
             .assign(EA_around_BadNews=1)
             )
-del compq_df
+del compq_df, quarters
 
 print(f'Number of observations with an Earnings Announcement in the 10 days leading to, and including, the day of interest: '
       f'{len(panel_df):,}')
@@ -108,30 +98,16 @@ print(f'Number of observations with an Earnings Announcement in the 10 days lead
 '''
  Bring in permno: CRSP - Compustat linktable
 '''
-linktable_df = (pd
-                # Import Linktable and keep relevant flags
-                .read_parquet('G:/Wrds data/zip files/202106/crsp_ccmxpf_linktable_20210621.gzip')
-                .query("linktype  in ['LU', 'LC', 'LN', 'LS'] and linkprim in ['P', 'C']")
-                .assign(linkdt=lambda x: pd.to_datetime(x['linkdt']),
-                        linkenddt=lambda x: pd.to_datetime(x['linkenddt'].fillna('2021-06-21')),
-                        gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
-                )
-sqlcode = '''
-            select a.MSCAD_ID, a.gvkey, b.lpermno as permno
-            from panel_df as a left join linktable_df as b
-            on a.gvkey = b.gvkey and
-                date(b.linkdt) <= date(a.date) and
-                date(a.date) <= date(b.linkenddt)
-          '''
-temp_df = ps.sqldf(sqlcode, locals())
+# Import Linktable and keep relevant flags
+link = LinkResolver.from_wrds(gvkeys=set(panel_df['gvkey']), wrds_loc=wrds_loc)
 panel_df = (panel_df
-            .merge(temp_df, on=['MSCAD_ID', 'gvkey'], how='left')
-            # Should not have any duplicates, but in case we do, let's keep the last permno
+            # If more than one link on the date, keep the last permno
+            .pipe(link.merge_permno, 'date', prefer='highest')
             .sort_values(by=['MSCAD_ID', 'gvkey', 'permno'])
             .drop_duplicates(subset=['MSCAD_ID', 'gvkey'], keep='last')
             )
 
-del temp_df, linktable_df
+del link
 
 print(f'Number of observations with an Earnings Announcement in the 10 days leading to, and including, the day of interest after'
       f'bringing in permno: {len(panel_df):,}')
@@ -154,13 +130,14 @@ print(f'Number of observations with an Earnings Announcement in the 10 days lead
 '''
 Load forecasts and keep relevant ones
 '''
-ibes_df = (pd
-           .read_parquet(f'G:/Wrds Data/zip files/202111/ibes_detu_epsus_20211101.gzip')
+ibes_df = (wrds
+           # Only quarterly USD forecasts for the tickers in our sample
+           .read('ibes_detu_epsus', isin={'ticker': set(panel_df['ibtic'].dropna())},
+                 equals={'fpi': ['6', '7'], 'report_curr': 'USD'}, wrds_loc='G:/Wrds Data/zip files/202111', vintage='20211101')
            .assign(actdats=lambda x: pd.to_datetime(x['actdats']),
                    fpedats=lambda x: pd.to_datetime(x['fpedats']),
                    anndats=lambda x: pd.to_datetime(x['anndats']),
                    revdats=lambda x: pd.to_datetime(x['revdats']))
-           .query('fpi in ["6", "7"] and report_curr == "USD"')
            .rename(columns={'ticker': 'ibtic'})
            )
 rel_ibes_df = (panel_df
@@ -170,8 +147,7 @@ rel_ibes_df = (panel_df
                .drop(['date'], axis=1)
                .rename(columns={'datadate': 'fpedats'})
                )
-rel_ibes_df = (ak
-               .create_ts(rel_ibes_df, 'start_date', 'end_date', 'D')
+rel_ibes_df = (expand(rel_ibes_df, 'start_date', 'end_date', 'D')
 			   .rename(columns={'date': 'revdats'})
                .merge(ibes_df, on=['ibtic', 'revdats', 'fpedats'], how='left')
 			   # The vast majority are in D, so let's keep those
@@ -206,46 +182,28 @@ print(f'Number of forecasts for the relevant period issued during the 90 days le
 '''
 Bring in CRSP adjustment factors as of the most recent date prior to either the announcement or the forecast date
 '''
-dsi_df = (pd
-          .read_parquet(f'{wrds_loc}/crsp_dsi_20210621.gzip', columns=['date', 'vwretd'])
-          .assign(date=lambda x: pd.to_datetime(x['date']))
+dsf_df = (warehouse
+          .load_dsf(columns=['date', 'permno', 'cfacshr'], permnos=set(rel_ibes_df['permno'].dropna()), wrds_loc=wrds_loc)
+          .rename(columns={'date': 'cfacshr_date'})
           )
-dsf_df = (pd
-          .read_parquet(f'{wrds_loc}/crsp_dsf_20210621.gzip', columns=['date', 'permno', 'cfacshr'])
-          .assign(date=lambda x: pd.to_datetime(x['date']))
-          )
-# Forecast...
-temp_df = (pd
-           .concat([rel_ibes_df[['MSCAD_ID', 'permno', 'revdats']].assign(date=lambda x: x['revdats'] - pd.DateOffset(days=i))
-                    for i in range(0, 10)])
-           .drop_duplicates()
-		   .merge(dsi_df, on=['date'], how='inner')
-           .merge(dsf_df, on=['permno', 'date'], how='inner')
-           .sort_values(by=['MSCAD_ID', 'permno', 'revdats', 'date'])
-           .drop_duplicates(subset=['MSCAD_ID', 'permno', 'revdats'], keep='last')
-           .rename(columns={'cfacshr': 'forecast_cfacshr'})
-           .filter(['MSCAD_ID', 'permno', 'revdats', 'forecast_cfacshr'])
-           )
-rel_ibes_df = rel_ibes_df.merge(temp_df, on=['MSCAD_ID', 'permno', 'revdats'], how='left')
+# Forecast... latest trading day with a factor in the 10 days up to (and including) the forecast date
+rel_ibes_df = (rel_ibes_df
+               .pipe(asof_join, dsf_df, 'revdats', 'cfacshr_date', on='permno', direction='backward', within=9)
+               .rename(columns={'cfacshr': 'forecast_cfacshr'})
+               .drop(['cfacshr_date'], axis=1)
+               )
 
 print(f'Number of forecasts for the relevant period issued during the 90 days leading to (and including) earnings announcement after \n'
       f'merging in actual values and adjustment factor for forecast date: {len(rel_ibes_df):,}')
 
 
-# Actual...
-temp_df = (pd
-           .concat([rel_ibes_df[['MSCAD_ID', 'permno', 'actual_anndats']].assign(date=lambda x: x['actual_anndats'] - pd.DateOffset(days=i))
-                    for i in range(0, 10)])
-           .drop_duplicates()
-		   .merge(dsi_df, on=['date'], how='inner')
-           .merge(dsf_df, on=['permno', 'date'], how='inner')
-           .sort_values(by=['MSCAD_ID', 'permno', 'date'])
-           .drop_duplicates(subset=['MSCAD_ID', 'permno'], keep='last')
-           .rename(columns={'cfacshr': 'actual_cfacshr'})
-           .filter(['MSCAD_ID', 'permno', 'actual_anndats', 'actual_cfacshr'])
-           )
+# Actual... same, but only the announcement with the latest factor date per case keeps its factor
 rel_ibes_df = (rel_ibes_df
-               .merge(temp_df, on=['MSCAD_ID', 'permno', 'actual_anndats'], how='left')
+               .pipe(asof_join, dsf_df, 'actual_anndats', 'cfacshr_date', on='permno', direction='backward', within=9)
+               .rename(columns={'cfacshr': 'actual_cfacshr'})
+               .assign(latest=lambda x: x.groupby(['MSCAD_ID', 'permno'])['cfacshr_date'].transform('max'),
+                       actual_cfacshr=lambda x: x['actual_cfacshr'].where(x['cfacshr_date'] == x['latest']))
+               .drop(['cfacshr_date', 'latest'], axis=1)
                )
 
 print(f'Number of forecasts for the relevant period issued during the 90 days leading to (and including) earnings announcement after \n'
@@ -37,6 +37,10 @@ import gc
 import numpy as np
 import pandas as pd
 
+from litrep import warehouse, wrds
+from litrep.linktable import LinkResolver
+from litrep.quarters import QuarterIndex
+
 pd.set_option('display.max_columns', 100,
               'display.width', 1000)
 
@@ -112,12 +116,9 @@ Let's Link to permno
 '''
 
 # Import dsenames and keep relevant columns
-dsenames_df = (pd
-               .read_parquet(r'G:/WRDS data/zip files/202106/crsp_dsenames_20210621.gzip',
-                             columns=['permno', 'namedt', 'nameendt', 'shrcd', 'ncusip'])
-               .assign(namedt=lambda x: pd.to_datetime(x['namedt']),
-                       nameendt=lambda x: pd.to_datetime(x['nameendt']),
-                       cusip6=lambda x: x['ncusip'].str[:6])
+dsenames_df = (wrds
+               .load_names('crsp_dsenames', columns=['permno', 'namedt', 'nameendt', 'shrcd', 'ncusip'])
+               .assign(cusip6=lambda x: x['ncusip'].str[:6])
                .drop(['ncusip'], axis=1)
                )
 
@@ -137,21 +138,15 @@ Let's get gvkey
 '''
 
 # CRSP - Compustat linktable
-linktable_df = (pd
-                .read_parquet('G:/WRDS data/zip files/202106/crsp_ccmxpf_linktable_20210621.gzip')
-                .assign(linkdt=lambda x: pd.to_datetime(x['linkdt']),
-                        linkenddt=lambda x: pd.to_datetime(x['linkenddt'].fillna('2021-06-21')),
-                        gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
-                .query("linktype  in ['LU', 'LC', 'LN', 'LS'] and linkprim in ['P', 'C']")
-                .filter(['gvkey', 'lpermno', 'linkdt', 'linkenddt'])
-                .rename(columns={'lpermno':'permno'})
+linktable_df = (wrds
+                .load_linktable(permnos=set(t1_permno_df['permno']))
+                .filter(['gvkey', 'permno', 'linkdt', 'linkenddt'])
                 )
 
-# Link to t1_permno_df --- Keep if TRANDATE between linkperiod
+# Link to t1_permno_df --- Keep if TRANDATE between linkperiod (every gvkey linked, dups handled below)
 t1_perm_gvkey_df = (t1_permno_df
                     .filter(['unq_identifier', 'trandate', 'permno', 'shrcd'])
-                    .merge(linktable_df, on='permno', how='inner')
-                    .query('linkdt <= trandate and trandate <= linkenddt')
+                    .pipe(LinkResolver(linktable_df).merge_gvkey, 'trandate', how='inner', prefer='all')
                     .filter(['unq_identifier', 'permno', 'shrcd', 'gvkey'])
                     )
 
@@ -185,10 +180,10 @@ del t1_perm_gvkey_df
 Get number of shares outstanding on that day
 '''
 
-dsf_df = (pd
-          .read_parquet('G:/WRDS data/zip files/202106/crsp_dsf_20210621.gzip', columns=['permno', 'date', 'shrout'])
-          .assign(trandate=lambda x: pd.to_datetime(x['date']))
-          .drop(['date'], axis=1)
+dsf_df = (warehouse
+          .load_dsf(columns=['permno', 'date', 'shrout'], start=t1_df['trandate'].min(), end=t1_df['trandate'].max(),
+                    permnos=set(t1_df['permno']))
+          .rename(columns={'date': 'trandate'})
           )
 
 t1_df = (t1_df
@@ -205,38 +200,23 @@ del dsf_df
 Bring in Compustat Quarterly
 '''
 
-compq_df = (pd
-            .read_parquet('G:/WRDS data/zip files/202106/comp_fundq_20210621.gzip',
-                          columns=['indfmt', 'datafmt', 'popsrc', 'consol', 'curcdq', 'prccq',
-                                   'cshoq', 'gvkey', 'datadate', 'fyearq', 'fqtr', 'rdq'])
-            .query("indfmt == 'INDL' and datafmt == 'STD' and popsrc == 'D' and consol == 'C' and curcdq == 'USD'")
+compq_df = (wrds
+            # Usual filters are applied while scanning the file
+            .load_fundq(columns=['prccq', 'cshoq', 'gvkey', 'datadate', 'fyearq', 'fqtr', 'rdq'], gvkeys=set(t1_df['gvkey']))
             .assign(mve=lambda x: x['cshoq'] * x['prccq'],
-                    fyq=lambda x: (x['fyearq'] - 1) * 4 + x['fqtr'],
-                    datadate=lambda x: pd.to_datetime(x['datadate']),
-                    rdq=lambda x: pd.to_datetime(x['rdq']),
-                    gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
+                    fyq=lambda x: (x['fyearq'] - 1) * 4 + x['fqtr'])
             # Deal with dups
             .sort_values(by=['gvkey', 'fyq', 'datadate'])
             .drop_duplicates(subset=['gvkey', 'fyq'], keep='last')
             .filter(['gvkey', 'fyearq', 'fyq', 'datadate', 'mve', 'rdq'])
-            )
-
-compq_df = (compq_df
-            # Identify when the quarter starter, prior quarter RDQ, and initial MVE
-            .merge(compq_df[['gvkey', 'fyq', 'mve', 'datadate', 'rdq']].assign(fyq=lambda x: x['fyq'] + 1),
-                   on=['gvkey', 'fyq'], how='left', suffixes=['', '_pq'])
-            # Also need nq_datadate
-            .merge(compq_df[['gvkey', 'fyq', 'datadate']].assign(fyq=lambda x: x['fyq'] - 1),
-                   on=['gvkey', 'fyq'], how='left', suffixes=['', '_nq'])
-            # If missing pq and nq datadate then just assume 90 day difference
-            .assign(datadate_pq=lambda x: x['datadate_pq'].fillna(x['datadate'] - pd.DateOffset(months=3)),
-                    datadate_nq=lambda x: x['datadate_nq'].fillna(x['datadate'] + pd.DateOffset(months=3)) )
-            # Keep relevant columns and remove empty
-            .filter(['gvkey', 'datadate', 'fyearq', 'datadate_pq', 'datadate_nq', 'mve_pq', 'rdq_pq', 'rdq', 'fyq'])
-            .dropna(subset=['mve_pq', 'rdq_pq', 'rdq'])
             .rename(columns={'fyearq': 'fyear'})
             )
 
+# Identify when the quarter starter, prior quarter RDQ, and initial MVE, and also nq_datadate (if missing pq and nq datadate
+# then just assume 90 day difference). Remove quarters with empty mve_pq, rdq_pq or rdq
+quarters = QuarterIndex(compq_df, mve='mve', dropna=['mve_pq', 'rdq_pq', 'rdq'])
+del compq_df
+
 
 #%%
 '''
@@ -244,13 +224,9 @@ Identify quarter of trade --- what we really care about is rdq dates (I don't lo
 get a little bit mixed, but following Billings)
 '''
 
-t1_df = (t1_df
-         .merge(compq_df, on=['gvkey'], how='inner')
-         .query('rdq_pq <= trandate and trandate < rdq')
-         # If multiple for whatever reason, keep the latest datadate
-         .sort_values(by=['unq_identifier', 'datadate'])
-         .drop_duplicates(subset=['unq_identifier'], keep='last')
-         )
+# rdq_pq <= trandate < rdq - if multiple for whatever reason, keep the latest datadate
+t1_df = quarters.containing(t1_df, 'trandate', columns=['datadate', 'fyear', 'datadate_pq', 'datadate_nq', 'mve_pq', 'rdq_pq',
+                                                       'rdq', 'fyq'])
 
 
 #%%
@@ -276,7 +252,7 @@ Calculate standard deviation over tm7 to tm1 and create indicator for abnormal s
 temp_df = (pd
            .concat(t1_summ_df[['gvkey', 'fyear', 'datadate', 'fyq']].assign(fyq=lambda x: x['fyq']-i).copy() for i in range(1, 8))
            # Ensure the quarter exists
-           .merge(compq_df[['gvkey', 'fyq']], on=['gvkey', 'fyq'], how='inner')
+           .merge(quarters[['gvkey', 'fyq']], on=['gvkey', 'fyq'], how='inner')
            # Bring in insiders data and calculate standard deviation - set missing values to 0
            .merge(t1_summ_df[['gvkey', 'fyq', 'SharesSoldToShrout']], on=['gvkey', 'fyq'], how='left')
            .fillna(0)
@@ -293,7 +269,7 @@ t1_summ_df = (t1_summ_df
               .filter(['gvkey', 'datadate', 'fyear', 'rdq', 'datadate_nq', 'Sale_TV_sc', 'Abn_Sale_Ind'])
               )
 
-del compq_df
+del quarters
 
 #%%
 '''
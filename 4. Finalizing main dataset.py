@@ -8,6 +8,9 @@ import numpy as np
 import os
 import pandas as pd
 
+from litrep.industries import sic2
+from litrep.quarters import QuarterIndex
+
 pd.set_option('display.max_columns', 999,
               'display.width', 1000,
               'display.max_colwidth', 200)
@@ -28,7 +31,7 @@ main_df = (pd
                    btm=lambda x: np.where(x['btm'] < 0, 0, x['btm']),
                    log_btm=lambda x: np.log(x['btm'] + 1),
                    log_Score_t=lambda x: np.log(x['Score_t']),
-                   sic2=lambda x: x['sich'] // 100,
+                   sic2=lambda x: sic2(x['sich']),
                    gvkey_mscad_id=lambda x: x.apply(lambda y: f'{y["MSCAD_ID"]} - {y["gvkey"]}', axis=1),
                    # Multiply StdDailyRet for presentation purposes (otherwise the DiD for the descriptives doesn't show the proper
                    # change)
@@ -114,6 +117,7 @@ ins_trad_df = (pd
                .assign(gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
                .rename(columns={'datadate_nq': 'nq_datadate'})
                )
+quarters = QuarterIndex(ins_trad_df, fyq=None)
 
 # Post Period: Keep if lated rdq <= DateOfInterest <= nq_datadate
 # Notes: It's ok for rdq == DateOfInterest given that in the insider trading code file we keep observations
@@ -123,30 +127,26 @@ ins_trad_df = (pd
 main_df['DateOfInterest'] = np.where(main_df['CASESTATUS'].isnull(),
                                      main_df['LowestRetDate'],
                                      main_df['LOSS_END_DATE'])
-temp_df = pd.merge(main_df[['MSCAD_ID', 'gvkey', 'Post', 'DateOfInterest', 'datadate']],
-                   ins_trad_df, on=['gvkey'], how='left', suffixes=('_orig', '_ins_tr'))
-temp1_df = temp_df[(temp_df['rdq'] <= temp_df['DateOfInterest']) &
-                   (temp_df['DateOfInterest'] <= temp_df['nq_datadate']) &
-                   (temp_df['Post'] == 1)]
+temp_df = main_df[['MSCAD_ID', 'gvkey', 'Post', 'DateOfInterest', 'datadate']]
+temp1_df = quarters.containing(temp_df[temp_df['Post'] == 1], 'DateOfInterest', lower='rdq', upper='nq_datadate',
+                               closed='both', columns=['Sale_TV_sc', 'Abn_Sale_Ind'], keep=None)
 
 # Pre-period: Keep the quarter of fiscal year end in the pre period
-temp2_df = temp_df[(temp_df['datadate_orig'] == temp_df['datadate_ins_tr']) &
-                   (temp_df['Post'] == 0)]
+temp2_df = quarters.at_datadate(temp_df[temp_df['Post'] == 0], 'datadate', columns=['Sale_TV_sc', 'Abn_Sale_Ind'])
 
 # Append the two
-temp_df = temp1_df.append(temp2_df)
+temp_df = pd.concat([temp1_df, temp2_df])
 
 # For scaling purpose multiply by 100
 temp_df['Sale_TV_sc'] = temp_df['Sale_TV_sc'] * 100
 
 # Merge back
-main_df = pd.merge(main_df, temp_df.drop(['DateOfInterest', 'datadate_orig', 'fyear', 'datadate_ins_tr', 'nq_datadate', 'rdq'],
-                                         axis=1),
+main_df = pd.merge(main_df, temp_df.drop(['DateOfInterest', 'datadate'], axis=1),
                    on=['MSCAD_ID', 'gvkey', 'Post'], how='left')
 main_df[['Abn_Sale_Ind', 'Sale_TV_sc']] = main_df[['Abn_Sale_Ind', 'Sale_TV_sc']].fillna(0)
 
 # Clean data
-del temp_df, temp1_df, temp2_df, ins_trad_df
+del temp_df, temp1_df, temp2_df, ins_trad_df, quarters
 
 
 #%%
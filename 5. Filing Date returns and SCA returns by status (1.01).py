@@ -12,10 +12,11 @@ import pandas as pd
 import seaborn as sns
 import shap
 from sklearn.linear_model import LinearRegression
-import sys
 
-sys.path.append(r'E:\Dropbox\Python\Custom Modules')
-import Antonis_Modules as ak
+from litrep import warehouse
+from litrep.arcube import ARCube
+from litrep.events import EventStudy
+from litrep.fundamentals import Fundamentals
 
 pd.set_option('display.max_columns', 100,
               'display.width', 1000)
@@ -46,22 +47,21 @@ sample_df = sample_df.merge(in_final_df, on=['MSCAD_ID', 'gvkey'], how='inner')
 sample_df = sample_df[sample_df['Post'] == 0]
 
 # DSI
-dsi_df = (pd
-          .read_parquet(f'{wrds_loc}/zip files/202106/crsp_dsi_20210621.gzip', columns=['date', 'vwretd'])
-          .assign(tr_day=lambda x: range(0, len(x)),
-                  date=lambda x: pd.to_datetime(x['date']))
-          )
+dsi_df = warehouse.load_dsi(columns=['date', 'vwretd'], wrds_loc=f'{wrds_loc}/zip files/202106')
 
-# DSF
+# DSF (prices only - abnormal returns come from the AR cube)
+cube = ARCube.open(wrds_loc=f'{wrds_loc}/zip files/202106')
 rel_permno_set = set(sample_df['permno'].unique())
-dsf_df = (pd
-          .read_parquet(f'{wrds_loc}/zip files/202106/crsp_dsf_20210621.gzip', columns=['permno', 'date', 'ret', 'shrout', 'prc'])
-          .assign(date=lambda x: pd.to_datetime(x['date']),
-                  MVE=lambda x: (x['prc'].abs() * x['shrout']) / 1000) # Divide by 1000 to get it in M
-          .query('date >= "1991-01-01" and permno in @rel_permno_set')
+dsf_df = (warehouse
+          .load_dsf(columns=['permno', 'date', 'shrout', 'prc'], start='1991-01-01', permnos=rel_permno_set,
+                    wrds_loc=f'{wrds_loc}/zip files/202106')
+          .assign(MVE=lambda x: (x['prc'].abs() * x['shrout']) / 1000, # Divide by 1000 to get it in M
+                  ar=lambda x: cube.values(x['permno'], x['date']))
           .drop(['prc', 'shrout'], axis=1)
           )
-del rel_permno_set
+del rel_permno_set, cube
+
+study = EventStudy(dsi_df, dsf_df, id_col='permno', ar='ar')
 
 
 #%%
@@ -71,53 +71,19 @@ Function to calculate abnormal returns on a daily basis around window of interes
 
 def get_daily_ar(input_df, date_of_int, out_name, post_window):
 
-	# Create a temporary dataframe
-	temp_df = input_df.copy()
-
-	# Expand by 10 days, bring in trading day number and keep the earliest (This is the day of or if during
-	# non-trading days, then the first day after)
-	temp_df = (temp_df
-	           .assign(start=lambda x: x[date_of_int],
-	                   end=lambda x: x[date_of_int] + pd.DateOffset(days=10))
-	           .reset_index(drop=True)
-	           )
-
-	temp_df = ak.create_ts(temp_df, 'start', 'end')
-	temp_df = (temp_df
-	           .merge(dsi_df, on='date', how='left')
-	           .dropna(subset=['tr_day'])
-	           .sort_values(by=['MSCAD_ID', 'permno', 'date'])
-	           .drop_duplicates(subset=['MSCAD_ID', 'permno'], keep='first')
-	           )
-
-	# Daiy returns for window of interest
-	car_df = pd.DataFrame()
-	for i in range(-post_window, post_window + 1):
-		temp1_df = (temp_df
-					.copy()
-					.filter(['MSCAD_ID', 'permno', 'tr_day'])
-		            .assign(tr_day=lambda x: x['tr_day'] + i,
-                            rel_day=i)
-		            )
-		car_df = car_df.append(temp1_df, sort=False)
-
-	car_df = (car_df
-	          .merge(dsi_df, on='tr_day', how='left')
-	          .merge(dsf_df, on=['permno', 'date'], how='left')
+	# Daily abnormal returns from -post_window to post_window trading days around the first trading day on or after
+	# date_of_int (within 10 days)
+	car_df = (study
+	          .paths(input_df.filter(['MSCAD_ID', 'permno', date_of_int]), date_of_int, -post_window, post_window)
+	          .assign(type=out_name)
 	          .sort_values(by=['MSCAD_ID', 'date'])
-	          .assign(ar=lambda x: x['ret'] - x['vwretd'],
-	                  car=lambda x: x.groupby(['MSCAD_ID', 'permno'])['ar'].cumsum(),
-	                  type=out_name)
 	          .filter(['MSCAD_ID', 'permno', 'date', 'rel_day', 'type', 'ar', 'car']))
 
 	# Get MVE the day prior to the CAR accumulation period
-	temp_df = (temp_df
-			   .filter(['MSCAD_ID', 'permno', 'tr_day'])
-	           .assign(tr_day=lambda x: x['tr_day'] - post_window - 1)
-	           .merge(dsi_df, on='tr_day', how='left')
-	           .merge(dsf_df, on=['permno', 'date'], how='left')
-			   .filter(['MSCAD_ID', 'permno', 'MVE'])
-	           .rename(columns={'MVE': 'MVE_prior_to_CAR_start'})
+	temp_df = (input_df
+	           .filter(['MSCAD_ID', 'permno', date_of_int])
+	           .assign(MVE_prior_to_CAR_start=lambda x: study.value_at(x, date_of_int, -post_window - 1, 'MVE'))
+	           .filter(['MSCAD_ID', 'permno', 'MVE_prior_to_CAR_start'])
 	           )
 	car_df = car_df.merge(temp_df, on=['MSCAD_ID', 'permno'], how='left')
 
@@ -189,16 +155,10 @@ comp_df = (pd
                     log_btm=lambda x: np.log(x['btm'] + 1))
            .filter(['gvkey', 'fyear', 'datadate', 'log_at', 'log_btm'])
            )
-comp_df = (comp_df
-           .merge(comp_df[['gvkey', 'fyear', 'datadate']].assign(fyear=lambda x: x['fyear'] - 1), on=['gvkey', 'fyear'],
-                  how='left', suffixes=['', '_ny'])
-           .assign(datadate_ny=lambda x: x['datadate_ny'].fillna(x['datadate'] + pd.DateOffset(years=1)))
-           )
-comp1_df = (sample_df
-			.filter(['MSCAD_ID', 'gvkey', 'FILING_DATE'])
-            .merge(comp_df, on=['gvkey'], how='left')
-            .query('datadate <= FILING_DATE and FILING_DATE < datadate_ny')
-            .drop(['datadate_ny', 'fyear'], axis=1)
+# Fiscal year in effect on the filing date (datadate <= FILING_DATE < next year's datadate)
+comp1_df = (Fundamentals(comp_df)
+            .lookup(sample_df.filter(['MSCAD_ID', 'gvkey', 'FILING_DATE']), 'FILING_DATE', ['datadate', 'log_at', 'log_btm'],
+                    how='inner')
             )
 
 # Import analyst data
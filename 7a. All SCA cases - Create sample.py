@@ -9,16 +9,11 @@ import numpy as np
 import os
 import pandas as pd
 import pandasql as ps
-import platform
 import statsmodels.api as sm
-import sys
 
-if platform.system() == 'Windows':
-	sys.path.append('E:/Dropbox/Python/Custom Modules')
-elif platform.system() == 'Darwin':
-	sys.path.append('/users/antoniskartapanis/Dropbox/Python/Custom Modules')
-
-import Antonis_Modules as ak
+from litrep import warehouse, wrds
+from litrep.intervals import asof_join
+from litrep.linktable import LinkResolver
 
 pd.set_option('display.max_columns', 999,
               'display.width', 1000)
@@ -65,43 +60,25 @@ sued_df = (sued_df
 										         Get Post CPE MVE
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
 
-linktable_df = (pd
-                # Import Linktable and keep relevant flags
-                .read_parquet(f'{wrds_loc}/zip files/202106/crsp_ccmxpf_linktable_20210621.gzip')
-                .query("linktype  in ['LU', 'LC', 'LN', 'LS'] and linkprim in ['P', 'C']")
-                .assign(linkdt=lambda x: pd.to_datetime(x['linkdt']),
-                        linkenddt=lambda x: pd.to_datetime(x['linkenddt'].fillna('2021-06-21')),
-                        gvkey=lambda x: pd.to_numeric(x['gvkey'], downcast='integer'))
-                # Keep relevant ones
-                .query('gvkey in @sued_df.gvkey.unique()')
-                # Create panel data
-                .pipe(ak.create_ts_v2, 'linkdt', 'linkenddt', 'D')
-                .filter(['gvkey', 'lpermno', 'date'])
-                .rename(columns={'lpermno': 'permno'})
-                )
-
-dsf_df = (pd
-          .read_parquet(f'{wrds_loc}/zip files/202106/crsp_dsf_20210621.gzip', columns=['date', 'permno', 'shrout', 'prc'])
-          .assign(date=lambda x: pd.to_datetime(x['date']),
-                  MVE=lambda x: x['shrout'] * x['prc'].abs())
-          .merge(linktable_df, on=['permno', 'date'], how='inner')
+# Import Linktable and keep relevant flags and firms
+linktable_df = wrds.load_linktable(gvkeys=set(sued_df['gvkey']), wrds_loc=f'{wrds_loc}/zip files/202106')
+
+dsf_df = (warehouse
+          .load_dsf(columns=['date', 'permno', 'shrout', 'prc'], permnos=set(linktable_df['permno']),
+                    wrds_loc=f'{wrds_loc}/zip files/202106')
+          .assign(MVE=lambda x: x['shrout'] * x['prc'].abs())
+          # Every gvkey linked to the permno on each day
+          .pipe(LinkResolver(linktable_df).merge_gvkey, 'date', how='inner', prefer='all')
           # If multiple with the same gvkey on a given day, keep the lowest permno
           .sort_values(by=['gvkey', 'date', 'permno'])
           .drop_duplicates(subset=['gvkey', 'date'], keep='first')
           .filter(['gvkey', 'date', 'MVE'])
           )
 
-# Create a panel with 15 days following class period end or lowest return date for control firms
-post_df = (pd
-           .concat([sued_df.assign(date=lambda x: x['LOSS_END_DATE'] + pd.DateOffset(days=i)) for i in range(1, 16)])
-           .filter(['MSCAD_ID', 'gvkey', 'date'])
-           .sort_values(by=['MSCAD_ID', 'gvkey', 'date'])
-           .reset_index(drop=True)
-           # Bring in dsf data
-           .merge(dsf_df, on=['gvkey', 'date'], how='inner')
-           # Keep first post MVE
-           .sort_values(by=['MSCAD_ID', 'gvkey', 'date'])
-           .drop_duplicates(subset=['MSCAD_ID', 'gvkey'], keep='first')
+# First MVE in the 15 days following class period end
+post_df = (sued_df
+           .filter(['MSCAD_ID', 'gvkey', 'LOSS_END_DATE'])
+           .pipe(asof_join, dsf_df, 'LOSS_END_DATE', on='gvkey', direction='forward', inclusive=False, within=15, how='inner')
            .filter(['MSCAD_ID', 'gvkey', 'MVE'])
            .rename(columns={'MVE': 'PostMVE'})
            )
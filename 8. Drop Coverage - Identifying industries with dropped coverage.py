@@ -163,9 +163,10 @@ rep_df['IndustryAdj'] = rep_df['Industry'].apply(lambda x: adjust_name(str(x)))
 
 def identify_industry_drop(lead):
 
+	# Bring in the firm's next year obs to figure out how many firms from this industry continue to have coverage. A self
+	# merge rather than panels.shift: rep_df can hold several rows of a gvkey-year (two sources) and each one counts
 	temp_df = (rep_df
 			   .assign(PostYear=lambda x: x['Year'] + lead)
-			   # Bring in the firm's next year obs to figure out how many firms from this industry continue to have coverage
 			   .merge( (rep_df
 			            .assign(Year=lambda x: x['Year'] - lead)
 						.filter(['gvkey', 'Year', 'Industry', 'IndustryAdj']) ),
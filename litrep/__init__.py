@@ -0,0 +1,3 @@
+'''
+Shared helpers for the litigation and reputation pipeline scripts
+'''
@@ -0,0 +1,30 @@
+'''
+Composite integer keys for the binary searches
+
+An id code and a day number (or fiscal year, quarter or month) are packed into one int64, code * _KEY_SCALE + day +
+_DAY_SHIFT, so that a sorted key array answers (id, date) lookups with searchsorted. Missing dates and numbers come back as
+0 with a validity mask.
+'''
+
+import numpy as np
+import pandas as pd
+
+
+_KEY_SCALE = 1_000_000
+_DAY_SHIFT = 500_000
+
+
+def _days(dates):
+
+	days = np.asarray(pd.to_datetime(pd.Series(np.asarray(dates))), dtype='datetime64[D]')
+	valid = ~np.isnat(days)
+
+	return np.where(valid, days.astype('int64'), 0), valid
+
+
+def _numbers(values):
+
+	values = pd.to_numeric(pd.Series(np.asarray(values)), errors='coerce').to_numpy(dtype='float64')
+	valid = ~np.isnan(values)
+
+	return np.where(valid, values, 0), valid
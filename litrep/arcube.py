@@ -0,0 +1,250 @@
+'''
+Daily abnormal return cube
+
+ar = ret - vwretd for every CRSP security and trading day since 1985 (by default), materialized once per vintage as arrays
+laid out (permno x trading day) next to the CRSP warehouse:
+
+	ar.npy:         abnormal return (float32), missing where there is no return
+	cum_ar.npy:     running sum of ar along each permno's row (float64, one more column than days, starting at 0; missing
+	                returns add nothing)
+	cum_log_ar.npy: the same for log(1 + ar)
+	permnos.npy, dates.npy, vwretd.npy: row and column labels and the market return of each trading day
+
+The arrays are opened memory-mapped, so slicing some permnos or windows only reads their pages. The running sums are kept in
+float64 so that window sums far from the first day do not lose precision.
+
+Usage:
+	python -m litrep.arcube build --start 1985-01-01
+'''
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from litrep import warehouse, wrds
+from litrep._keys import _days
+from litrep.calendar import TradingCalendar
+
+
+def cube_loc(wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+	return f'{warehouse.warehouse_loc(wrds_loc, vintage)}/arcube'
+
+
+#%%
+'''
+Build
+'''
+
+def build(start='1985-01-01', end=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE, loc=None, block_rows=2000):
+	'''
+	Write the cube of a vintage over the trading days in [start, end] (end: last dsi date by default). CRSP daily is read one
+	calendar year at a time
+	'''
+
+	loc = loc or cube_loc(wrds_loc, vintage)
+	os.makedirs(loc, exist_ok=True)
+
+	dsi_df = warehouse.load_dsi(columns=['date', 'vwretd'], start=start, end=end, wrds_loc=wrds_loc, vintage=vintage)
+	dsi_df = dsi_df.drop_duplicates(subset=['date']).sort_values(by=['date']).reset_index(drop=True)
+	calendar = TradingCalendar(dsi_df['date'])
+	market = dsi_df['vwretd'].to_numpy(dtype='float64')
+	years = range(calendar.dates[0].astype('datetime64[Y]').astype(int) + 1970,
+	              calendar.dates[-1].astype('datetime64[Y]').astype(int) + 1971)
+
+	def _year(year, columns):
+		return warehouse.load_dsf(columns=columns, start=max(pd.Timestamp(year, 1, 1), pd.Timestamp(calendar.dates[0])),
+		                          end=min(pd.Timestamp(year, 12, 31), pd.Timestamp(calendar.dates[-1])), wrds_loc=wrds_loc,
+		                          vintage=vintage)
+
+	# Rows: every permno with a daily record over the period
+	permnos = np.unique(np.concatenate([_year(y, ['permno', 'date'])['permno'].to_numpy(dtype='int64') for y in years]))
+	n_days = len(calendar)
+
+	ar = np.lib.format.open_memmap(f'{loc}/ar.npy', mode='w+', dtype='float32', shape=(len(permnos), n_days))
+	for i in range(0, len(permnos), block_rows):
+		ar[i:i + block_rows] = np.nan
+	for year in years:
+		year_df = _year(year, ['permno', 'date', 'ret'])
+		tr_day = calendar.day_number(year_df['date'])
+		on_cal = calendar.date_at(tr_day) == year_df['date'].to_numpy(dtype='datetime64[ns]')
+		rows = np.searchsorted(permnos, year_df['permno'].to_numpy(dtype='int64')[on_cal])
+		cols = tr_day[on_cal]
+		ar[rows, cols] = year_df['ret'].to_numpy(dtype='float64')[on_cal] - market[cols]
+		del year_df
+
+	cum = np.lib.format.open_memmap(f'{loc}/cum_ar.npy', mode='w+', dtype='float64', shape=(len(permnos), n_days + 1))
+	cum_log = np.lib.format.open_memmap(f'{loc}/cum_log_ar.npy', mode='w+', dtype='float64', shape=(len(permnos), n_days + 1))
+	for i in range(0, len(permnos), block_rows):
+		block = ar[i:i + block_rows].astype('float64')
+		with np.errstate(invalid='ignore', divide='ignore'):
+			log_ar = np.log1p(block)
+		cum[i:i + block_rows, 0] = 0
+		cum[i:i + block_rows, 1:] = np.cumsum(np.where(np.isnan(block), 0, block), axis=1)
+		cum_log[i:i + block_rows, 0] = 0
+		cum_log[i:i + block_rows, 1:] = np.cumsum(np.where(np.isfinite(log_ar), log_ar, 0), axis=1)
+	ar.flush()
+	cum.flush()
+	cum_log.flush()
+	del ar, cum, cum_log
+
+	np.save(f'{loc}/permnos.npy', permnos)
+	np.save(f'{loc}/dates.npy', calendar.dates)
+	np.save(f'{loc}/vwretd.npy', market)
+	print(f'AR cube {vintage}: {len(permnos):,} permnos x {n_days:,} trading days')
+
+
+#%%
+'''
+Slicing
+'''
+
+class ARCube:
+
+	def __init__(self, loc):
+
+		self.permnos = np.load(f'{loc}/permnos.npy')
+		self.calendar = TradingCalendar(np.load(f'{loc}/dates.npy'))
+		self.market = np.load(f'{loc}/vwretd.npy')
+		self.ar = np.load(f'{loc}/ar.npy', mmap_mode='r')
+		self.cum_ar = np.load(f'{loc}/cum_ar.npy', mmap_mode='r')
+		self.cum_log_ar = np.load(f'{loc}/cum_log_ar.npy', mmap_mode='r')
+
+	@classmethod
+	def open(cls, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+		return cls(cube_loc(wrds_loc, vintage))
+
+	def rows(self, permnos):
+		'''
+		Cube row of each permno, -1 if not in the cube
+		'''
+
+		if isinstance(permnos, (set, frozenset)):
+			permnos = sorted(permnos)
+		permnos = pd.to_numeric(pd.Series(np.asarray(permnos)), errors='coerce').to_numpy(dtype='float64')
+		idx = np.minimum(np.searchsorted(self.permnos, permnos), max(len(self.permnos) - 1, 0))
+		found = (self.permnos[idx] == permnos) if len(self.permnos) else np.zeros(len(permnos), dtype=bool)
+
+		return np.where(found, idx, -1)
+
+	def _span(self, starts, ends):
+
+		# First and last trading day in each [start, end] (-1 when there is none)
+		first = self.calendar.day_number(starts, 'next')
+		last = self.calendar.day_number(ends, 'prev')
+
+		return first, np.where((first >= 0) & (last >= first), last, -1)
+
+	def values(self, permnos, dates):
+		'''
+		AR of each (permno, date) - missing if the permno has no return that day or the date is not a trading day
+		'''
+
+		rows = self.rows(permnos)
+		cols = self.calendar.day_number(dates, 'next')
+		days = pd.to_datetime(pd.Series(np.asarray(dates))).dt.normalize().to_numpy(dtype='datetime64[ns]')
+		ok = (rows >= 0) & (cols >= 0) & (self.calendar.date_at(cols) == days)
+
+		out = np.full(len(rows), np.nan)
+		out[ok] = self.ar[rows[ok], cols[ok]]
+
+		return out
+
+	def car(self, permnos, starts, ends):
+		'''
+		Sum of the daily ARs over the trading days in [start, end] of each row, missing if there is no return
+		'''
+
+		rows = self.rows(permnos)
+		first, last = self._span(starts, ends)
+		counts = np.where((rows >= 0) & (last >= 0), last - first + 1, 0)
+
+		row = np.repeat(np.arange(len(rows)), counts)
+		offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+		values = self.ar[rows[row], first[row] + offsets].astype('float64')
+		valid = ~np.isnan(values)
+		n = np.bincount(row, weights=valid, minlength=len(rows))
+		total = np.bincount(row, weights=np.where(valid, values, 0), minlength=len(rows))
+
+		return np.where(n > 0, total, np.nan)
+
+	def summed(self, permnos, starts, ends):
+		'''
+		Sum of the daily ARs over the trading days in [start, end] of each row from the running sums - 0 if there is no
+		return, missing only if the permno is not in the cube or a date is missing
+		'''
+
+		rows = self.rows(permnos)
+		first, last = self._span(starts, ends)
+		ok = (rows >= 0) & (last >= 0)
+		dated = _days(starts)[1] & _days(ends)[1]
+
+		out = np.where((rows >= 0) & dated, 0.0, np.nan)
+		out[ok] = self.cum_ar[rows[ok], last[ok] + 1] - self.cum_ar[rows[ok], first[ok]]
+
+		return out
+
+	def compounded(self, permnos, starts, ends):
+		'''
+		prod(1 + ar) - 1 over the trading days in [start, end] of each row (from the running sums of log(1 + ar))
+		'''
+
+		rows = self.rows(permnos)
+		first, last = self._span(starts, ends)
+		ok = (rows >= 0) & (last >= 0)
+
+		out = np.full(len(rows), np.nan)
+		out[ok] = np.expm1(self.cum_log_ar[rows[ok], last[ok] + 1] - self.cum_log_ar[rows[ok], first[ok]])
+
+		return out
+
+	def slice(self, permnos, start=None, end=None):
+		'''
+		Dense permno x trading day frame of ARs over [start, end] (float32, permnos not in the cube are left out)
+		'''
+
+		rows = self.rows(permnos)
+		rows = np.unique(rows[rows >= 0])
+		first = self.calendar.day_number([start], 'next')[0] if start is not None else 0
+		last = self.calendar.day_number([end], 'prev')[0] if end is not None else len(self.calendar) - 1
+
+		return pd.DataFrame(self.ar[rows, first:last + 1], index=pd.Index(self.permnos[rows], name='permno'),
+		                    columns=pd.DatetimeIndex(self.calendar.dates[first:last + 1], name='date'))
+
+	def panel(self, permnos, start=None, end=None, block_rows=500):
+		'''
+		Long frame (permno, date, ar) of the days with a return over [start, end]
+		'''
+
+		frames = []
+		for block_df in self._blocks(permnos, start, end, block_rows):
+			values = block_df.to_numpy()
+			r, c = np.nonzero(~np.isnan(values))
+			frames.append(pd.DataFrame({'permno': block_df.index.to_numpy()[r],
+			                            'date': block_df.columns.to_numpy()[c],
+			                            'ar': values[r, c].astype('float64')}))
+
+		return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['permno', 'date', 'ar'])
+
+	def _blocks(self, permnos, start, end, block_rows):
+
+		rows = self.rows(permnos)
+		permnos = self.permnos[np.unique(rows[rows >= 0])]
+		for i in range(0, len(permnos), block_rows):
+			yield self.slice(permnos[i:i + block_rows], start, end)
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Daily abnormal return cube')
+	parser.add_argument('command', choices=['build'])
+	parser.add_argument('--start', default='1985-01-01')
+	parser.add_argument('--end', default=None)
+	parser.add_argument('--vintage', default=wrds.VINTAGE)
+	parser.add_argument('--wrds-loc', default=wrds.WRDS_LOC)
+	args = parser.parse_args()
+
+	build(args.start, args.end, args.wrds_loc, args.vintage)
@@ -0,0 +1,112 @@
+'''
+CRSP trading calendar
+
+Built once from the dsi dates. Trading day arithmetic on whole date columns is done with binary searches on the sorted
+calendar instead of shifted copies of the data or per-row queries of dsi.
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep import warehouse, wrds
+
+
+def _as_dates(dates):
+
+	return pd.to_datetime(pd.Series(np.asarray(dates))).to_numpy(dtype='datetime64[ns]')
+
+
+class TradingCalendar:
+
+	def __init__(self, dates):
+
+		self.dates = np.unique(_as_dates(dates))
+		self.dates = self.dates[~np.isnat(self.dates)]
+
+	@classmethod
+	def from_dsi(cls, dsi_df=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+		if dsi_df is None:
+			dsi_df = warehouse.load_dsi(columns=['date'], wrds_loc=wrds_loc, vintage=vintage)
+		return cls(dsi_df['date'])
+
+	def __len__(self):
+
+		return len(self.dates)
+
+	def date_at(self, idx):
+		'''
+		Trading date at each calendar position, NaT where the position is off the calendar
+		'''
+
+		ok = (idx >= 0) & (idx < len(self.dates))
+		return np.where(ok, self.dates[np.clip(idx, 0, max(len(self.dates) - 1, 0))], np.datetime64('NaT'))
+
+	def day_number(self, dates, side='next', inclusive=True, within=None):
+		'''
+		Position on the calendar (the tr_day used in the scripts) of the next (or previous) trading day, -1 if there is none or
+		if it is more than within calendar days away
+		'''
+
+		dates = _as_dates(dates)
+		if side == 'next':
+			idx = np.searchsorted(self.dates, dates, side='left' if inclusive else 'right')
+		else:
+			idx = np.searchsorted(self.dates, dates, side='right' if inclusive else 'left') - 1
+		found = self.date_at(idx)
+		ok = ~np.isnat(dates) & ~np.isnat(found)
+		if within is not None:
+			ok &= np.abs(found - dates) <= np.timedelta64(within, 'D')
+
+		return np.where(ok, idx, -1)
+
+	def next_trading_day(self, dates, inclusive=True, within=None):
+		'''
+		First trading day on (inclusive) or after each date
+		'''
+
+		return self.date_at(self.day_number(dates, 'next', inclusive, within))
+
+	def prev_trading_day(self, dates, inclusive=True, within=None):
+		'''
+		Latest trading day on (inclusive) or before each date
+		'''
+
+		return self.date_at(self.day_number(dates, 'prev', inclusive, within))
+
+	def trading_days_between(self, start, end):
+		'''
+		Number of trading days in [start, end] (missing if either date is)
+		'''
+
+		start, end = _as_dates(start), _as_dates(end)
+		n = np.searchsorted(self.dates, end, side='right') - np.searchsorted(self.dates, start, side='left')
+
+		return np.where(np.isnat(start) | np.isnat(end), np.nan, np.maximum(n, 0))
+
+	def shift_trading_days(self, dates, n):
+		'''
+		Trading day n trading days after (n < 0: before) the first trading day on or after each date
+		'''
+
+		idx = self.day_number(dates, 'next')
+
+		return self.date_at(np.where(idx >= 0, idx + np.asarray(n), -1))
+
+	def expand(self, df, start, end, out='date'):
+		'''
+		Panel with one row per trading day in [start, end] for each row of df (create_ts restricted to trading days)
+		'''
+
+		lo = np.searchsorted(self.dates, _as_dates(df[start]), side='left')
+		hi = np.searchsorted(self.dates, _as_dates(df[end]), side='right')
+		counts = np.where(df[start].isna().to_numpy() | df[end].isna().to_numpy(), 0, np.maximum(hi - lo, 0))
+
+		rows = np.repeat(np.arange(len(df)), counts)
+		offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+		return (df
+		        .iloc[rows]
+		        .reset_index(drop=True)
+		        .assign(**{out: self.dates[np.repeat(lo, counts) + offsets]})
+		        )
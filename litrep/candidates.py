@@ -0,0 +1,77 @@
+'''
+Potential matched firms for each lawsuit
+
+Instead of merging every case with every firm in the same survey year and screening the pairs afterwards, the screens are
+applied to (firm, period) rows first. A firm is a candidate for a case only if it is eligible in every period of the case:
+for each case the firms eligible in its period with the fewest eligible firms are taken as the candidates (one np.repeat
+over the eligible firms sorted by period) and the case's other periods are checked with binary searches on the sorted
+(firm, period) codes. Only the surviving pairs are materialized, as two integer columns.
+'''
+
+import numpy as np
+import pandas as pd
+
+
+def _as_list(cols):
+
+	return [cols] if isinstance(cols, str) else list(cols)
+
+
+def candidate_pairs(cases_df, eligible_df, case_id='MSCAD_ID', firm_id='gvkey', period='DateOfPub_t'):
+	'''
+	(case_id, firm_id) pairs where the firm has a row in eligible_df for every period of the case
+
+	cases_df:    one row per case and period (case_id, period columns)
+	eligible_df: one row per firm and period in which the firm passes the screens (firm_id, period columns)
+	period:      one or more columns, e.g. ['DateOfPub_t', 'Post'] when the screens differ between pre and post periods
+	'''
+
+	period = _as_list(period)
+	cases_df = cases_df.dropna(subset=[case_id] + period)
+	eligible_df = eligible_df.dropna(subset=[firm_id] + period).drop_duplicates(subset=[firm_id] + period)
+
+	# Shared period codes for both sides
+	both = pd.concat([cases_df[period], eligible_df[period]], ignore_index=True)
+	p_codes = both.groupby(period, sort=False).ngroup().to_numpy()
+	n_periods = p_codes.max() + 1 if len(p_codes) else 0
+	case_period, firm_period = p_codes[:len(cases_df)], p_codes[len(cases_df):]
+
+	case_ids, case_codes = np.unique(cases_df[case_id].to_numpy(), return_inverse=True)
+	firm_ids, firm_codes = np.unique(eligible_df[firm_id].to_numpy(), return_inverse=True)
+
+	# Eligible firms by period, and the sorted (firm, period) codes for the membership checks
+	order = np.lexsort((firm_codes, firm_period))
+	firms_by_period = firm_codes[order]
+	p_counts = np.bincount(firm_period, minlength=n_periods)
+	p_starts = np.cumsum(p_counts) - p_counts
+	keys = np.sort(firm_codes.astype('int64') * n_periods + firm_period)
+
+	# Anchor period of each case: the one with the fewest eligible firms
+	case_order = np.lexsort((p_counts[case_period], case_codes))
+	c_codes, c_period = case_codes[case_order], case_period[case_order]
+	first = np.r_[True, c_codes[1:] != c_codes[:-1]]
+	anchor = c_period[first]
+	cases = c_codes[first]
+
+	counts = p_counts[anchor]
+	pair_case = np.repeat(cases, counts)
+	offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+	pair_firm = firms_by_period[np.repeat(p_starts[anchor], counts) + offsets]
+
+	# Every other period of the case
+	keep = np.ones(len(pair_case), dtype=bool)
+	slot = np.arange(len(c_codes)) - np.repeat(np.flatnonzero(first), np.diff(np.r_[np.flatnonzero(first), len(c_codes)]))
+	case_pos = np.full(len(case_ids), -1)
+	case_pos[cases] = np.arange(len(cases))
+	for j in range(1, slot.max() + 1 if len(slot) else 0):
+		# Period in slot j of each case (-1 if the case has fewer periods)
+		slot_period = np.full(len(cases), -1)
+		sel = slot == j
+		slot_period[case_pos[c_codes[sel]]] = c_period[sel]
+		needed = slot_period[case_pos[pair_case]]
+		check = needed >= 0
+		wanted = pair_firm[check].astype('int64') * n_periods + needed[check]
+		idx = np.minimum(np.searchsorted(keys, wanted), max(len(keys) - 1, 0))
+		keep[check] &= (keys[idx] == wanted) if len(keys) else False
+
+	return pd.DataFrame({case_id: case_ids[pair_case[keep]], firm_id: firm_ids[pair_firm[keep]]})
@@ -0,0 +1,94 @@
+'''
+Stock price crash risk (Hsu, Wang, and Whipple 2021 JAE)
+
+The expanded market model is fitted for every firm-year at once: rows are grouped, each group's (centred) X'X and X'y are
+accumulated with bincount and all the small normal-equation systems are solved in one batched call. Residual moments for
+NSKEW and DUVOL are then grouped reductions over the same group codes.
+'''
+
+import numpy as np
+import pandas as pd
+
+
+MARKET_COLS = ['weekly_vwretd_tm2', 'weekly_vwretd_tm1', 'weekly_vwretd_t', 'weekly_vwretd_tp1', 'weekly_vwretd_tp2']
+
+
+def _group_sum(codes, values, n_groups):
+
+	return np.bincount(codes, weights=values, minlength=n_groups)
+
+
+def group_ols(df, y, X, by):
+	'''
+	OLS of y on X (plus an intercept) within each group of by. Returns fitted values and residuals aligned to df's rows
+	(same results as fitting sm.formula.ols group by group)
+	'''
+
+	codes = df.groupby(by, sort=False).ngroup().to_numpy()
+	n_groups = codes.max() + 1 if len(codes) else 0
+	yv = df[y].to_numpy(dtype='float64')
+	Xv = df[X].to_numpy(dtype='float64')
+	k = Xv.shape[1]
+
+	# Centre within group so that the intercept drops out and the normal equations stay well conditioned
+	counts = np.bincount(codes, minlength=n_groups)
+	x_mean = np.column_stack([_group_sum(codes, Xv[:, j], n_groups) for j in range(k)]) / counts[:, None]
+	y_mean = _group_sum(codes, yv, n_groups) / counts
+	Xc = Xv - x_mean[codes]
+	yc = yv - y_mean[codes]
+
+	XtX = np.empty((n_groups, k, k))
+	Xty = np.empty((n_groups, k))
+	for i in range(k):
+		Xty[:, i] = _group_sum(codes, Xc[:, i] * yc, n_groups)
+		for j in range(i, k):
+			XtX[:, i, j] = XtX[:, j, i] = _group_sum(codes, Xc[:, i] * Xc[:, j], n_groups)
+
+	# Pseudo-inverse like statsmodels so that rank deficient groups still get a fit
+	beta = np.einsum('gij,gj->gi', np.linalg.pinv(XtX), Xty)
+	fitted = y_mean[codes] + np.einsum('ij,ij->i', Xc, beta[codes])
+
+	return pd.DataFrame({'fitted': fitted, 'resid': yv - fitted}, index=df.index)
+
+
+def crash_risk(df, by=('gvkey', 'fyear'), ret='cum_ret', market=MARKET_COLS):
+	'''
+	NSKEW and DUVOL per group from weekly firm returns and the market return leads and lags
+
+	nskew_PrCrRisk = -[n (n-1)^(3/2) sum W^3] / [(n-1) (n-2) (sum W^2)^(3/2)]
+	duvol_PrCrRisk = log(std of down-week W / std of up-week W)
+
+	where W = log(1 + residual) and down (up) weeks have W below (above) the firm-year mean
+	'''
+
+	by = list(by)
+	resid = np.log(group_ols(df, ret, list(market), by)['resid'].to_numpy() + 1)
+
+	groups = df.groupby(by, sort=True)
+	codes = groups.ngroup().to_numpy()
+	n_groups = groups.ngroups
+	valid = ~np.isnan(resid)
+	w = np.where(valid, resid, 0)
+
+	n = np.bincount(codes, weights=valid, minlength=n_groups)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		mean = _group_sum(codes, w, n_groups) / n
+
+		def _std(mask):
+			# Two-pass sample standard deviation of the masked weeks
+			m_n = np.bincount(codes, weights=mask, minlength=n_groups)
+			m_mean = _group_sum(codes, np.where(mask, w, 0), n_groups) / m_n
+			ss = _group_sum(codes, np.where(mask, (w - m_mean[codes]) ** 2, 0), n_groups)
+			return np.where(m_n > 1, np.sqrt(ss / (m_n - 1)), np.nan)
+
+		down_std = _std(valid & (w < mean[codes]))
+		up_std = _std(valid & (w > mean[codes]))
+		resid2_sum = _group_sum(codes, w ** 2, n_groups)
+		resid3_sum = _group_sum(codes, w ** 3, n_groups)
+
+		out = (groups.size().reset_index()[by]
+		       .assign(nskew_PrCrRisk=-1 * (n * ((n-1)**(3/2)) * resid3_sum) / ((n-1) * (n-2) * (resid2_sum**(3/2))),
+		               duvol_PrCrRisk=np.log(down_std / up_std))
+		       )
+
+	return out
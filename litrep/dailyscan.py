@@ -0,0 +1,104 @@
+'''
+One pass over CRSP daily stock returns for all the return-based variables of a sample
+
+The dsf rows of the sample permnos are read from the warehouse once, a partition of permnos at a time. Each partition is
+reduced on the spot to what the variables need: weekly compounded returns (crash risk), the slim daily panel of ret and MVE
+and per-permno running sums of ret and ret^2 (return volatility over any window without a daily panel).
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep import warehouse, wrds
+from litrep._keys import _DAY_SHIFT, _KEY_SCALE, _days
+
+
+def weekly_returns(dsf_df, ret='ret', out='cum_ret'):
+	'''
+	Compound daily returns to Friday weeks (all days moved to the Friday of their week)
+	'''
+
+	weekday = dsf_df['date'].dt.weekday.to_numpy()
+
+	return (dsf_df
+	        .filter(['permno', 'date', ret])
+	        .assign(date=lambda x: x['date'] + pd.to_timedelta((4 - weekday) % 7, unit='D'))
+	        .dropna()
+	        .assign(**{ret: lambda x: x[ret] + 1})
+	        .groupby(['permno', 'date'], as_index=False).agg(**{out: (ret, 'prod')})
+	        .assign(**{out: lambda x: x[out] - 1})
+	        )
+
+
+class DailyScan:
+
+	def __init__(self, permnos, start=None, end=None, partition_size=500, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+		permnos = np.unique(pd.Series(list(permnos), dtype='float64').dropna().to_numpy())
+
+		weekly, daily = [], []
+		for i in range(0, len(permnos), partition_size):
+			part_df = (warehouse
+			           .load_dsf(columns=['permno', 'date', 'ret', 'prc', 'shrout'], start=start, end=end,
+			                     permnos=set(permnos[i:i + partition_size]), wrds_loc=wrds_loc, vintage=vintage)
+			           .assign(MVE=lambda x: x['prc'].abs() * x['shrout'])
+			           .drop(['prc', 'shrout'], axis=1)
+			           )
+			weekly.append(weekly_returns(part_df))
+			daily.append(part_df)
+			del part_df
+
+		self.weekly = pd.concat(weekly, ignore_index=True)
+		self.daily = (pd
+		              .concat(daily, ignore_index=True)
+		              .sort_values(by=['permno', 'date'])
+		              .reset_index(drop=True)
+		              )
+		del weekly, daily
+
+		# Running sums of ret and ret^2 over the sorted panel (missing returns add nothing)
+		days, _ = _days(self.daily['date'])
+		self._permnos, codes = np.unique(self.daily['permno'].to_numpy(dtype='float64'), return_inverse=True)
+		self._comp = codes.astype('int64') * _KEY_SCALE + days + _DAY_SHIFT
+		ret = self.daily['ret'].to_numpy(dtype='float64')
+		valid = ~np.isnan(ret)
+		self._cs_n = np.r_[0, np.cumsum(valid)]
+		self._cs_ret = np.r_[0, np.cumsum(np.where(valid, ret, 0))]
+		self._cs_ret2 = np.r_[0, np.cumsum(np.where(valid, ret * ret, 0))]
+
+	def _positions(self, permnos, starts, ends):
+
+		# Panel row range [lo, hi) of each window
+		permnos = pd.to_numeric(pd.Series(np.asarray(permnos)), errors='coerce').to_numpy(dtype='float64')
+		idx = np.minimum(np.searchsorted(self._permnos, permnos), max(len(self._permnos) - 1, 0))
+		found = (self._permnos[idx] == permnos) if len(self._permnos) else np.zeros(len(permnos), dtype=bool)
+		start, start_ok = _days(starts)
+		end, end_ok = _days(ends)
+		base = idx.astype('int64') * _KEY_SCALE + _DAY_SHIFT
+		lo = np.searchsorted(self._comp, base + start, side='left')
+		hi = np.searchsorted(self._comp, base + end, side='right')
+
+		return lo, np.where(found & start_ok & end_ok, np.maximum(hi, lo), lo)
+
+	def ret_std(self, windows_df, by, permno='permno', start='start', end='end', out='StdDailyRet'):
+		'''
+		Sample standard deviation of daily returns pooled over all the (permno, [start, end]) windows of each by group
+		(same as merging the daily rows of every window and taking a groupby std)
+		'''
+
+		lo, hi = self._positions(windows_df[permno], windows_df[start], windows_df[end])
+		sums_df = (windows_df
+		           .filter(by)
+		           .assign(_n=self._cs_n[hi] - self._cs_n[lo],
+		                   _s=self._cs_ret[hi] - self._cs_ret[lo],
+		                   _s2=self._cs_ret2[hi] - self._cs_ret2[lo])
+		           .groupby(by, as_index=False)[['_n', '_s', '_s2']].sum()
+		           )
+		n = sums_df['_n'].to_numpy(dtype='float64')
+		with np.errstate(divide='ignore', invalid='ignore'):
+			var = (sums_df['_s2'] - sums_df['_s'] ** 2 / n) / (n - 1)
+
+		return (sums_df
+		        .assign(**{out: np.where(n > 1, np.sqrt(np.maximum(var, 0)), np.nan)})
+		        .drop(['_n', '_s', '_s2'], axis=1)
+		        )
@@ -0,0 +1,164 @@
+'''
+Event studies on the CRSP trading calendar
+
+Abnormal returns are ret - vwretd, or taken as given (e.g. from the AR cube). The return panel is indexed once by (security,
+trading day number) and kept with running sums of AR and of log gross returns, so the CAR or BHAR of any window is two binary
+searches and a difference, for any number of events and windows. Each event is mapped to its first trading day (the event
+date or, if the market was closed, the first trading day within the next ten calendar days) once per call.
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep.calendar import TradingCalendar
+
+
+def window_name(prefix, pre, post):
+	'''
+	Column name used in the scripts for a window, e.g. ('CPE_CAR', -10, -2) -> 'CPE_CAR_m10_m2'
+	'''
+
+	def _day(d):
+		return f'm{abs(d)}' if d < 0 else f'p{d}'
+
+	return f'{prefix}_{_day(pre)}_{_day(post)}'
+
+
+class EventStudy:
+
+	def __init__(self, dsi_df, returns_df, id_col='permno', ret='ret', market='vwretd', ar=None):
+		'''
+		dsi_df:     daily market returns, one row per trading day (date, market)
+		returns_df: daily security returns (id_col, date, ret and any other columns to look up, e.g. MVE)
+		ar:         column of returns_df with precomputed abnormal returns - ret is then ar + market if returns_df has none
+		'''
+
+		cal = dsi_df.drop_duplicates(subset=['date']).sort_values(by=['date']).reset_index(drop=True)
+		self.calendar = TradingCalendar(cal['date'])
+		self.market = cal[market].to_numpy(dtype='float64')
+		self.id_col = id_col
+		n_days = len(self.calendar)
+
+		# Only days on the calendar can be part of a window
+		tr_day = self.calendar.day_number(returns_df['date'])
+		on_cal = self.calendar.date_at(tr_day) == returns_df['date'].to_numpy(dtype='datetime64[ns]')
+
+		panel = returns_df[on_cal].assign(tr_day=tr_day[on_cal])
+		self.ids, codes = np.unique(panel[id_col].to_numpy(), return_inverse=True)
+		order = np.lexsort((panel['tr_day'].to_numpy(), codes))
+		self.panel = panel.iloc[order].reset_index(drop=True)
+		if ar is None:
+			self.panel['ar'] = self.panel[ret] - self.market[self.panel['tr_day'].to_numpy()]
+		else:
+			self.panel['ar'] = self.panel[ar].astype('float64')
+			if ret not in self.panel.columns:
+				self.panel[ret] = self.panel['ar'] + self.market[self.panel['tr_day'].to_numpy()]
+
+		self._n_days = n_days
+		self._comp = codes[order].astype('int64') * n_days + self.panel['tr_day'].to_numpy()
+
+		# Running sums over the sorted panel (missing returns add nothing, as in a groupby sum)
+		ar = self.panel['ar'].to_numpy(dtype='float64')
+		gross = np.log1p(self.panel[ret].to_numpy(dtype='float64'))
+		gross_mkt = np.log1p(self.market[self.panel['tr_day'].to_numpy()])
+		self._cs_ar = np.r_[0, np.cumsum(np.nan_to_num(ar))]
+		self._cs_gross = np.r_[0, np.cumsum(np.where(np.isnan(gross), 0, gross))]
+		self._cs_gross_mkt = np.r_[0, np.cumsum(np.where(np.isnan(gross), 0, gross_mkt))]
+
+	def anchor(self, dates, max_days=10):
+		'''
+		Trading day number of the first trading day in [date, date + max_days] (-1 if none)
+		'''
+
+		return self.calendar.day_number(dates, 'next', within=max_days)
+
+	def _codes(self, ids):
+
+		ids = np.asarray(ids)
+		idx = np.minimum(np.searchsorted(self.ids, ids), max(len(self.ids) - 1, 0))
+		found = (self.ids[idx] == ids) if len(self.ids) else np.zeros(len(ids), dtype=bool)
+
+		return np.where(found, idx, -1)
+
+	def _bounds(self, codes, anchors, pre, post):
+
+		# Panel row range [lo, hi) of each event's window - empty when the event has no anchor or no returns
+		ok = (codes >= 0) & (anchors >= 0)
+		base = codes.astype('int64') * self._n_days
+		first = np.clip(anchors + pre, 0, self._n_days - 1)
+		last = np.clip(anchors + post, -1, self._n_days - 1)
+		lo = np.searchsorted(self._comp, base + first, side='left')
+		hi = np.searchsorted(self._comp, base + last, side='right')
+		hi = np.where(ok & (anchors + post >= 0) & (anchors + pre <= self._n_days - 1), np.maximum(hi, lo), lo)
+
+		return lo, hi
+
+	def car(self, events_df, date_col, windows, prefix='CAR', measure='car', max_days=10):
+		'''
+		Add one column per (pre, post) trading-day window, named with window_name(prefix, pre, post)
+
+		measure: 'car' sums daily ARs, 'bhar' is the buy-and-hold return less the buy-and-hold market return over the same days.
+		Windows without any return are left missing
+		'''
+
+		codes = self._codes(events_df[self.id_col].to_numpy())
+		anchors = self.anchor(events_df[date_col], max_days)
+
+		out = {}
+		for pre, post in windows:
+			lo, hi = self._bounds(codes, anchors, pre, post)
+			if measure == 'car':
+				value = self._cs_ar[hi] - self._cs_ar[lo]
+			else:
+				value = (np.expm1(self._cs_gross[hi] - self._cs_gross[lo])
+				         - np.expm1(self._cs_gross_mkt[hi] - self._cs_gross_mkt[lo]))
+			out[window_name(prefix, pre, post)] = np.where(hi > lo, value, np.nan)
+
+		return events_df.assign(**out)
+
+	def paths(self, events_df, date_col, pre, post, how='left', max_days=10):
+		'''
+		Long panel with one row per event and trading day in [pre, post] (rel_day), the daily ar and its running sum
+		(car). how='left' keeps the days without a return
+		'''
+
+		events_df = events_df.reset_index(drop=True)
+		anchors = self.anchor(events_df[date_col], max_days)
+		rel_days = np.arange(pre, post + 1)
+
+		event = np.repeat(np.flatnonzero(anchors >= 0), len(rel_days))
+		rel_day = np.tile(rel_days, len(event) // len(rel_days))
+		tr_day = anchors[event] + rel_day
+		on_cal = (tr_day >= 0) & (tr_day < self._n_days)
+
+		path_df = (events_df
+		           .iloc[event]
+		           .reset_index(drop=True)
+		           .assign(_event=event,
+		                   rel_day=rel_day,
+		                   tr_day=np.where(on_cal, tr_day, -1),
+		                   date=self.calendar.date_at(tr_day))
+		           .merge(self.panel[[self.id_col, 'tr_day', 'ar']], on=[self.id_col, 'tr_day'], how=how)
+		           .sort_values(by=['_event', 'rel_day'], kind='stable')
+		           .assign(car=lambda x: x.groupby(['_event'])['ar'].cumsum())
+		           .drop(['_event', 'tr_day'], axis=1)
+		           .reset_index(drop=True)
+		           )
+
+		return path_df
+
+	def value_at(self, events_df, date_col, offset, col, max_days=10):
+		'''
+		Value of a return panel column (e.g. MVE) on the trading day offset days from each event's anchor
+		'''
+
+		codes = self._codes(events_df[self.id_col].to_numpy())
+		anchors = self.anchor(events_df[date_col], max_days)
+		lo, hi = self._bounds(codes, anchors, offset, offset)
+
+		if len(self.panel):
+			values = self.panel[col].to_numpy()[np.minimum(lo, len(self.panel) - 1)]
+		else:
+			values = np.full(len(lo), np.nan)
+
+		return pd.Series(np.where(hi > lo, values, np.nan), index=events_df.index)
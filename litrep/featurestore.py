@@ -0,0 +1,313 @@
+'''
+Firm-year market feature store
+
+Return-based measures of every Compustat firm-year with a prior fiscal year (window: prior year's datadate + 1 day to
+datadate), computed once per WRDS vintage for the whole CRSP/Compustat universe instead of inside each sample script:
+
+	nskew_PrCrRisk, duvol_PrCrRisk: stock price crash risk from weekly (Friday) returns, at least 20 weeks (Hsu, Wang, and
+	                                Whipple 2021 JAE)
+	StdDailyRet:                    standard deviation of daily returns over the fiscal year
+
+KS litigation risk is not stored: its one definition is 1. KS Litigation Risk.py's output (see litrep.ksfit).
+
+The store sits next to the CRSP warehouse of the vintage: one parquet file per fiscal year sorted by gvkey, plus a manifest
+with a fingerprint of each year's inputs (firm-year windows and links over the windows) and the last
+CRSP date it was built with. Building a vintage with previous= copies the years whose fingerprint did not change and whose
+windows (plus two lead weeks of the market model) ended by the previous vintage's last CRSP date, and recomputes the rest -
+full=True recomputes everything (e.g. after CRSP revised past returns or names).
+
+Usage:
+	python -m litrep.featurestore build --previous 20201231
+'''
+
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from litrep import warehouse, wrds
+from litrep.crashrisk import crash_risk
+from litrep.dailyscan import DailyScan
+from litrep.fundamentals import Fundamentals
+from litrep.linktable import LinkResolver
+from litrep.panels import expand, shift
+
+
+FEATURES = ['nskew_PrCrRisk', 'duvol_PrCrRisk', 'StdDailyRet']
+
+_MANIFEST = 'manifest.parquet'
+
+
+def store_loc(wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+	return f'{warehouse.warehouse_loc(wrds_loc, vintage)}/features'
+
+
+def _year_path(loc, fyear):
+
+	return f'{loc}/{int(fyear)}.parquet'
+
+
+def _fingerprint(df):
+
+	# Order free hash of the rows
+	return int(pd.util.hash_pandas_object(df, index=False).to_numpy(dtype='uint64').sum(dtype='uint64'))
+
+
+#%%
+'''
+Inputs
+'''
+
+def firm_years(funda_df):
+	'''
+	gvkey, fyear, datadate and year_start (prior year's datadate + 1 day) of every firm-year with a prior fiscal year
+	'''
+
+	funda = Fundamentals(funda_df)
+
+	return (funda.table
+	        .filter(['gvkey', 'fyear', 'datadate'])
+	        .assign(year_start=funda['py_datadate'] + pd.DateOffset(days=1))
+	        .dropna()
+	        .drop_duplicates(subset=['gvkey', 'fyear'], keep='first')
+	        .reset_index(drop=True)
+	        )
+
+
+def links(linktable_df):
+	'''
+	Linktable of the return measures: links ending prior to 1990 are dropped and earlier starts moved to 1990
+	'''
+
+	return (linktable_df
+	        .query('linkenddt >= "1990-01-01"')
+	        .assign(temp=pd.to_datetime('1990-01-01'),
+	                linkdt=lambda x: np.where(x['linkdt'].dt.year < 1990, x['temp'], x['linkdt']))
+	        .filter(['gvkey', 'permno', 'linkdt', 'linkenddt'])
+	        )
+
+
+def market_weeks(dsi_df):
+	'''
+	Weekly (Friday) compounded value weighted market returns with the two prior and two following weeks
+	'''
+
+	weeks_df = (dsi_df
+	            .filter(['date', 'vwretd'])
+	            # Move all days to Fridays
+	            .assign(date=lambda x: np.where(x['date'].dt.weekday == 4, x['date'], x['date'] + pd.offsets.Week(weekday=4)))
+	            # Summarize by week
+	            .dropna()
+	            .assign(vwretd=lambda x: x['vwretd'] + 1)
+	            .groupby(['date'], as_index=False).agg(weekly_vwretd_t=('vwretd', 'prod'))
+	            .assign(weekly_vwretd_t=lambda x: x['weekly_vwretd_t'] - 1)
+	            .sort_values(by=['date'])
+	            # Week number in case a whole week was a non-trading week (i.e., 9/11 etc)
+	            .assign(tr_week_id=lambda x: range(0, len(x)))
+	            )
+
+	return shift(weeks_df, 'weekly_vwretd_t', None, 'tr_week_id', [1, 2, -1, -2], ['m1', 'm2', 'p1', 'p2'])
+
+
+#%%
+'''
+Measures
+'''
+
+def crash_risk_features(years_df, scan, links_df, weeks_df):
+	'''
+	NSKEW and DUVOL per gvkey-fyear from the Friday returns of every permno linked during the year (20 weeks minimum)
+	'''
+
+	cr_ts_df = LinkResolver(links_df).merge_permno(expand(years_df, 'year_start', 'datadate', 'W-FRI'), 'date', how='inner',
+	                                               prefer='all')
+	cr_ts_df = (cr_ts_df
+	            .merge(weeks_df, on=['date'], how='inner')
+	            .merge(scan.weekly, on=['permno', 'date'], how='inner')
+	            .sort_values(by=['gvkey', 'fyear', 'date'])
+	            .dropna(subset=['cum_ret', 'weekly_vwretd_tm2', 'weekly_vwretd_tm1', 'weekly_vwretd_t', 'weekly_vwretd_tp1',
+	                            'weekly_vwretd_tp2'])
+	            .assign(obs=lambda x: x.groupby(['gvkey', 'fyear'])['cum_ret'].transform('count'))
+	            .query('obs >= 20')
+	            .drop(['obs'], axis=1)
+	            .reset_index(drop=True)
+	            )
+
+	return crash_risk(cr_ts_df, by=['gvkey', 'fyear'])
+
+
+def ret_vol_features(years_df, scan, links_df):
+	'''
+	Standard deviation of the daily returns of every permno linked during the year, over the part of the year it is linked
+	'''
+
+	windows_df = (years_df
+	              .merge(links_df, on=['gvkey'], how='inner')
+	              .assign(start=lambda x: x[['year_start', 'linkdt']].max(axis=1),
+	                      end=lambda x: x[['datadate', 'linkenddt']].min(axis=1))
+	              .query('start <= end')
+	              )
+
+	return scan.ret_std(windows_df, by=['gvkey', 'fyear'])
+
+
+def build_year(years_df, links_df, weeks_df, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+	'''
+	All the features of the firm-years of one fiscal year, sorted by gvkey
+	'''
+
+	lo, hi = years_df['year_start'].min(), years_df['datadate'].max()
+	year_links_df = links_df[links_df['gvkey'].isin(set(years_df['gvkey'])) &
+	                         (links_df['linkdt'] <= hi) & (links_df['linkenddt'] >= lo)]
+	# Whole weeks around the first Friday
+	scan = DailyScan(set(year_links_df['permno']), start=lo - pd.DateOffset(days=6), end=hi, wrds_loc=wrds_loc,
+	                 vintage=vintage)
+
+	return (years_df
+	        .filter(['gvkey', 'fyear'])
+	        .merge(crash_risk_features(years_df, scan, year_links_df, weeks_df), on=['gvkey', 'fyear'], how='left')
+	        .merge(ret_vol_features(years_df, scan, year_links_df), on=['gvkey', 'fyear'], how='left')
+	        .filter(['gvkey', 'fyear'] + FEATURES)
+	        .sort_values(by=['gvkey'])
+	        .reset_index(drop=True)
+	        )
+
+
+#%%
+'''
+Build
+'''
+
+def _fingerprints(years_df, links_df):
+
+	out = {}
+	for fyear, year_df in years_df.groupby('fyear'):
+		lo, hi = year_df['year_start'].min(), year_df['datadate'].max()
+		# Links clipped to the year (open links end on the vintage date)
+		year_links_df = (links_df[links_df['gvkey'].isin(set(year_df['gvkey'])) &
+		                          (links_df['linkdt'] <= hi) & (links_df['linkenddt'] >= lo)]
+		                 .assign(linkdt=lambda x: x['linkdt'].clip(lower=lo),
+		                         linkenddt=lambda x: x['linkenddt'].clip(upper=hi)))
+		out[fyear] = _fingerprint(pd.DataFrame({'years': [_fingerprint(year_df)], 'links': [_fingerprint(year_links_df)]},
+		                                       dtype='uint64'))
+
+	return out
+
+
+def build(wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE, previous=None, full=False):
+	'''
+	Build (or update) the store of a vintage. Years of the previous vintage's store are reused when their inputs did not
+	change and their data was complete then. Returns the manifest
+	'''
+
+	loc = store_loc(wrds_loc, vintage)
+	os.makedirs(loc, exist_ok=True)
+
+	funda_df = wrds.load_funda(['gvkey', 'fyear', 'datadate'], wrds_loc=wrds_loc, vintage=vintage)
+	years_df = firm_years(funda_df)
+	links_df = links(wrds.load_linktable(wrds_loc=wrds_loc, vintage=vintage))
+	dsi_df = warehouse.load_dsi(columns=['date', 'vwretd'], wrds_loc=wrds_loc, vintage=vintage)
+	crsp_end = dsi_df['date'].max()
+	fingerprints = _fingerprints(years_df, links_df)
+
+	# Years of the previous store that can be copied
+	reuse = set()
+	if previous is not None and not full:
+		prev_loc = store_loc(wrds_loc, previous)
+		if os.path.exists(f'{prev_loc}/{_MANIFEST}'):
+			prev_df = pd.read_parquet(f'{prev_loc}/{_MANIFEST}')
+			ends = years_df.groupby('fyear')['datadate'].max() + pd.DateOffset(days=14)
+			for row in prev_df.itertuples():
+				if (fingerprints.get(row.fyear) == row.fingerprint and ends.get(row.fyear, crsp_end) <= row.crsp_end and
+				        os.path.exists(_year_path(prev_loc, row.fyear))):
+					shutil.copyfile(_year_path(prev_loc, row.fyear), _year_path(loc, row.fyear))
+					reuse.add(row.fyear)
+
+	todo = sorted(set(fingerprints) - reuse)
+	if todo:
+		weeks_df = market_weeks(dsi_df)
+		for fyear in todo:
+			(build_year(years_df[years_df['fyear'] == fyear], links_df, weeks_df, wrds_loc, vintage)
+			 .to_parquet(_year_path(loc, fyear), index=False))
+
+	manifest_df = pd.DataFrame({'fyear': sorted(fingerprints),
+	                            'fingerprint': np.array([fingerprints[y] for y in sorted(fingerprints)], dtype='uint64'),
+	                            'crsp_end': crsp_end,
+	                            'vintage': vintage})
+	manifest_df.to_parquet(f'{loc}/{_MANIFEST}', index=False)
+	print(f'Feature store {vintage}: {len(reuse)} years reused, {len(todo)} built')
+
+	return manifest_df
+
+
+#%%
+'''
+Lookup
+'''
+
+class FeatureStore:
+
+	def __init__(self, table_df):
+		'''
+		table_df: gvkey, fyear and feature columns, one row per gvkey-fyear
+		'''
+
+		self.table = (table_df
+		              .sort_values(by=['gvkey', 'fyear'])
+		              .drop_duplicates(subset=['gvkey', 'fyear'])
+		              .reset_index(drop=True)
+		              )
+		self._keys = self._key(self.table['gvkey'], self.table['fyear'])
+
+	@classmethod
+	def open(cls, columns=None, fyears=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+		'''
+		Store of a vintage, all or some fiscal years
+		'''
+
+		loc = store_loc(wrds_loc, vintage)
+		manifest_df = pd.read_parquet(f'{loc}/{_MANIFEST}')
+		years = [y for y in manifest_df['fyear'] if fyears is None or y in set(fyears)]
+		columns = None if columns is None else ['gvkey', 'fyear'] + [c for c in columns if c not in ('gvkey', 'fyear')]
+
+		return cls(pd.concat([pd.read_parquet(_year_path(loc, y), columns=columns) for y in years], ignore_index=True))
+
+	@staticmethod
+	def _key(gvkeys, fyears):
+
+		gvkeys = pd.to_numeric(pd.Series(np.asarray(gvkeys)), errors='coerce').to_numpy(dtype='float64')
+		fyears = pd.to_numeric(pd.Series(np.asarray(fyears)), errors='coerce').to_numpy(dtype='float64')
+		valid = ~np.isnan(gvkeys) & ~np.isnan(fyears)
+
+		return np.where(valid, np.where(valid, gvkeys, 0).astype('int64') * 10_000 + np.where(valid, fyears, 0).astype('int64'),
+		                -1)
+
+	def lookup(self, df, columns=None, gvkey_col='gvkey', fyear_col='fyear', how='left'):
+		'''
+		df with the features of its (gvkey, fyear) rows. how='inner' drops rows not in the store
+		'''
+
+		columns = [c for c in self.table.columns if c not in ('gvkey', 'fyear')] if columns is None else list(columns)
+		keys = self._key(df[gvkey_col], df[fyear_col])
+		idx = np.minimum(np.searchsorted(self._keys, keys), max(len(self._keys) - 1, 0))
+		found = (keys >= 0) & ((self._keys[idx] == keys) if len(self._keys) else False)
+		rows = np.where(found, idx, -1)
+		out_df = df.assign(**{col: self.table[col].reindex(rows).to_numpy() for col in columns})
+
+		return out_df[found] if how == 'inner' else out_df
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Firm-year market feature store')
+	parser.add_argument('command', choices=['build'])
+	parser.add_argument('--vintage', default=wrds.VINTAGE)
+	parser.add_argument('--wrds-loc', default=wrds.WRDS_LOC)
+	parser.add_argument('--previous', default=None, help='vintage whose store is reused where inputs did not change')
+	parser.add_argument('--full', action='store_true')
+	args = parser.parse_args()
+
+	build(args.wrds_loc, args.vintage, args.previous, args.full)
@@ -0,0 +1,119 @@
+'''
+Point-in-time annual Compustat
+
+Built once from the screened funda. Firm-years are indexed twice with sorted composite keys: by (gvkey, datadate) for
+"fiscal year in effect on date D" queries and by (gvkey, fyear) for prior / next year values. The fiscal year in effect on
+D is the latest one with datadate <= D, as long as D is before the next fiscal year's datadate (datadate + 12 months when
+that year is missing) - the datadate <= D < ny_datadate range join of the scripts, answered with one binary search per
+query row instead of a merge on gvkey.
+
+Prior and next year values are plain columns of the lookup: py_<col> is <col> of fyear - 1 and ny_<col> of fyear + 1
+(same as merging the table with itself on fyear + 1 / fyear - 1).
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep import wrds
+from litrep._keys import _DAY_SHIFT, _KEY_SCALE, _days, _numbers
+
+
+class Fundamentals:
+
+	def __init__(self, comp_df, gvkey='gvkey', fyear='fyear', datadate='datadate'):
+		'''
+		comp_df: screened annual Compustat, one row per gvkey-fyear (with any derived columns)
+		'''
+
+		self.table = comp_df.reset_index(drop=True)
+		self._gvkey, self._fyear, self._datadate = gvkey, fyear, datadate
+
+		gvkeys, gv_ok = _numbers(self.table[gvkey])
+		self._gvkeys = np.unique(gvkeys[gv_ok])
+		self._codes = np.searchsorted(self._gvkeys, gvkeys).astype('int64')
+		self._gv_ok = gv_ok
+
+		# (gvkey, fyear) index - first row of each key wins on duplicates
+		fyears, fy_ok = _numbers(self.table[fyear])
+		rows = np.flatnonzero(gv_ok & fy_ok)
+		keys = self._codes[rows] * _KEY_SCALE + fyears[rows].astype('int64')
+		order = np.argsort(keys, kind='stable')
+		self._fy_rows, self._fy_keys = rows[order], keys[order]
+
+		# (gvkey, datadate) index - last row of each key wins on duplicates
+		days, d_ok = _days(self.table[datadate])
+		rows = np.flatnonzero(gv_ok & d_ok)
+		keys = self._codes[rows] * _KEY_SCALE + days[rows] + _DAY_SHIFT
+		order = np.argsort(keys, kind='stable')
+		self._dd_rows, self._dd_keys = rows[order], keys[order]
+
+		# End of the fiscal year in effect: next year's datadate or 12 months after datadate
+		ny = self[f'ny_{datadate}'].fillna(self.table[datadate] + pd.DateOffset(months=12))
+		self._ny_days, _ = _days(ny)
+
+	@classmethod
+	def from_wrds(cls, columns=None, gvkeys=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+		return cls(wrds.load_funda(columns=columns, gvkeys=gvkeys, wrds_loc=wrds_loc, vintage=vintage))
+
+	def _shifted(self, col, k):
+
+		# col of the same gvkey's fyear + k, aligned to the table rows
+		fyears, fy_ok = _numbers(self.table[self._fyear])
+		keys = self._codes * _KEY_SCALE + fyears.astype('int64') + k
+		idx = np.minimum(np.searchsorted(self._fy_keys, keys), max(len(self._fy_keys) - 1, 0))
+		found = (self._fy_keys[idx] == keys) & fy_ok & self._gv_ok if len(self._fy_keys) else np.zeros(len(keys), dtype=bool)
+		rows = np.where(found, self._fy_rows[idx] if len(self._fy_rows) else -1, -1)
+
+		return self.table[col].reindex(rows).set_axis(self.table.index).rename(None)
+
+	def __getitem__(self, col):
+		'''
+		A column of the firm-year table, or a prior (py_) / next (ny_) year column
+		'''
+
+		if col in self.table.columns:
+			return self.table[col]
+		if col.startswith('py_') and col[3:] in self.table.columns:
+			return self._shifted(col[3:], -1)
+		if col.startswith('ny_') and col[3:] in self.table.columns:
+			return self._shifted(col[3:], 1)
+		raise KeyError(col)
+
+	def assign(self, **cols):
+		'''
+		Add derived columns to the table (callables get the lookup itself, so py_ / ny_ columns are available)
+		'''
+
+		for name, value in cols.items():
+			self.table[name] = value(self) if callable(value) else value
+
+		return self
+
+	def rows(self, gvkeys, dates):
+		'''
+		Table row of the fiscal year in effect for each (gvkey, date), -1 if none
+		'''
+
+		gvkeys, gv_ok = _numbers(gvkeys)
+		idx = np.minimum(np.searchsorted(self._gvkeys, gvkeys), max(len(self._gvkeys) - 1, 0))
+		found = gv_ok & ((self._gvkeys[idx] == gvkeys) if len(self._gvkeys) else False)
+		days, d_ok = _days(dates)
+
+		pos = np.searchsorted(self._dd_keys, idx.astype('int64') * _KEY_SCALE + days + _DAY_SHIFT, side='right') - 1
+		row = self._dd_rows[np.maximum(pos, 0)] if len(self._dd_rows) else np.zeros(len(days), dtype='int64')
+		hit = found & d_ok & (pos >= 0) & (self._codes[row] == idx if len(self._dd_rows) else False)
+		hit &= days < self._ny_days[row] if len(self._dd_rows) else False
+
+		return np.where(hit, row, -1)
+
+	def lookup(self, df, date_col, columns, gvkey_col='gvkey', how='left'):
+		'''
+		df with the requested columns (py_ / ny_ columns included) of the fiscal year in effect on df[date_col].
+		how='inner' drops rows without one
+		'''
+
+		rows = self.rows(df[gvkey_col], df[date_col])
+		out_df = df.assign(**{col: self[col].reindex(rows).to_numpy() for col in columns})
+
+		return out_df[rows >= 0] if how == 'inner' else out_df
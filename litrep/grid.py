@@ -0,0 +1,90 @@
+'''
+Sensitivity grid for the sample construction
+
+The expensive inputs (KSLitRisk, car, damages, Compustat and CRSP controls, i.e. main_df right before the control firms are
+selected) are computed once by the sample script and saved. Every parameter combination of the grid is then built from them
+in a process pool (each worker loads the inputs once) and the results go to one output folder:
+
+	<out_dir>/sample/     final samples, partitioned by grid point (parquet, one column per parameter)
+	<out_dir>/attrition.parquet
+
+Run from the project folder once the inputs exist, e.g.
+
+	python -m litrep.grid "2. Processed Data/1. Matching inputs_20220428.gzip" "2. Processed Data/1c. Sensitivity grid"
+'''
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+
+import pandas as pd
+
+from litrep.sample import build_sample
+
+
+# Damage windows: the script's (class period / one year before the lowest return) and its last 3, 6 or 12 months.
+# Filing dates: from the PSLRA (1996) or from SLUSA (1998-11-03), up to the end of 2007 or to the script's cutoff
+GRID = {'car_bins': [10, 20],
+        'dmgs_col': ['log_max_dmgs', 'log_max_dmgs_3m', 'log_max_dmgs_6m', 'log_max_dmgs_12m'],
+        'filing_start': ['1996-01-01', '1998-11-03'],
+        'filing_end': ['2007-12-31', '2011-09-18']}
+
+_inputs_df = None
+
+
+def points(grid):
+	'''
+	All parameter combinations of a {parameter: values} grid (a list of dicts is taken as is)
+	'''
+
+	if isinstance(grid, dict):
+		return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+	return list(grid)
+
+
+def _init(inputs):
+
+	# Once per worker: load (or receive) the inputs
+	global _inputs_df
+	_inputs_df = pd.read_parquet(inputs) if isinstance(inputs, str) else inputs
+
+
+def _run(point_id, params, build):
+
+	sample_df, attrition_df = build(_inputs_df, **params)
+	tags = {'grid_point': point_id, **{p: str(v) for p, v in params.items()}}
+
+	return sample_df.assign(**tags), attrition_df.assign(**tags)
+
+
+def run_grid(inputs, grid=GRID, out_dir=None, build=build_sample, processes=None):
+	'''
+	Build the sample for every grid point. inputs is main_df or the path of its parquet (better with many workers, as each
+	reads it instead of receiving a copy). Returns the attrition table and, if out_dir is given, writes both outputs
+	'''
+
+	params = points(grid)
+	with ProcessPoolExecutor(max_workers=processes, initializer=_init, initargs=(inputs,)) as pool:
+		results = list(pool.map(_run, range(len(params)), params, itertools.repeat(build)))
+
+	attrition_df = pd.concat([a for _, a in results], ignore_index=True)
+	if out_dir is not None:
+		os.makedirs(out_dir, exist_ok=True)
+		(pd
+		 .concat([s for s, _ in results], ignore_index=True)
+		 .to_parquet(os.path.join(out_dir, 'sample'), partition_cols=['grid_point'], index=False))
+		attrition_df.to_parquet(os.path.join(out_dir, 'attrition.parquet'), index=False)
+
+	return attrition_df
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Sample construction sensitivity grid')
+	parser.add_argument('inputs', help='parquet with main_df right before the control firms are selected')
+	parser.add_argument('out_dir')
+	parser.add_argument('--processes', type=int, default=None)
+	args = parser.parse_args()
+
+	print(run_grid(args.inputs, GRID, args.out_dir, processes=args.processes))
@@ -0,0 +1,198 @@
+'''
+SIC industry classifications
+
+Each scheme is a table of inclusive SIC ranges per industry. Ranges are compiled once into sorted lower / upper bound
+arrays, so classifying a column is one searchsorted (last range starting at or below the code) and one upper bound check,
+however many ranges the scheme has. Adding a scheme is adding its table to SCHEMES.
+'''
+
+import numpy as np
+import pandas as pd
+
+
+# Kim and Skinner (2012) high litigation risk industries
+FPS = {1: [(2833, 2836), (8731, 8734), (3570, 3577), (7370, 7374), (3600, 3674), (5200, 5961)]}
+
+# Bhagat et al. style industry dummies
+BHAGAT = {'Biotech': [(2833, 2836)],
+          'CompHrdw': [(3570, 3577)],
+          'Electronics': [(3600, 3674)],
+          'Retail': [(5200, 5961)],
+          'CompSoft': [(7371, 7379)]}
+
+# Fama and French 12 industries (12 - Other - for everything else)
+FF12 = {1: [(100, 999), (2000, 2399), (2700, 2749), (2770, 2799), (3100, 3199), (3940, 3989)],
+        2: [(2500, 2519), (2590, 2599), (3630, 3659), (3710, 3711), (3714, 3714), (3716, 3716), (3750, 3751),
+            (3792, 3792), (3900, 3939), (3990, 3999)],
+        3: [(2520, 2589), (2600, 2699), (2750, 2769), (3000, 3099), (3200, 3569), (3580, 3629), (3700, 3709),
+            (3712, 3713), (3715, 3715), (3717, 3749), (3752, 3791), (3793, 3799), (3830, 3839), (3860, 3899)],
+        4: [(1200, 1399), (2900, 2999)],
+        5: [(2800, 2829), (2840, 2899)],
+        6: [(3570, 3579), (3660, 3692), (3694, 3699), (3810, 3829), (7370, 7379)],
+        7: [(4800, 4899)],
+        8: [(4900, 4949)],
+        9: [(5000, 5999), (7200, 7299), (7600, 7699)],
+        10: [(2830, 2839), (3693, 3693), (3840, 3859), (8000, 8099)],
+        11: [(6000, 6999)]}
+
+FF12_NAMES = {1: 'NoDur', 2: 'Durbl', 3: 'Manuf', 4: 'Enrgy', 5: 'Chems', 6: 'BusEq', 7: 'Telcm', 8: 'Utils', 9: 'Shops',
+              10: 'Hlth', 11: 'Money', 12: 'Other'}
+
+# Fama and French 48 industries (48 - Other - for everything else)
+FF48 = {1: [(100, 299), (700, 799), (910, 919), (2048, 2048)],
+        2: [(2000, 2046), (2050, 2063), (2070, 2079), (2090, 2092), (2095, 2095), (2098, 2099)],
+        3: [(2064, 2068), (2086, 2087), (2096, 2097)],
+        4: [(2080, 2080), (2082, 2085)],
+        5: [(2100, 2199)],
+        6: [(920, 999), (3650, 3652), (3732, 3732), (3930, 3931), (3940, 3949)],
+        7: [(7800, 7833), (7840, 7841), (7900, 7900), (7910, 7911), (7920, 7933), (7940, 7949), (7980, 7980),
+            (7990, 7999)],
+        8: [(2700, 2749), (2770, 2771), (2780, 2799)],
+        9: [(2047, 2047), (2391, 2392), (2510, 2519), (2590, 2599), (2840, 2844), (3160, 3161), (3170, 3172),
+            (3190, 3199), (3229, 3229), (3230, 3231), (3260, 3260), (3262, 3263), (3269, 3269), (3630, 3639),
+            (3750, 3751), (3800, 3800), (3860, 3861), (3870, 3873), (3910, 3911), (3914, 3915), (3960, 3962),
+            (3991, 3991), (3995, 3995)],
+        10: [(2300, 2390), (3020, 3021), (3100, 3111), (3130, 3131), (3140, 3151), (3963, 3965)],
+        11: [(8000, 8099)],
+        12: [(3693, 3693), (3840, 3851)],
+        13: [(2830, 2831), (2833, 2836)],
+        14: [(2800, 2829), (2850, 2879), (2890, 2899)],
+        15: [(3031, 3031), (3041, 3041), (3050, 3053), (3060, 3099)],
+        16: [(2200, 2284), (2290, 2295), (2297, 2299), (2393, 2395), (2397, 2399)],
+        17: [(800, 899), (2400, 2439), (2450, 2459), (2490, 2499), (2660, 2661), (2950, 2952), (3200, 3200),
+             (3210, 3211), (3240, 3241), (3250, 3259), (3261, 3261), (3264, 3264), (3270, 3275), (3280, 3281),
+             (3290, 3293), (3295, 3299), (3420, 3433), (3440, 3442), (3446, 3446), (3448, 3452), (3490, 3499),
+             (3996, 3996)],
+        18: [(1500, 1511), (1520, 1549), (1600, 1799)],
+        19: [(3300, 3300), (3310, 3317), (3320, 3325), (3330, 3341), (3350, 3357), (3360, 3379), (3390, 3399)],
+        20: [(3400, 3400), (3443, 3444), (3460, 3479)],
+        21: [(3510, 3536), (3538, 3538), (3540, 3569), (3580, 3582), (3585, 3586), (3589, 3599)],
+        22: [(3600, 3600), (3610, 3613), (3620, 3621), (3623, 3629), (3640, 3646), (3648, 3649), (3660, 3660),
+             (3690, 3692), (3699, 3699)],
+        23: [(2296, 2296), (2396, 2396), (3010, 3011), (3537, 3537), (3647, 3647), (3694, 3694), (3700, 3700),
+             (3710, 3711), (3713, 3716), (3790, 3792), (3799, 3799)],
+        24: [(3720, 3721), (3723, 3725), (3728, 3729)],
+        25: [(3730, 3731), (3740, 3743)],
+        26: [(3480, 3489), (3760, 3769), (3795, 3795)],
+        27: [(1040, 1049)],
+        28: [(1000, 1039), (1050, 1119), (1400, 1499)],
+        29: [(1200, 1299)],
+        30: [(1300, 1300), (1310, 1339), (1370, 1382), (1389, 1389), (2900, 2912), (2990, 2999)],
+        31: [(4900, 4900), (4910, 4911), (4920, 4925), (4930, 4932), (4939, 4942)],
+        32: [(4800, 4800), (4810, 4813), (4820, 4822), (4830, 4841), (4880, 4892), (4899, 4899)],
+        33: [(7020, 7021), (7030, 7033), (7200, 7200), (7210, 7212), (7214, 7217), (7219, 7221), (7230, 7231),
+             (7240, 7241), (7250, 7251), (7260, 7299), (7395, 7395), (7500, 7500), (7510, 7515), (7520, 7549),
+             (7600, 7600), (7620, 7620), (7622, 7623), (7629, 7631), (7640, 7641), (7690, 7699), (8100, 8499),
+             (8600, 8699), (8800, 8899)],
+        34: [(2750, 2759), (3993, 3993), (4220, 4229), (7218, 7218), (7300, 7300), (7310, 7342), (7349, 7353),
+             (7359, 7372), (7374, 7385), (7389, 7394), (7396, 7397), (7399, 7399), (7519, 7519), (8700, 8700),
+             (8710, 8713), (8720, 8721), (8730, 8734), (8740, 8748), (8900, 8911), (8920, 8999)],
+        35: [(3570, 3579), (3680, 3689), (3695, 3695), (7373, 7373)],
+        36: [(3622, 3622), (3661, 3666), (3669, 3679), (3810, 3810), (3812, 3812)],
+        37: [(3811, 3811), (3820, 3827), (3829, 3839)],
+        38: [(2520, 2549), (2600, 2639), (2670, 2699), (2760, 2761), (3950, 3955)],
+        39: [(2440, 2449), (2640, 2659), (3220, 3221), (3410, 3412)],
+        40: [(4000, 4013), (4040, 4049), (4100, 4100), (4110, 4121), (4130, 4131), (4140, 4142), (4150, 4151),
+             (4170, 4173), (4190, 4200), (4210, 4219), (4230, 4231), (4240, 4249), (4400, 4700), (4710, 4712),
+             (4720, 4749), (4780, 4780), (4782, 4785), (4789, 4789)],
+        41: [(5000, 5000), (5010, 5015), (5020, 5023), (5030, 5060), (5063, 5065), (5070, 5078), (5080, 5088),
+             (5090, 5094), (5099, 5100), (5110, 5113), (5120, 5122), (5130, 5172), (5180, 5182), (5190, 5199)],
+        42: [(5200, 5200), (5210, 5231), (5250, 5251), (5260, 5261), (5270, 5271), (5300, 5300), (5310, 5311),
+             (5320, 5320), (5330, 5331), (5334, 5334), (5340, 5349), (5390, 5400), (5410, 5412), (5420, 5469),
+             (5490, 5500), (5510, 5579), (5590, 5700), (5710, 5722), (5730, 5736), (5750, 5799), (5900, 5900),
+             (5910, 5912), (5920, 5932), (5940, 5990), (5992, 5995), (5999, 5999)],
+        43: [(5800, 5829), (5890, 5899), (7000, 7000), (7010, 7019), (7040, 7049), (7213, 7213)],
+        44: [(6000, 6000), (6010, 6036), (6040, 6062), (6080, 6082), (6090, 6100), (6110, 6113), (6120, 6179),
+             (6190, 6199)],
+        45: [(6300, 6300), (6310, 6331), (6350, 6351), (6360, 6361), (6370, 6379), (6390, 6411)],
+        46: [(6500, 6500), (6510, 6510), (6512, 6515), (6517, 6532), (6540, 6541), (6550, 6553), (6590, 6599),
+             (6610, 6611)],
+        47: [(6200, 6299), (6700, 6700), (6710, 6726), (6730, 6733), (6740, 6779), (6790, 6795), (6798, 6799)],
+        48: [(4950, 4961), (4970, 4971), (4990, 4991)]}
+
+
+def _sic(siccd):
+
+	return pd.to_numeric(pd.Series(np.asarray(siccd)), errors='coerce').to_numpy(dtype='float64')
+
+
+class RangeTable:
+
+	def __init__(self, ranges, other=np.nan, missing=np.nan):
+		'''
+		ranges:  {industry: [(first SIC, last SIC), ...]} - ranges may not overlap
+		other:   industry of codes outside every range
+		missing: industry of missing codes
+		'''
+
+		bounds = sorted((lower, upper, label) for label, rs in ranges.items() for lower, upper in rs)
+		self.lower = np.array([b[0] for b in bounds], dtype='float64')
+		self.upper = np.array([b[1] for b in bounds], dtype='float64')
+		self.labels = list(ranges)
+		self._label_pos = np.array([self.labels.index(b[2]) for b in bounds], dtype='int64')
+		overlap = self.lower[1:] <= self.upper[:-1]
+		if overlap.any():
+			i = np.argmax(overlap)
+			raise ValueError(f'Overlapping SIC ranges: {bounds[i]} and {bounds[i + 1]}')
+		self.other, self.missing = other, missing
+
+	def positions(self, siccd):
+		'''
+		Position of each code's industry in self.labels (-1 outside every range, -2 missing)
+		'''
+
+		sic = _sic(siccd)
+		idx = np.searchsorted(self.lower, sic, side='right') - 1
+		inside = (idx >= 0) & (sic <= self.upper[np.maximum(idx, 0)]) if len(self.lower) else np.zeros(len(sic), dtype=bool)
+		pos = np.where(inside, self._label_pos[np.maximum(idx, 0)] if len(self.lower) else -1, -1)
+
+		return np.where(np.isnan(sic), -2, pos)
+
+	def classify(self, siccd):
+		'''
+		Industry of each SIC code
+		'''
+
+		pos = self.positions(siccd)
+		labels = np.array(self.labels + [self.missing, self.other], dtype=object)
+		out = labels[np.where(pos == -2, len(self.labels), np.where(pos == -1, len(self.labels) + 1, pos))]
+
+		return pd.to_numeric(out) if all(isinstance(v, (int, float, np.number)) for v in labels) else out
+
+	def dummies(self, siccd):
+		'''
+		One 0/1 column per industry (0 for missing codes)
+		'''
+
+		pos = self.positions(siccd)
+
+		return pd.DataFrame({label: (pos == i).astype('int64') for i, label in enumerate(self.labels)})
+
+
+SCHEMES = {'fps': RangeTable(FPS, other=0, missing=0),
+           'bhagat': RangeTable(BHAGAT),
+           'ff12': RangeTable(FF12, other=12),
+           'ff48': RangeTable(FF48, other=48)}
+
+
+def classify(siccd, scheme):
+	'''
+	Industry of each SIC code under one of SCHEMES ('fps', 'bhagat', 'ff12', 'ff48') or 'sic2'
+	'''
+
+	if scheme == 'sic2':
+		return sic2(siccd)
+	return SCHEMES[scheme].classify(siccd)
+
+
+def dummies(siccd, scheme):
+
+	return SCHEMES[scheme].dummies(siccd)
+
+
+def sic2(siccd):
+	'''
+	Two-digit SIC (missing stays missing)
+	'''
+
+	return np.floor(_sic(siccd) / 100)
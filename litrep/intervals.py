@@ -0,0 +1,180 @@
+'''
+Interval joins
+
+Joins each left row to the right rows with the same key whose [lower, upper] interval contains the left row's date, e.g.
+
+	a.gvkey = b.gvkey and b.DateOfPub_tm1 < a.FILING_DATE_p6m and a.FILING_DATE_p6m <= b.DateOfPub_t
+
+without going through SQLite. Right rows are sorted by (key, lower) once, each left row finds its candidate block with a
+binary search and only the candidates are checked against the upper bound. Dtypes are kept as they are (no string dates to
+re-parse afterwards).
+'''
+
+import numpy as np
+import pandas as pd
+
+
+_CLOSED = {'both': (True, True), 'left': (True, False), 'right': (False, True), 'neither': (False, False)}
+
+
+def _as_list(cols):
+
+	if cols is None:
+		return []
+	return [cols] if isinstance(cols, str) else list(cols)
+
+
+def _numbers(s):
+
+	# Dates as int64 nanoseconds, anything else as float - missing values never match (as in SQL)
+	if pd.api.types.is_datetime64_any_dtype(s):
+		s = pd.to_datetime(s)
+		return s.to_numpy(dtype='datetime64[ns]').view('int64'), s.notna().to_numpy()
+	s = pd.to_numeric(s, errors='coerce')
+	return s.to_numpy(dtype='float64'), s.notna().to_numpy()
+
+
+def _key_codes(left_keys, right_keys):
+
+	# Shared integer codes for the (possibly multi-column) keys of both sides - no keys puts every row in one group
+	if left_keys.shape[1] == 0:
+		return (np.zeros(len(left_keys), dtype='int64'), np.ones(len(left_keys), dtype=bool),
+		        np.zeros(len(right_keys), dtype='int64'), np.ones(len(right_keys), dtype=bool))
+	both = pd.concat([left_keys, right_keys.set_axis(left_keys.columns, axis=1)], ignore_index=True)
+	codes = both.groupby(list(both.columns), sort=False, dropna=False).ngroup().to_numpy()
+	valid = both.notna().all(axis=1).to_numpy()
+	n = len(left_keys)
+
+	return codes[:n], valid[:n], codes[n:], valid[n:]
+
+
+def _assemble(left, right, li, ri, drop, columns, suffixes):
+
+	# Left rows li next to right rows ri (-1: no match). Shared key columns (on=...) are only kept from the left
+	right_cols = [c for c in (columns if columns is not None else right.columns) if c not in drop]
+	left_part = left.iloc[li].reset_index(drop=True)
+	# -1 positions are not in the index so reindex leaves them missing
+	right_part = right[right_cols].reset_index(drop=True).reindex(ri).reset_index(drop=True)
+
+	overlap = set(left_part.columns) & set(right_part.columns)
+	left_part = left_part.rename(columns={c: f'{c}{suffixes[0]}' for c in overlap})
+	right_part = right_part.rename(columns={c: f'{c}{suffixes[1]}' for c in overlap})
+
+	return pd.concat([left_part, right_part], axis=1)
+
+
+def match(left, right, at, lower, upper, left_on, right_on, closed='both'):
+	'''
+	Positional (left row, right row) pairs that satisfy the join, ordered by left row and then by lower bound
+	'''
+
+	inc_lower, inc_upper = _CLOSED[closed]
+	l_code, l_ok, r_code, r_ok = _key_codes(left[left_on].reset_index(drop=True), right[right_on].reset_index(drop=True))
+	x, x_ok = _numbers(left[at])
+	lo, lo_ok = _numbers(right[lower])
+	hi, hi_ok = _numbers(right[upper])
+	l_ok = l_ok & x_ok
+	r_ok = r_ok & lo_ok & hi_ok
+
+	# Sort right rows by (key, lower). Lower bounds and query dates are replaced by their joint rank so that (key, date)
+	# fits a single int64 and one searchsorted finds the last candidate of each left row
+	r_pos = np.flatnonzero(r_ok)
+	r_pos = r_pos[np.lexsort((lo[r_pos], r_code[r_pos]))]
+	l_pos = np.flatnonzero(l_ok)
+	ranks = np.unique(np.r_[lo[r_pos], x[l_pos]], return_inverse=True)[1]
+	scale = ranks.max() + 1 if len(ranks) else 1
+	r_comp = r_code[r_pos] * scale + ranks[:len(r_pos)]
+	l_comp = l_code[l_pos] * scale + ranks[len(r_pos):]
+
+	first = np.searchsorted(r_code[r_pos], l_code[l_pos], side='left')
+	last = np.searchsorted(r_comp, l_comp, side='right' if inc_lower else 'left')
+	counts = np.maximum(last - first, 0)
+
+	# Every candidate (left row, right row) pair, then the upper bound check
+	li = np.repeat(l_pos, counts)
+	offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+	ri = r_pos[np.repeat(first, counts) + offsets]
+	keep = hi[ri] >= x[li] if inc_upper else hi[ri] > x[li]
+
+	return li[keep], ri[keep]
+
+
+def interval_join(left, right, at, lower, upper, on=None, left_on=None, right_on=None, closed='both', how='left',
+                  keep=None, order_by=None, columns=None, suffixes=('_x', '_y')):
+	'''
+	Join right rows whose [lower, upper] interval contains left[at] and whose keys are equal (on / left_on + right_on, or
+	no keys to join on the interval alone)
+
+	closed:   which bounds are inclusive - 'both', 'left' (lower <= at < upper), 'right' (lower < at <= upper), 'neither'
+	how:      'left' keeps left rows without a match (right columns missing), 'inner' drops them
+	keep:     None keeps every match, 'first' / 'last' keeps one match per left row by order_by (default lower)
+	columns:  right columns to bring in (default all). Overlapping names get suffixes as in pd.merge
+
+	Output follows the left row order.
+	'''
+
+	left_on = _as_list(on if on is not None else left_on)
+	right_on = _as_list(on if on is not None else right_on)
+	li, ri = match(left, right, at, lower, upper, left_on, right_on, closed)
+
+	if keep is not None:
+		by, _ = _numbers(right[order_by or lower])
+		order = np.lexsort((ri, by[ri], li))
+		li, ri = li[order], ri[order]
+		boundary = np.r_[True, li[1:] != li[:-1]] if keep == 'first' else np.r_[li[1:] != li[:-1], True]
+		li, ri = li[boundary], ri[boundary]
+
+	if how == 'left':
+		missing = np.setdiff1d(np.arange(len(left)), li)
+		li = np.r_[li, missing]
+		ri = np.r_[ri, np.full(len(missing), -1)]
+		order = np.argsort(li, kind='stable')
+		li, ri = li[order], ri[order]
+
+	return _assemble(left, right, li, ri, right_on if on is not None else [], columns, suffixes)
+
+
+def asof_join(left, right, left_date, right_date='date', on=None, left_on=None, right_on=None, direction='backward',
+              inclusive=True, within=None, how='left', columns=None, suffixes=('_x', '_y')):
+	'''
+	Join each left row to the right row with the same keys that is closest on or before (direction='backward') or on or
+	after ('forward') left[left_date]. inclusive=False skips right rows on the same date and within caps the distance in
+	calendar days. With several right rows on the chosen date the last (backward) or first (forward) one in the right
+	frame's order is used
+	'''
+
+	left_on = _as_list(on if on is not None else left_on)
+	right_on = _as_list(on if on is not None else right_on)
+	l_code, l_ok, r_code, r_ok = _key_codes(left[left_on].reset_index(drop=True), right[right_on].reset_index(drop=True))
+	x, x_ok = _numbers(left[left_date])
+	d, d_ok = _numbers(right[right_date])
+	l_ok = l_ok & x_ok
+	r_ok = r_ok & d_ok
+
+	# Same (key, date) rank encoding as match
+	r_pos = np.flatnonzero(r_ok)
+	r_pos = r_pos[np.lexsort((r_pos, d[r_pos], r_code[r_pos]))]
+	l_pos = np.flatnonzero(l_ok)
+	ranks = np.unique(np.r_[d[r_pos], x[l_pos]], return_inverse=True)[1]
+	scale = ranks.max() + 1 if len(ranks) else 1
+	r_comp = r_code[r_pos] * scale + ranks[:len(r_pos)]
+	l_comp = l_code[l_pos] * scale + ranks[len(r_pos):]
+
+	if direction == 'backward':
+		idx = np.searchsorted(r_comp, l_comp, side='right' if inclusive else 'left') - 1
+	else:
+		idx = np.searchsorted(r_comp, l_comp, side='left' if inclusive else 'right')
+	# Nearest right row, kept if it has the same key and is close enough
+	hit = np.r_[r_pos, -1][np.where((idx >= 0) & (idx < len(r_pos)), idx, -1)]
+	ok = np.r_[r_code, -1][hit] == l_code[l_pos]
+	if within is not None:
+		step = np.timedelta64(within, 'D').astype('timedelta64[ns]').astype('int64') if left[left_date].dtype.kind == 'M' else within
+		ok &= np.abs(np.r_[d, 0][hit] - x[l_pos]) <= step
+
+	ri = np.full(len(left), -1)
+	ri[l_pos[ok]] = hit[ok]
+	li = np.arange(len(left))
+	if how == 'inner':
+		li, ri = li[ri >= 0], ri[ri >= 0]
+
+	return _assemble(left, right, li, ri, right_on if on is not None else [], columns, suffixes)
@@ -0,0 +1,303 @@
+'''
+Kim and Skinner (2012) litigation risk for any (gvkey, date) panel
+
+The return inputs of the model come from per-permno running sums over CRSP monthly stock files (number of returns, ret,
+ret^2, ret^3, ret - vwretd, log(1 + ret), log(1 + vwretd), split-adjusted volume and dollar volume), so the 12-month
+car, std, skewness and turnover of any window are differences of two prefix sums found with binary searches. The
+accounting inputs are the firm's latest fiscal year ended before the date and FPS is read off the CRSP SIC code on the
+date, so a panel of daily event dates is scored the same way as the annual file of '1. KS Litigation Risk.py'.
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep import wrds
+from litrep._keys import _KEY_SCALE
+from litrep.industries import classify
+from litrep.intervals import asof_join, interval_join
+from litrep.linktable import LinkResolver
+from litrep.panels import expand
+
+
+# Kim and Skinner (2012), model (3)
+KS_COEFS = {'const': -7.883,
+            'FPS': 0.566,
+            'ln_at_py': 0.518,
+            'sales_gr_py': 0.982,
+            'car_py': 0.379,
+            'ret_skewness_py': -0.108,
+            'std_ret_py': 25.635,
+            'turnover_py': 0.00007 / 1000}
+
+
+def _months(dates):
+
+	# Month number of each date and whether the date is the last day of its month
+	days = np.asarray(pd.to_datetime(pd.Series(np.asarray(dates))), dtype='datetime64[D]')
+	valid = ~np.isnat(days)
+	months = days.astype('datetime64[M]')
+	month_end = (days + 1).astype('datetime64[M]') != months
+
+	return np.where(valid, months.astype('int64'), 0), month_end, valid
+
+
+def _diff(cs, lo, hi):
+
+	return cs[hi] - cs[lo]
+
+
+def ks_index(df, coefs=KS_COEFS):
+	'''
+	Linear index of the KS logit (coefs: {'const': ..., column: coefficient})
+	'''
+
+	index = coefs.get('const', 0)
+	for col, coef in coefs.items():
+		if col != 'const':
+			index = index + coef * df[col]
+
+	return index
+
+
+def logistic(x):
+
+	return np.exp(x) / (1 + np.exp(x))
+
+
+class MonthlyReturns:
+
+	def __init__(self, msf_df, msi_df):
+		'''
+		msf_df: permno, date, ret, vol, cfacshr, shrout, prc (CRSP msf)
+		msi_df: date, vwretd (CRSP msi)
+		'''
+
+		months, _, _ = _months(msf_df['date'])
+		m_months, _, _ = _months(msi_df['date'])
+		vwretd = pd.Series(msi_df['vwretd'].to_numpy(dtype='float64'), index=m_months)
+		vwretd = vwretd[~vwretd.index.duplicated()]
+
+		permno = msf_df['permno'].to_numpy(dtype='float64')
+		order = np.lexsort((months, permno))
+		self._permnos, codes = np.unique(permno[order], return_inverse=True)
+		self._comp = codes.astype('int64') * _KEY_SCALE + months[order]
+
+		def col(name):
+			return msf_df[name].to_numpy(dtype='float64')[order]
+
+		ret, vol, cfacshr, shrout, prc = col('ret'), col('vol'), col('cfacshr'), col('shrout'), col('prc')
+		mkt = vwretd.reindex(months[order]).to_numpy()
+
+		def cs(values, valid):
+			return np.r_[0, np.cumsum(np.where(valid, values, 0))]
+
+		r_ok = ~np.isnan(ret)
+		m_ok = ~np.isnan(mkt)
+		# A -1 return compounds to zero - counted apart so that the log sums stay finite
+		dead_r, dead_m = r_ok & (ret <= -1), m_ok & (mkt <= -1)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			self._cs = {'rows': np.r_[0, np.arange(1, len(ret) + 1)],
+			            'n': cs(1, r_ok),
+			            'ret': cs(ret, r_ok),
+			            'ret2': cs(ret ** 2, r_ok),
+			            'ret3': cs(ret ** 3, r_ok),
+			            'ar': cs(ret - mkt, r_ok & m_ok),
+			            'log_ret': cs(np.log1p(ret), r_ok & ~dead_r),
+			            'dead_ret': cs(1, dead_r),
+			            'log_mkt': cs(np.log1p(mkt), m_ok & ~dead_m),
+			            'dead_mkt': cs(1, dead_m),
+			            # Volume in the share units of the current cfacshr (divided by the window's starting cfacshr later)
+			            'vol_adj': cs(vol * cfacshr, ~np.isnan(vol * cfacshr)),
+			            'dollar_vol': cs(np.abs(prc) * vol, ~np.isnan(prc * vol))}
+
+		# Months with both cfacshr and shrout, for the starting share count of each window
+		start_ok = ~np.isnan(cfacshr) & ~np.isnan(shrout)
+		self._start_pos = np.flatnonzero(start_ok)
+		self._cfacshr, self._shrout = cfacshr, shrout
+
+	@classmethod
+	def from_wrds(cls, permnos=None, start=None, end=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+		msf_df = wrds.load_crsp('crsp_msf', ['permno', 'date', 'ret', 'vol', 'cfacshr', 'shrout', 'prc'], start, end, permnos,
+		                        wrds_loc, vintage)
+		msi_df = wrds.load_crsp('crsp_msi', ['date', 'vwretd'], start, end, None, wrds_loc, vintage)
+
+		return cls(msf_df, msi_df)
+
+	def _positions(self, permnos, starts, ends):
+
+		# Row range [lo, hi) of the months whose month end falls in [start, end]
+		permnos = pd.to_numeric(pd.Series(np.asarray(permnos)), errors='coerce').to_numpy(dtype='float64')
+		idx = np.minimum(np.searchsorted(self._permnos, permnos), max(len(self._permnos) - 1, 0))
+		found = (self._permnos[idx] == permnos) if len(self._permnos) else np.zeros(len(permnos), dtype=bool)
+		m_start, _, start_ok = _months(starts)
+		m_end, end_is_last, end_ok = _months(ends)
+		base = idx.astype('int64') * _KEY_SCALE
+		lo = np.searchsorted(self._comp, base + m_start, side='left')
+		hi = np.searchsorted(self._comp, base + m_end - (~end_is_last).astype('int64'), side='right')
+
+		return lo, np.where(found & start_ok & end_ok, np.maximum(hi, lo), lo)
+
+	def window(self, permnos, starts, ends):
+		'''
+		car, bhar, std_ret, ret_skewness, turnover and dollar_turnover_sc over the months whose month end falls in [start,
+		end], one row per input row. Same values as expanding each window to months, merging msf / msi and summarizing with
+		a groupby (missing where the window has no msf rows)
+		'''
+
+		lo, hi = self._positions(permnos, starts, ends)
+		sums = {name: _diff(cs, lo, hi) for name, cs in self._cs.items()}
+		n = sums['n'].astype('float64')
+
+		with np.errstate(divide='ignore', invalid='ignore'):
+			mean = sums['ret'] / n
+			m2 = sums['ret2'] - sums['ret'] * mean
+			m3 = sums['ret3'] - 3 * mean * sums['ret2'] + 2 * sums['ret'] * mean ** 2
+			flat = m2 <= 1e-14 * sums['ret2']
+			std_ret = np.where(n > 1, np.sqrt(np.maximum(m2, 0) / (n - 1)), np.nan)
+			skew = np.where(flat, 0, n * np.sqrt(n - 1) / (n - 2) * m3 / np.maximum(m2, 0) ** 1.5)
+			skew = np.where(n > 2, skew, np.nan)
+
+			bhar = (np.where(sums['dead_ret'] > 0, 0, np.exp(sums['log_ret']))
+			        - np.where(sums['dead_mkt'] > 0, 0, np.exp(sums['log_mkt'])))
+
+			# Shares adjusted to the first month of the window with cfacshr and shrout
+			j = np.searchsorted(self._start_pos, lo)
+			has = j < len(self._start_pos)
+			first = self._start_pos[np.where(has, j, 0)] if len(self._start_pos) else np.zeros(len(lo), dtype='int64')
+			has &= first < hi
+			start_cfacshr = np.where(has, self._cfacshr[first] if len(self._cfacshr) else np.nan, np.nan)
+			start_shrout = np.where(has, self._shrout[first] if len(self._shrout) else np.nan, np.nan)
+			# Volume in tens vs shrout in thousands (nothing to sum without starting shares)
+			turnover = np.where(has, sums['vol_adj'] / start_cfacshr / (10 * start_shrout), 0)
+			dollar_turnover_sc = np.where(has, sums['dollar_vol'] / (start_shrout * 1000), 0)
+
+		out_df = pd.DataFrame({'car': sums['ar'], 'std_ret': std_ret, 'bhar': bhar, 'ret_skewness': skew,
+		                       'turnover': turnover, 'dollar_turnover_sc': dollar_turnover_sc})
+		out_df.loc[sums['rows'] == 0] = np.nan
+
+		return out_df
+
+
+class KSScorer:
+
+	def __init__(self, funda_df, linktable_df, names_df, returns, coefs=KS_COEFS):
+		'''
+		funda_df:     gvkey, fyear, datadate, at, sale (screened annual Compustat)
+		linktable_df: gvkey, permno, linkdt, linkenddt
+		names_df:     permno, namedt, nameendt, siccd (CRSP msenames)
+		returns:      MonthlyReturns over the permnos of the linktable
+		'''
+
+		funda_df = (funda_df
+		            .filter(['gvkey', 'fyear', 'datadate', 'at', 'sale'])
+		            .dropna(subset=['gvkey', 'fyear', 'datadate'])
+		            .drop_duplicates(subset=['gvkey', 'fyear'], keep='first')
+		            )
+		self._funda_df = (funda_df
+		                  .merge(funda_df[['gvkey', 'fyear', 'at', 'sale', 'datadate']].assign(fyear=lambda x: x['fyear'] + 1),
+		                         on=['gvkey', 'fyear'], how='left', suffixes=['', '_py'])
+		                  .assign(sales_gr=lambda x: (x['sale'] - x['sale_py']) / x['at_py'],
+		                          ln_at=lambda x: np.log(x['at']))
+		                  .filter(['gvkey', 'datadate', 'datadate_py', 'ln_at', 'sales_gr'])
+		                  .sort_values(by=['gvkey', 'datadate'])
+		                  .reset_index(drop=True)
+		                  )
+		self._linktable_df = linktable_df.filter(['gvkey', 'permno', 'linkdt', 'linkenddt'])
+		self.links = LinkResolver(self._linktable_df)
+		self._names_df = names_df.filter(['permno', 'namedt', 'nameendt', 'siccd'])
+		self.returns = returns
+		self.coefs = coefs
+
+	@classmethod
+	def from_wrds(cls, gvkeys=None, start=None, end=None, coefs=KS_COEFS, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+		'''
+		Scorer for a set of gvkeys (all of Compustat by default) with CRSP monthly data over [start, end]
+		'''
+
+		funda_df = wrds.load_funda(['gvkey', 'fyear', 'datadate', 'at', 'sale'], gvkeys=gvkeys, wrds_loc=wrds_loc,
+		                           vintage=vintage)
+		linktable_df = wrds.load_linktable(gvkeys=gvkeys, wrds_loc=wrds_loc, vintage=vintage)
+		permnos = set(linktable_df['permno'].dropna())
+		names_df = wrds.load_names('crsp_msenames', ['permno', 'namedt', 'nameendt', 'siccd'], permnos, wrds_loc, vintage)
+
+		return cls(funda_df, linktable_df, names_df, MonthlyReturns.from_wrds(permnos, start, end, wrds_loc, vintage),
+		           coefs)
+
+	def features(self, panel_df, date_col='date', gvkey_col='gvkey', window='trailing'):
+		'''
+		Model inputs as of each (gvkey, date) row, in the row order of panel_df
+
+		ln_at_py, sales_gr_py: latest fiscal year ended before the date
+		FPS:                   SIC code on the date of the permno linked on the date
+		car_py, ...:           window='trailing' - the 12 months up to the last month end on or before the date, for the
+		                       permno linked on the date. window='fiscal' - the months of the latest fiscal year ended
+		                       before the date, for the permno linked at its year end (the annual file's _py values)
+		'''
+
+		base_df = pd.DataFrame({'gvkey': panel_df[gvkey_col].to_numpy(),
+		                        'date': pd.to_datetime(panel_df[date_col]).to_numpy()})
+		gvkeys, dates = base_df['gvkey'].to_numpy(), base_df['date'].to_numpy()
+
+		# Accounting as of the date
+		base_df = asof_join(base_df, self._funda_df, 'date', 'datadate', on=['gvkey'], inclusive=False,
+		                    columns=['datadate', 'datadate_py', 'ln_at', 'sales_gr'])
+
+		# Industry on the date
+		permno = self.links.permno(gvkeys, dates)
+		siccd = (interval_join(pd.DataFrame({'permno': permno, 'date': dates}), self._names_df, 'date', 'namedt', 'nameendt',
+		                       on=['permno'], keep='last', columns=['siccd'])['siccd'])
+
+		# Return window
+		if window == 'trailing':
+			end = dates
+			last = pd.to_datetime(end) + pd.offsets.MonthEnd(0)
+			last = np.where(last.to_numpy() > end, (last - pd.offsets.MonthEnd(1)).to_numpy(), last.to_numpy())
+			start = (pd.to_datetime(last) - pd.offsets.MonthBegin(12)).to_numpy()
+		elif window == 'fiscal':
+			permno = self.links.permno(gvkeys, base_df['datadate'].to_numpy())
+			start = (base_df['datadate_py'] + pd.offsets.DateOffset(1)).to_numpy()
+			end = base_df['datadate'].to_numpy()
+		else:
+			raise ValueError(f'Unknown window: {window}')
+		returns_df = self.returns.window(permno, start, end)
+
+		return pd.DataFrame({'FPS': classify(siccd, 'fps'),
+		                     'ln_at_py': base_df['ln_at'].to_numpy(),
+		                     'sales_gr_py': base_df['sales_gr'].to_numpy(),
+		                     **{f'{col}_py': returns_df[col].to_numpy() for col in returns_df.columns}},
+		                    index=panel_df.index)
+
+	def score(self, panel_df, date_col='date', gvkey_col='gvkey', window='trailing', keep_features=False):
+		'''
+		panel_df with KS (logit index) and KSLitRisk (probability) as of each row's date
+		'''
+
+		features_df = self.features(panel_df, date_col, gvkey_col, window)
+		ks = ks_index(features_df, self.coefs)
+		out_df = panel_df.assign(KS=ks, KSLitRisk=logistic(ks))
+
+		return pd.concat([out_df, features_df], axis=1) if keep_features else out_df
+
+	def monthly(self, start, end, window='trailing'):
+		'''
+		Month-end KS for every gvkey with a CRSP link at the month end, months in [start, end]
+		'''
+
+		start, end = pd.to_datetime(start), pd.to_datetime(end)
+		panel_df = (self._linktable_df
+		            .assign(linkdt=lambda x: x['linkdt'].clip(lower=start),
+		                    linkenddt=lambda x: x['linkenddt'].clip(upper=end))
+		            .query('linkdt <= linkenddt')
+		            .pipe(expand, 'linkdt', 'linkenddt', 'M')
+		            .filter(['gvkey', 'date'])
+		            .drop_duplicates()
+		            .sort_values(by=['gvkey', 'date'])
+		            .reset_index(drop=True)
+		            )
+
+		return (self
+		        .score(panel_df, 'date', 'gvkey', window)
+		        .dropna(subset=['KS'])
+		        .reset_index(drop=True)
+		        )
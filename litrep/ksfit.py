@@ -0,0 +1,216 @@
+'''
+Re-estimation of the Kim and Skinner (2012) litigation model
+
+A firm-year is sued if a class action was filed during its fiscal year (after the prior year's datadate, up to its own
+datadate), with the model inputs of '1. KS Litigation Risk.py' (prior year accounting and returns, current FPS). The logit
+is fitted by Newton / IRLS on the whole design matrix at once (standardized columns, step halving), so a full Compustat
+universe takes a handful of matrix products. Rolling fits use the `window` fiscal years before each year, so a year is
+never scored with coefficients that saw it, and run in a process pool.
+
+Coefficient tables are long: model ('paper', 'full', 'rolling'), fyear (year the coefficients are applied to, missing
+for 'paper' and 'full'), term, coef, se, n_obs, n_sued, converged. Write one from the command line with
+
+	python -m litrep.ksfit "2. Processed Data/19b. KS features - 20210621.gzip" "1. Raw Data/1. Sued_sample_20211104.xlsx" \
+		"2. Processed Data/19c. KS coefficients - 20210621.gzip" --window 5 --processes 4
+'''
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+import pandas as pd
+
+from litrep.intervals import interval_join
+from litrep.ks import KS_COEFS, ks_index
+
+
+TERMS = [t for t in KS_COEFS if t != 'const']
+
+_design_df = None
+
+
+def design(features_df, filings_df, gvkey='gvkey', filing_date='FILING_DATE', terms=TERMS):
+	'''
+	Firm-years with all the model inputs and sued = 1 if a filing falls in (datadate_py, datadate]
+
+	features_df: gvkey, fyear, datadate_py, datadate and the model inputs (the lagged panel of '1. KS Litigation Risk.py')
+	filings_df:  one row per lawsuit (gvkey, filing date)
+	'''
+
+	years_df = (features_df
+	            .dropna(subset=list(terms) + ['datadate_py', 'datadate'])
+	            .assign(gvkey=lambda x: pd.to_numeric(x['gvkey']))
+	            .reset_index(drop=True)
+	            )
+	filings_df = (filings_df
+	              .filter([gvkey, filing_date])
+	              .set_axis(['gvkey', 'filing_date'], axis=1)
+	              .assign(gvkey=lambda x: pd.to_numeric(x['gvkey'], errors='coerce'),
+	                      filing_date=lambda x: pd.to_datetime(x['filing_date']))
+	              )
+	hits_df = interval_join(filings_df, years_df[['gvkey', 'datadate_py', 'datadate']].assign(_row=np.arange(len(years_df))),
+	                        'filing_date', 'datadate_py', 'datadate', on=['gvkey'], closed='right', how='inner',
+	                        columns=['_row'])
+	sued = np.zeros(len(years_df), dtype='int64')
+	sued[hits_df['_row'].to_numpy(dtype='int64')] = 1
+
+	return years_df.assign(sued=sued)
+
+
+def irls(X, y, tol=1e-8, max_iter=100):
+	'''
+	Logit MLE of y on X (which holds the constant column if wanted). Returns (coef, se, converged, iterations)
+	'''
+
+	# Standardize the non-constant columns - Newton steps are scale free but the Hessian is much better conditioned
+	mu = X.mean(axis=0)
+	sd = X.std(axis=0)
+	const = sd == 0
+	mu[const], sd[const] = 0, 1
+	Z = (X - mu) / sd
+
+	def loglik(b):
+		eta = Z @ b
+		return np.sum(y * eta - np.logaddexp(0, eta))
+
+	b = np.zeros(Z.shape[1])
+	ll = loglik(b)
+	converged = False
+	for it in range(1, max_iter + 1):
+		p = 1 / (1 + np.exp(-(Z @ b)))
+		H = Z.T @ (Z * (p * (1 - p))[:, None])
+		step = np.linalg.solve(H, Z.T @ (y - p))
+		# Halve the step until the likelihood does not fall
+		for _ in range(30):
+			new_ll = loglik(b + step)
+			if new_ll >= ll - 1e-12:
+				break
+			step = step / 2
+		b, ll = b + step, new_ll
+		if np.max(np.abs(step)) < tol:
+			converged = True
+			break
+
+	p = 1 / (1 + np.exp(-(Z @ b)))
+	cov = np.linalg.inv(Z.T @ (Z * (p * (1 - p))[:, None]))
+
+	# Back to the original scale: x = mu + sd * z
+	T = np.diag(1 / sd)
+	T[const, :] = -(mu / sd)[None, :].repeat(const.sum(), axis=0)
+	T[const, const] = 1
+	coef = T @ b
+	se = np.sqrt(np.diag(T @ cov @ T.T))
+
+	return coef, se, converged, it
+
+
+def fit(design_df, terms=TERMS, y='sued'):
+	'''
+	KS logit on a design table: one row per term (const first) with coef, se, n_obs, n_sued and converged
+	'''
+
+	X = np.c_[np.ones(len(design_df)), design_df[list(terms)].to_numpy(dtype='float64')]
+	yv = design_df[y].to_numpy(dtype='float64')
+	coef, se, converged, _ = irls(X, yv)
+
+	return pd.DataFrame({'term': ['const'] + list(terms), 'coef': coef, 'se': se, 'n_obs': len(yv),
+	                     'n_sued': int(yv.sum()), 'converged': converged})
+
+
+def _init(design_df):
+
+	global _design_df
+	_design_df = design_df
+
+
+def _fit_year(year, window, terms, year_col):
+
+	train_df = _design_df[(_design_df[year_col] >= year - window) & (_design_df[year_col] < year)]
+	if train_df['sued'].sum() == 0 or len(train_df) <= len(terms) + 1:
+		return pd.DataFrame()
+	return fit(train_df, terms).assign(fyear=year)
+
+
+def fit_rolling(design_df, years=None, window=5, processes=1, terms=TERMS, year_col='fyear'):
+	'''
+	One fit per year on the window fiscal years before it (years with no sued firm-year in their window are skipped)
+	'''
+
+	years = sorted(design_df[year_col].dropna().unique() + 1 if years is None else years)
+	args = (years, [window] * len(years), [terms] * len(years), [year_col] * len(years))
+	if processes == 1:
+		_init(design_df)
+		results = list(map(_fit_year, *args))
+	else:
+		with ProcessPoolExecutor(max_workers=processes, initializer=_init, initargs=(design_df,)) as pool:
+			results = list(pool.map(_fit_year, *args))
+
+	return pd.concat(results, ignore_index=True)
+
+
+def coefficient_table(design_df, years=None, window=5, processes=1, terms=TERMS, year_col='fyear'):
+	'''
+	Paper, full sample and rolling coefficients in one long table
+	'''
+
+	paper_df = pd.DataFrame({'term': ['const'] + list(terms), 'coef': [KS_COEFS[t] for t in ['const'] + list(terms)]})
+
+	return (pd
+	        .concat([paper_df.assign(model='paper'),
+	                 fit(design_df, terms).assign(model='full'),
+	                 fit_rolling(design_df, years, window, processes, terms, year_col).assign(model='rolling')],
+	                ignore_index=True)
+	        .filter(['model', 'fyear', 'term', 'coef', 'se', 'n_obs', 'n_sued', 'converged'])
+	        )
+
+
+def load_coefficients(path, model):
+	'''
+	Rows of a fitted model ('full', 'rolling') from the coefficient table written by python -m litrep.ksfit
+	'''
+
+	if not os.path.exists(path):
+		raise FileNotFoundError(f'No KS coefficient table at {path}: write it with python -m litrep.ksfit (from the 19b KS '
+		                        f'features) to use the {model!r} model, or use the paper coefficients')
+	coef_df = pd.read_parquet(path)
+	if not (coef_df['model'] == model).any():
+		raise ValueError(f'No {model!r} coefficients in {path}')
+
+	return coef_df[coef_df['model'] == model]
+
+
+def predict_index(df, coef_df, model='paper', year_col='fyear'):
+	'''
+	KS logit index of every row of df with one model of a coefficient table (rolling coefficients by df[year_col]; years
+	without coefficients are missing)
+	'''
+
+	coef_df = coef_df[coef_df['model'] == model]
+	if coef_df['fyear'].isna().all():
+		return ks_index(df, dict(zip(coef_df['term'], coef_df['coef'])))
+
+	wide_df = coef_df.pivot(index='fyear', columns='term', values='coef')
+	coefs = wide_df.reindex(df[year_col].to_numpy())
+	index = coefs['const'].to_numpy()
+	for term in wide_df.columns.drop('const'):
+		index = index + coefs[term].to_numpy() * df[term].to_numpy(dtype='float64')
+
+	return pd.Series(index, index=df.index)
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Kim and Skinner (2012) model re-estimation')
+	parser.add_argument('features', help='parquet with the lagged KS inputs from 1. KS Litigation Risk.py')
+	parser.add_argument('lawsuits', help='excel with the lawsuits (GVKEY, FILING_DATE)')
+	parser.add_argument('out')
+	parser.add_argument('--window', type=int, default=5)
+	parser.add_argument('--processes', type=int, default=None)
+	args = parser.parse_args()
+
+	design_df = design(pd.read_parquet(args.features), pd.read_excel(args.lawsuits, usecols=['GVKEY', 'FILING_DATE']),
+	                   gvkey='GVKEY')
+	coef_df = coefficient_table(design_df, window=args.window, processes=args.processes)
+	coef_df.to_parquet(args.out, index=False)
+	print(coef_df.query('model != "rolling"'))
@@ -0,0 +1,179 @@
+'''
+Point-in-time CRSP - Compustat link resolver
+
+Built once from the (already filtered) linktable. Links are kept as sorted [linkdt, linkenddt] intervals per gvkey and per
+permno, and (gvkey, date) -> permno or (permno, date) -> gvkey lookups are answered with binary searches, so memory grows
+with the number of link records instead of the number of calendar days covered by the links.
+
+When more than one link covers a date the lowest (or highest) identifier wins, which is what sorting by permno and
+dropping duplicates did in the scripts. prefer='all' returns every covering link, like merging on a daily linktable panel.
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep import wrds
+from litrep._keys import _DAY_SHIFT, _KEY_SCALE, _days
+
+
+def _keys(keys):
+
+	keys = pd.to_numeric(pd.Series(np.asarray(keys)), errors='coerce').to_numpy(dtype='float64')
+	valid = ~np.isnan(keys)
+
+	return np.where(valid, keys, 0).astype('int64'), valid
+
+
+class _Intervals:
+
+	def __init__(self, keys, starts, ends, values):
+
+		keys, _ = _keys(keys)
+		starts, _ = _days(starts)
+		ends, _ = _days(ends)
+		order = np.lexsort((starts, keys))
+
+		self.keys = keys[order]
+		self.ends = ends[order]
+		self.values = np.asarray(values, dtype='float64')[order]
+		self.comp = self.keys * _KEY_SCALE + starts[order] + _DAY_SHIFT
+		# Most links any single key has - bounds how far back a search has to look for overlapping links
+		self.depth = int(np.unique(self.keys, return_counts=True)[1].max()) if len(self.keys) else 0
+
+	def candidates(self, keys, dates):
+		'''
+		Yield (query positions, values) for every link covering the query dates, walking back from the last link that
+		started on or before each date
+		'''
+
+		keys, key_ok = _keys(keys)
+		days, day_ok = _days(dates)
+
+		last = np.searchsorted(self.comp, keys * _KEY_SCALE + days + _DAY_SHIFT, side='right') - 1
+		first = np.searchsorted(self.keys, keys, side='left')
+		alive = key_ok & day_ok
+
+		for j in range(self.depth):
+			idx = last - j
+			alive &= idx >= first
+			if not alive.any():
+				break
+			safe = np.where(alive, idx, 0)
+			pos = np.flatnonzero(alive & (self.ends[safe] >= days))
+			yield pos, self.values[safe[pos]]
+
+	def resolve(self, keys, dates, prefer='lowest'):
+
+		out = np.full(len(keys), np.nan)
+		for pos, values in self.candidates(keys, dates):
+			current = out[pos]
+			if prefer == 'lowest':
+				better = np.isnan(current) | (values < current)
+			else:
+				better = np.isnan(current) | (values > current)
+			out[pos[better]] = values[better]
+
+		return out
+
+	def pairs(self, keys, dates):
+
+		found = list(self.candidates(keys, dates))
+		if not found:
+			return np.array([], dtype='int64'), np.array([], dtype='float64')
+		pos = np.concatenate([p for p, _ in found])
+		values = np.concatenate([v for _, v in found])
+		order = np.lexsort((values, pos))
+
+		return pos[order], values[order]
+
+
+class LinkResolver:
+
+	def __init__(self, linktable_df, gvkey='gvkey', permno='permno', start='linkdt', end='linkenddt'):
+
+		df = linktable_df.dropna(subset=[gvkey, permno, start, end])
+		self._links = pd.DataFrame({'gvkey': df[gvkey].to_numpy(), 'start': pd.to_datetime(df[start]).to_numpy(),
+		                            'end': pd.to_datetime(df[end]).to_numpy()})
+		self._by_gvkey = _Intervals(df[gvkey], df[start], df[end], df[permno])
+		self._by_permno = _Intervals(df[permno], df[start], df[end], df[gvkey])
+
+	@classmethod
+	def from_wrds(cls, gvkeys=None, permnos=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+		return cls(wrds.load_linktable(gvkeys=gvkeys, permnos=permnos, wrds_loc=wrds_loc, vintage=vintage))
+
+	def permno(self, gvkeys, dates, prefer='lowest'):
+		'''
+		Permno linked to each gvkey on each date (NaN if none)
+		'''
+
+		return self._by_gvkey.resolve(np.asarray(gvkeys), np.asarray(dates), prefer)
+
+	def gvkey(self, permnos, dates, prefer='lowest'):
+		'''
+		Gvkey linked to each permno on each date (NaN if none)
+		'''
+
+		return self._by_permno.resolve(np.asarray(permnos), np.asarray(dates), prefer)
+
+	def _merge(self, side, df, key_col, date_col, out, how, prefer):
+
+		if prefer == 'all':
+			pos, values = side.pairs(df[key_col].to_numpy(), df[date_col].to_numpy())
+			matched = df.iloc[pos].assign(**{out: values})
+			if how == 'inner':
+				return matched
+			# Keep unmatched rows (in their original position) as the left merge on the daily panel did
+			missing = np.setdiff1d(np.arange(len(df)), pos)
+			order = np.argsort(np.r_[pos, missing], kind='stable')
+			return pd.concat([matched, df.iloc[missing].assign(**{out: np.nan})]).iloc[order]
+
+		df = df.assign(**{out: side.resolve(df[key_col].to_numpy(), df[date_col].to_numpy(), prefer)})
+
+		return df.dropna(subset=[out]) if how == 'inner' else df
+
+	def merge_permno(self, df, date_col='date', gvkey_col='gvkey', out='permno', how='left', prefer='lowest'):
+		'''
+		Add the permno linked to each row's gvkey on date_col. how='inner' drops rows without a link
+		'''
+
+		return self._merge(self._by_gvkey, df, gvkey_col, date_col, out, how, prefer)
+
+	def merge_gvkey(self, df, date_col='date', permno_col='permno', out='gvkey', how='left', prefer='lowest'):
+		'''
+		Add the gvkey linked to each row's permno on date_col. how='inner' drops rows without a link
+		'''
+
+		return self._merge(self._by_permno, df, permno_col, date_col, out, how, prefer)
+
+	def permno_spans(self, df, start_col, end_col, gvkey_col='gvkey', out='permno', prefer='lowest'):
+		'''
+		Split each row's [start_col, end_col] window into the spans over which the linked permno does not change. One row
+		per span with a link, with the span in span_start / span_end
+		'''
+
+		# A gvkey's permno can only change on the day a link starts or on the day after one ends
+		bounds = (pd
+		          .concat([self._links[['gvkey', 'start']].set_axis(['_key', 'span_start'], axis=1),
+		                   self._links.assign(end=lambda x: x['end'] + pd.DateOffset(days=1))[['gvkey', 'end']]
+		                   .set_axis(['_key', 'span_start'], axis=1)])
+		          .drop_duplicates()
+		          )
+
+		rows = df.reset_index(drop=True).assign(_row=lambda x: range(0, len(x)))
+		cuts = (rows[['_row', gvkey_col, start_col, end_col]]
+		        .merge(bounds, left_on=gvkey_col, right_on='_key', how='inner')
+		        .pipe(lambda x: x[(x[start_col] < x['span_start']) & (x['span_start'] <= x[end_col])])
+		        .filter(['_row', 'span_start'])
+		        )
+		spans = (pd
+		         .concat([rows[['_row', start_col]].rename(columns={start_col: 'span_start'}), cuts])
+		         .dropna()
+		         .sort_values(by=['_row', 'span_start'])
+		         .merge(rows, on='_row', how='left')
+		         .assign(span_end=lambda x: (x.groupby(['_row'])['span_start'].shift(-1) - pd.Timedelta(days=1))
+		                 .fillna(x[end_col]))
+		         )
+		spans[out] = self.permno(spans[gvkey_col].to_numpy(), spans['span_start'].to_numpy(), prefer)
+
+		return spans.dropna(subset=[out]).drop(['_row'], axis=1).reset_index(drop=True)
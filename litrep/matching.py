@@ -0,0 +1,170 @@
+'''
+Nearest-neighbour matching within strata
+
+Controls are sorted once by (stratum, value). Each treated row finds its place among the controls of its stratum with a
+binary search and only the k controls on either side are looked at, so matching is linear in the number of rows up to the
+sort. Distances are |treated value - control value| and ties go to the lowest control id, as in sorting the full case x
+candidate table by (distance, id) and keeping the first rows.
+
+Without replacement, controls are handed out greedily: each round every unmatched treated row claims its nearest remaining
+control, the closest claim (earliest treated row on ties) wins and the control is taken out for all strata.
+'''
+
+import numpy as np
+import pandas as pd
+
+
+def _as_list(cols):
+
+	if cols is None:
+		return []
+	return [cols] if isinstance(cols, str) else list(cols)
+
+
+class _Sorted:
+
+	def __init__(self, strata, ranks, tie, rows, n_ranks):
+
+		# Keys are stratum * n_ranks + rank, with n_ranks over treated and control values together so that a treated value
+		# above every control of its stratum stays below the next stratum's keys. Right side: (stratum, value, id) - equal
+		# values in increasing id. Left side: ids decreasing so that walking left from the search position also meets equal
+		# values in increasing id
+		self.right = rows[np.lexsort((tie[rows], ranks[rows], strata[rows]))]
+		self.left = rows[np.lexsort((-tie[rows], ranks[rows], strata[rows]))]
+		self.key_right = strata[self.right] * n_ranks + ranks[self.right]
+		self.key_left = strata[self.left] * n_ranks + ranks[self.left]
+		self.n_ranks = n_ranks
+
+
+class NearestNeighbours:
+
+	def __init__(self, treated_df, controls_df, on, by=None, control_id=None):
+		'''
+		on:         matching variable (same name in both tables)
+		by:         exact-match strata columns (e.g. the case id, or case and buckets)
+		control_id: identity of a control (e.g. gvkey) - used for ties and, without replacement, to use each control once
+		'''
+
+		by = _as_list(by)
+		self.treated_df, self.controls_df = treated_df, controls_df
+
+		# Shared stratum codes and value ranks (rank encoding keeps the searches on integers)
+		n_t = len(treated_df)
+		if by:
+			keys = pd.concat([treated_df[by], controls_df[by]], ignore_index=True)
+			strata = keys.groupby(by, sort=False, dropna=False).ngroup().to_numpy().astype('int64')
+			ok = keys.notna().all(axis=1).to_numpy().copy()
+		else:
+			strata = np.zeros(n_t + len(controls_df), dtype='int64')
+			ok = np.ones(n_t + len(controls_df), dtype=bool)
+		values = np.r_[treated_df[on].to_numpy(dtype='float64'), controls_df[on].to_numpy(dtype='float64')]
+		ok &= ~np.isnan(values)
+		ranks = np.full(len(values), -1, dtype='int64')
+		ranks[ok] = np.unique(values[ok], return_inverse=True)[1]
+		self._n_ranks = max(ranks.max() + 1, 1) if len(ranks) else 1
+
+		self._t_strata, self._c_strata = strata[:n_t], strata[n_t:]
+		self._t_values, self._c_values = values[:n_t], values[n_t:]
+		self._t_ranks, self._c_ranks = ranks[:n_t], ranks[n_t:]
+		self._t_ok, self._c_ok = ok[:n_t], ok[n_t:]
+
+		# Control identity (ordered like the ids themselves) and tie-break (identity, then row)
+		if control_id is None:
+			self._c_ident = np.arange(len(controls_df))
+		else:
+			self._c_ident = np.unique(controls_df[control_id].to_numpy(), return_inverse=True)[1]
+		self._c_tie = self._c_ident.astype('int64') * max(len(controls_df), 1) + np.arange(len(controls_df))
+
+	def _nearest(self, t_rows, available, k):
+
+		# Up to k nearest available controls of each treated row: (control rows, distances), -1 / inf where missing
+		index = _Sorted(self._c_strata, self._c_ranks, self._c_tie, np.flatnonzero(available & self._c_ok),
+		                self._n_ranks)
+		if not len(index.right):
+			return np.full((len(t_rows), k), -1), np.full((len(t_rows), k), np.inf)
+		t_key = self._t_strata[t_rows] * index.n_ranks + self._t_ranks[t_rows]
+		p_right = np.searchsorted(index.key_right, t_key, side='left')
+		p_left = np.searchsorted(index.key_left, t_key, side='left')
+
+		steps = np.arange(k)
+		pos_right = p_right[:, None] + steps
+		pos_left = p_left[:, None] - 1 - steps
+		right = index.right[np.clip(pos_right, 0, len(index.right) - 1)]
+		left = index.left[np.clip(pos_left, 0, len(index.left) - 1)]
+		stratum = self._t_strata[t_rows, None]
+		ok_right = (pos_right < len(index.right)) & (self._c_strata[right] == stratum)
+		ok_left = (pos_left >= 0) & (self._c_strata[left] == stratum)
+
+		cand = np.c_[right, left]
+		ok = np.c_[ok_right, ok_left]
+		dist = np.where(ok, np.abs(self._c_values[cand] - self._t_values[t_rows, None]), np.inf)
+		tie = np.where(ok, self._c_tie[cand], np.iinfo('int64').max)
+
+		# k best of the 2k candidates by (distance, id)
+		row = np.repeat(np.arange(len(t_rows)), 2 * k)
+		order = np.lexsort((tie.ravel(), dist.ravel(), row)).reshape(len(t_rows), 2 * k)
+		order = order - 2 * k * np.arange(len(t_rows))[:, None]
+		order = order[:, :k]
+		best = np.take_along_axis(cand, order, axis=1)
+		best_dist = np.take_along_axis(dist, order, axis=1)
+
+		return np.where(np.isinf(best_dist), -1, best), best_dist
+
+	def match(self, k=1, caliper=None, replace=True):
+		'''
+		Controls matched to each treated row: the control rows with the treated row's index label (treated), the distance and
+		the neighbour's rank (match_rank, 1 = nearest). Neighbours beyond the caliper are dropped
+		'''
+
+		t_rows = np.flatnonzero(self._t_ok)
+		caliper = np.inf if caliper is None else caliper
+
+		if replace:
+			best, dist = self._nearest(t_rows, np.ones(len(self.controls_df), dtype=bool), k)
+			keep = (best >= 0) & (dist <= caliper)
+			treated = np.repeat(t_rows, k).reshape(-1, k)[keep]
+			controls, dists = best[keep], dist[keep]
+			ranks = np.broadcast_to(np.arange(1, k + 1), best.shape)[keep]
+		else:
+			available = np.ones(len(self.controls_df), dtype=bool)
+			matched = np.zeros(len(t_rows), dtype='int64')
+			pending = np.ones(len(t_rows), dtype=bool)
+			treated, controls, dists, ranks = [], [], [], []
+			while pending.any():
+				rows = np.flatnonzero(pending)
+				best, dist = self._nearest(t_rows[rows], available, 1)
+				best, dist = best[:, 0], dist[:, 0]
+				# No control left within the caliper
+				gone = (best < 0) | (dist > caliper)
+				pending[rows[gone]] = False
+				rows, best, dist = rows[~gone], best[~gone], dist[~gone]
+				# Closest claim on each control wins
+				order = np.lexsort((rows, dist, self._c_ident[best]))
+				first = np.diff(np.r_[-1, self._c_ident[best[order]]]) != 0
+				win = order[first]
+				treated.append(t_rows[rows[win]])
+				controls.append(best[win])
+				dists.append(dist[win])
+				matched[rows[win]] += 1
+				ranks.append(matched[rows[win]])
+				available &= ~np.isin(self._c_ident, self._c_ident[best[win]])
+				pending[rows[win]] &= matched[rows[win]] < k
+			treated, controls, dists, ranks = [np.concatenate(x) if x else np.array([], dtype='int64')
+			                                   for x in (treated, controls, dists, ranks)]
+
+		order = np.lexsort((ranks, treated))
+		return (self.controls_df
+		        .iloc[controls[order]]
+		        .reset_index(drop=True)
+		        .assign(treated=self.treated_df.index.to_numpy()[treated[order]],
+		                distance=np.asarray(dists, dtype='float64')[order],
+		                match_rank=np.asarray(ranks)[order])
+		        )
+
+
+def nearest_neighbours(treated_df, controls_df, on, by=None, control_id=None, k=1, caliper=None, replace=True):
+	'''
+	Stratified nearest-neighbour matching on one variable (see NearestNeighbours.match)
+	'''
+
+	return NearestNeighbours(treated_df, controls_df, on, by, control_id).match(k, caliper, replace)
@@ -0,0 +1,172 @@
+'''
+Expand (start, end) rows into date panels
+
+Replaces ak.create_ts / create_ts_v2. The number of dates of every row is computed up front and the panel is built with one
+np.repeat of the rows and offset arithmetic on the dates, so only the rows that are kept are ever created (e.g. Fridays only
+or trading days only, instead of all days and a filter afterwards). iter_expand yields the same panel in bounded chunks.
+
+shift brings in lags and leads of a (entity, period) panel - e.g. the prior fiscal year's columns - without merging the frame
+with a copy of itself on a shifted period.
+
+Frequencies:
+	'D':     every calendar day in [start, end]
+	'M':     month ends in [start, end] (the datadate convention of Compustat and of the msf dates moved to month end)
+	'W-FRI': one weekday only, e.g. Fridays ('W-MON' ... 'W-SUN')
+	'T':     trading days (crsp_dsi dates) in [start, end]
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep._keys import _days
+from litrep.calendar import TradingCalendar
+
+
+_WEEKDAYS = {'MON': 0, 'TUE': 1, 'WED': 2, 'THU': 3, 'FRI': 4, 'SAT': 5, 'SUN': 6}
+
+
+def _plan(df, start, end, freq, calendar):
+	'''
+	First date (as a day number or a calendar position), step and number of dates of each row
+	'''
+
+	lo, lo_ok = _days(df[start])
+	hi, hi_ok = _days(df[end])
+	ok = lo_ok & hi_ok
+	lo, hi = np.where(ok, lo, 0), np.where(ok, hi, 0)
+
+	if freq == 'D':
+		first, step, counts = lo, 1, hi - lo + 1
+	elif freq == 'M':
+		# Month numbers of the first and last month end in the period
+		m_lo = lo.astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+		m_hi = hi.astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+		m_end = (m_hi + 1).astype('datetime64[M]').astype('datetime64[D]').astype('int64') - 1
+		first, step, counts = m_lo, 1, np.where(hi == m_end, m_hi, m_hi - 1) - m_lo + 1
+	elif freq.startswith('W-'):
+		# 1970-01-01 is a Thursday
+		weekday = _WEEKDAYS[freq[2:]]
+		first = lo + (weekday - (lo + 3) % 7) % 7
+		step, counts = 7, np.where(hi >= first, (hi - first) // 7 + 1, 0)
+	elif freq == 'T':
+		if calendar is None:
+			calendar = TradingCalendar.from_dsi()
+		days = calendar.dates.astype('datetime64[D]').astype('int64')
+		first = np.searchsorted(days, lo, side='left')
+		step, counts = 1, np.searchsorted(days, hi, side='right') - first
+	else:
+		raise ValueError(f'Unknown frequency: {freq}')
+
+	return first, step, np.where(ok, np.maximum(counts, 0), 0), calendar
+
+
+def _build(df, rows, first, step, counts, freq, calendar, out):
+
+	offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+	values = np.repeat(first, counts) + offsets * step
+
+	if freq == 'M':
+		dates = (values + 1).astype('datetime64[M]').astype('datetime64[D]') - np.timedelta64(1, 'D')
+	elif freq == 'T':
+		dates = calendar.dates[values]
+	else:
+		dates = values.astype('datetime64[D]')
+
+	return (df
+	        .iloc[np.repeat(rows, counts)]
+	        .reset_index(drop=True)
+	        .assign(**{out: pd.to_datetime(dates.astype('datetime64[ns]'))})
+	        )
+
+
+def expand(df, start, end, freq='D', out='date', calendar=None):
+	'''
+	Panel with one row per date in [start, end] (see the frequencies above) for each row of df, keeping all of df's columns.
+	Rows with a missing start or end, or without any date, drop out
+	'''
+
+	first, step, counts, calendar = _plan(df, start, end, freq, calendar)
+
+	return _build(df, np.arange(len(df)), first, step, counts, freq, calendar, out)
+
+
+def iter_expand(df, start, end, freq='D', out='date', calendar=None, chunk_rows=5_000_000):
+	'''
+	Same panel as expand, yielded in chunks of whole input rows with at most chunk_rows dates each (a single longer row is a
+	chunk of its own)
+	'''
+
+	first, step, counts, calendar = _plan(df, start, end, freq, calendar)
+
+	# Chunk boundaries on the running count of dates
+	total = np.cumsum(counts)
+	i = 0
+	while i < len(df):
+		base = total[i - 1] if i else 0
+		j = max(int(np.searchsorted(total, base + chunk_rows, side='right')), i + 1)
+		rows = np.arange(i, j)
+		if counts[rows].sum():
+			yield _build(df.iloc[i:j], rows - i, first[rows], step, counts[rows], freq, calendar, out)
+		i = j
+
+
+def _periods(df, by, period):
+	'''
+	(entity, period) keys of every row, the sorted keys with their rows, the first period and the number of periods
+	'''
+
+	periods = pd.to_numeric(df[period], errors='coerce').to_numpy(dtype='float64')
+	ok = ~np.isnan(periods)
+	if by is None:
+		codes = np.zeros(len(df), dtype='int64')
+	else:
+		codes = df.groupby(by, sort=False).ngroup().to_numpy(dtype='int64')
+		ok &= codes >= 0
+	periods = np.where(ok, periods, 0).astype('int64')
+	first = periods[ok].min() if ok.any() else 0
+	span = periods[ok].max() - first + 1 if ok.any() else 1
+
+	keys = np.where(ok, codes * span + periods - first, -1)
+	order = np.argsort(keys, kind='stable')
+	order = order[keys[order] >= 0]
+
+	return keys, periods - first, span, keys[order], order
+
+
+def shift(df, columns, by, period, k=1, suffix=None, how='left'):
+	'''
+	df with columns of the same entity's period - k next to each row (k < 0 for leads), named <col><suffix>. Only the exact
+	period counts: a missing year gives NaN, not the previous row. k and suffix can be lists for several lags / leads at
+	once. how='inner' keeps the rows that have all the requested periods
+
+	Rows are never added: if an (entity, period) is duplicated, the first of its rows (in df's order) is the one brought
+	in, where a self-merge on the shifted period would repeat the row once per duplicate. Use a merge when every duplicate
+	counts.
+
+	by:     entity column(s), None for a single series
+	period: integer period (fyear, fyq, Year, week number ...)
+	'''
+
+	columns = [columns] if isinstance(columns, str) else list(columns)
+	ks = list(k) if isinstance(k, (list, tuple)) else [k]
+	if suffix is None:
+		suffixes = [f'_lag{s}' if s > 0 else f'_lead{-s}' for s in ks]
+	else:
+		suffixes = list(suffix) if isinstance(suffix, (list, tuple)) else [suffix]
+
+	keys, offsets, span, sorted_keys, rows = _periods(df, by, period)
+	found_all = np.ones(len(df), dtype=bool)
+	new_cols = {}
+	for s, sfx in zip(ks, suffixes):
+		target = keys - s
+		idx = np.minimum(np.searchsorted(sorted_keys, target), max(len(sorted_keys) - 1, 0))
+		found = (keys >= 0) & (offsets - s >= 0) & (offsets - s < span)
+		found &= (sorted_keys[idx] == target) if len(sorted_keys) else False
+		src = np.where(found, rows[idx] if len(rows) else -1, -1)
+		found_all &= found
+		for col in columns:
+			new_cols[f'{col}{sfx}'] = df[col].reset_index(drop=True).reindex(src).to_numpy()
+
+	out_df = df.assign(**new_cols)
+
+	return out_df[found_all] if how == 'inner' else out_df
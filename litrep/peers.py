@@ -0,0 +1,93 @@
+'''
+Industry peer returns
+
+The CRSP names history is kept as membership intervals (permno, industry, [namedt, nameendt]) sorted by (industry, namedt).
+The peers of an industry over a window [start, end] are the permnos with an interval overlapping it, found with one binary
+search within the industry's block, and each peer's CAR over the days it is in the industry is a difference of the AR cube's
+running sums. Peer CARs therefore never go through a (case x day x industry member) panel. Results are cached by (industry,
+start, end), as many cases share an industry and window.
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep._keys import _days
+
+
+class IndustryPeers:
+
+	def __init__(self, names_df, cube, industry='sic2', permno='permno', start='namedt', end='nameendt'):
+		'''
+		names_df: membership intervals, e.g. crsp_dsenames with sic2 (both dates inclusive)
+		cube:     ARCube the peer returns are read from
+		'''
+
+		df = names_df.dropna(subset=[industry, permno, start, end])
+		industries = pd.to_numeric(df[industry]).to_numpy(dtype='float64')
+		starts, _ = _days(df[start])
+		ends, _ = _days(df[end])
+		order = np.lexsort((starts, industries))
+
+		self.cube = cube
+		self._industries, first = np.unique(industries[order], return_index=True)
+		self._block = np.r_[first, len(order)]
+		self._permnos = pd.to_numeric(df[permno]).to_numpy(dtype='float64')[order]
+		self._starts = starts[order]
+		self._ends = ends[order]
+		self._cache = {}
+
+	def members(self, industry, start, end):
+		'''
+		Permno of every membership interval of the industry overlapping [start, end], with the overlap
+		'''
+
+		i = np.searchsorted(self._industries, industry)
+		if i == len(self._industries) or self._industries[i] != industry:
+			return np.array([]), np.array([], dtype='int64'), np.array([], dtype='int64')
+
+		lo, hi = self._block[i], self._block[i + 1]
+		rows = np.arange(lo, lo + np.searchsorted(self._starts[lo:hi], end, side='right'))
+		rows = rows[self._ends[rows] >= start]
+
+		return self._permnos[rows], np.maximum(self._starts[rows], start), np.minimum(self._ends[rows], end)
+
+	def peer_cars(self, industry, start, end):
+		'''
+		CAR of each peer (permno in the industry on any day of [start, end]) over its days in the industry, 0 for a peer
+		without returns as in summing the daily panel
+		'''
+
+		permnos, starts, ends = self.members(industry, start, end)
+		cars = np.nan_to_num(self.cube.summed(permnos, starts.astype('datetime64[D]'), ends.astype('datetime64[D]')))
+
+		# A permno with several intervals in the window (e.g. a name change) is one peer
+		permnos, inverse = np.unique(permnos, return_inverse=True)
+
+		return permnos, np.bincount(inverse, weights=cars, minlength=len(permnos))
+
+	def _stats(self, industry, start, end):
+
+		key = (industry, start, end)
+		if key not in self._cache:
+			_, cars = self.peer_cars(industry, start, end)
+			self._cache[key] = (cars.mean(), np.median(cars), len(cars)) if len(cars) else (np.nan, np.nan, 0)
+
+		return self._cache[key]
+
+	def car(self, df, industry_col, start_col, end_col):
+		'''
+		Mean, median and number of peer CARs (columns mean, median, n) for the industry and window of each df row
+		'''
+
+		industries = pd.to_numeric(df[industry_col]).to_numpy(dtype='float64')
+		starts, start_ok = _days(df[start_col])
+		ends, end_ok = _days(df[end_col])
+		ok = ~np.isnan(industries) & start_ok & end_ok
+
+		keys, inverse = np.unique(np.c_[industries[ok], starts[ok], ends[ok]], axis=0, return_inverse=True)
+		stats = np.array([self._stats(i, int(s), int(e)) for i, s, e in keys]).reshape(-1, 3)
+
+		out = pd.DataFrame({'mean': np.nan, 'median': np.nan, 'n': 0}, index=df.index)
+		out.loc[ok, ['mean', 'median', 'n']] = stats[inverse.ravel()]
+
+		return out.astype({'n': 'int64'})
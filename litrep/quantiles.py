@@ -0,0 +1,62 @@
+'''
+Quantile buckets within groups
+
+pd.qcut applied group by group (groupby().transform(lambda y: pd.qcut(y, q, ...))) runs a Python call per case. Here all the
+groups are sorted once by (group, value), the q + 1 bin edges of every group are read off the sorted values with the same
+linear interpolation as qcut and every value is bucketed against its group's edges with array comparisons.
+'''
+
+import numpy as np
+import pandas as pd
+
+
+def _lerp(a, b, t):
+
+	# Same interpolation as np.quantile (the one behind qcut's edges)
+	diff = b - a
+	return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def group_qcut(values, groups, q, duplicates='raise'):
+	'''
+	qcut bucket (1, ..., q) of each value within its group, missing for missing values
+
+	Same edges and bins as pd.qcut(y, q, labels=range(1, q + 1)) on each group: edges at the 0, 1/q, ..., 1 quantiles, bins
+	closed on the right and the lowest edge included. A group with repeated edges raises like qcut, unless duplicates='drop'
+	(buckets are then numbered over the distinct edges).
+	'''
+
+	values = pd.to_numeric(pd.Series(np.asarray(values)), errors='coerce').to_numpy(dtype='float64')
+	codes = pd.Series(np.asarray(groups)).groupby(np.asarray(groups), sort=False, dropna=False).ngroup().to_numpy()
+	valid = ~np.isnan(values)
+
+	# Sorted values of each group
+	rows = np.flatnonzero(valid)
+	order = rows[np.lexsort((values[rows], codes[rows]))]
+	sorted_values, sorted_codes = values[order], codes[order]
+	n_groups = codes.max() + 1 if len(codes) else 0
+	n = np.bincount(sorted_codes, minlength=n_groups)
+	starts = np.cumsum(n) - n
+
+	# Bin edges of every group (groups without values get no edges)
+	has = n > 0
+	quantiles = np.linspace(0, 1, q + 1)
+	position = (n[has, None] - 1) * quantiles[None, :]
+	prev = np.floor(position).astype('int64')
+	nxt = np.minimum(prev + 1, n[has, None] - 1)
+	edges = np.full((n_groups, q + 1), np.nan)
+	edges[has] = _lerp(sorted_values[starts[has, None] + prev], sorted_values[starts[has, None] + nxt], position - prev)
+
+	distinct = np.c_[np.ones((n_groups, 1), dtype=bool), np.diff(edges, axis=1) != 0]
+	if duplicates == 'raise':
+		repeated = has & ~distinct.all(axis=1)
+		if repeated.any():
+			raise ValueError(f'Bin edges must be unique: {edges[np.argmax(repeated)].tolist()}')
+
+	# Bucket = number of (distinct) edges below the value, the lowest edge itself going to the first bucket
+	out = np.full(len(values), np.nan)
+	g = codes[rows]
+	below = (edges[g] < values[rows, None]) & distinct[g]
+	out[rows] = np.maximum(below.sum(axis=1), 1)
+
+	return out
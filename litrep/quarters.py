@@ -0,0 +1,168 @@
+'''
+Quarterly Compustat index
+
+Built once from a quarterly table (one row per gvkey-fyq). Neighbouring quarters are found with binary searches on the
+sorted (gvkey, fyq) codes: datadate_pq / datadate_nq (3 months before / after datadate when the quarter is missing), rdq_pq
+and, if asked, mve_pq. Quarters are then indexed by (gvkey, datadate) and (gvkey, rdq), so placing events in quarters
+never merges an event table with every quarter of its firm:
+
+	containing:  quarter whose window (e.g. rdq_pq <= date < rdq) contains the date
+	announced:   quarters announced (rdq) within [start, end]
+	at_datadate: quarter ending on a given datadate
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep._keys import _DAY_SHIFT, _KEY_SCALE, _days, _numbers
+from litrep.intervals import match
+
+
+class QuarterIndex:
+
+	def __init__(self, fundq_df, gvkey='gvkey', fyq='fyq', datadate='datadate', rdq='rdq', mve=None, dropna=None):
+		'''
+		fundq_df: quarterly Compustat, one row per gvkey-fyq (fyq=None for a quarterly table without fiscal quarters - no
+		          neighbouring quarter columns then)
+		mve:      column also brought in from the prior quarter (as <mve>_pq)
+		dropna:   quarters missing any of these columns (neighbouring quarter columns included) are left out
+		'''
+
+		self.table = fundq_df.reset_index(drop=True)
+		self._gvkey, self._fyq, self._datadate, self._rdq = gvkey, fyq, datadate, rdq
+
+		if fyq is not None:
+			self._fyq_index()
+			self.table[f'{datadate}_pq'] = self.shifted(datadate, -1).fillna(self.table[datadate] - pd.DateOffset(months=3))
+			self.table[f'{datadate}_nq'] = self.shifted(datadate, 1).fillna(self.table[datadate] + pd.DateOffset(months=3))
+			self.table[f'{rdq}_pq'] = self.shifted(rdq, -1)
+			if mve is not None:
+				self.table[f'{mve}_pq'] = self.shifted(mve, -1)
+		if dropna is not None:
+			self.table = self.table.dropna(subset=dropna).reset_index(drop=True)
+
+		gvkeys, gv_ok = _numbers(self.table[gvkey])
+		self._gvkeys = np.unique(gvkeys[gv_ok])
+		self._codes = np.searchsorted(self._gvkeys, gvkeys).astype('int64')
+		self._gv_ok = gv_ok
+		if fyq is not None:
+			self._fyq_index()
+		self._by_datadate = self._date_index(datadate)
+		self._by_rdq = self._date_index(rdq)
+
+	def _fyq_index(self):
+
+		gvkeys, gv_ok = _numbers(self.table[self._gvkey])
+		codes = np.searchsorted(np.unique(gvkeys[gv_ok]), gvkeys).astype('int64')
+		fyqs, fyq_ok = _numbers(self.table[self._fyq])
+		keys = np.where(gv_ok & fyq_ok, codes * _KEY_SCALE + fyqs.astype('int64'), -1)
+		order = np.argsort(keys, kind='stable')
+		order = order[keys[order] >= 0]
+		self._fyq_keys, self._fyq_rows, self._fyq_all = keys[order], order, keys
+
+	def _date_index(self, col):
+
+		# Rows sorted by (gvkey, date), with their keys
+		days, ok = _days(self.table[col])
+		rows = np.flatnonzero(self._gv_ok & ok)
+		keys = self._codes[rows] * _KEY_SCALE + days[rows] + _DAY_SHIFT
+		order = np.argsort(keys, kind='stable')
+
+		return keys[order], rows[order]
+
+	def __getitem__(self, col):
+
+		return self.table[col]
+
+	def shifted(self, col, k):
+		'''
+		col of the same gvkey's quarter fyq + k, aligned to the table rows (first row of a duplicated quarter)
+		'''
+
+		keys = self._fyq_all + k
+		idx = np.minimum(np.searchsorted(self._fyq_keys, keys), max(len(self._fyq_keys) - 1, 0))
+		found = (self._fyq_all >= 0) & ((self._fyq_keys[idx] == keys) if len(self._fyq_keys) else False)
+		rows = np.where(found, self._fyq_rows[idx] if len(self._fyq_rows) else -1, -1)
+
+		return self.table[col].reindex(rows).set_axis(self.table.index).rename(None)
+
+	def assign(self, **cols):
+		'''
+		Add derived columns to the table (callables get the index itself)
+		'''
+
+		for name, value in cols.items():
+			self.table[name] = value(self) if callable(value) else value
+
+		return self
+
+	def _assemble(self, df, li, ri, columns, how):
+
+		# df rows li next to quarter rows ri (quarter columns replace df columns of the same name)
+		columns = list(self.table.columns if columns is None else columns)
+		if how == 'left':
+			missing = np.setdiff1d(np.arange(len(df)), li)
+			li = np.r_[li, missing]
+			ri = np.r_[ri, np.full(len(missing), -1)]
+			order = np.argsort(li, kind='stable')
+			li, ri = li[order], ri[order]
+
+		return pd.concat([df.iloc[li].drop(columns=[c for c in columns if c in df.columns]).reset_index(drop=True),
+		                  self.table[columns].reindex(ri).reset_index(drop=True)], axis=1)
+
+	def _between(self, index, gvkeys, starts, ends):
+
+		# Every (row, quarter) pair with start <= indexed date <= end
+		keys, rows = index
+		gvkeys, gv_ok = _numbers(gvkeys)
+		idx = np.minimum(np.searchsorted(self._gvkeys, gvkeys), max(len(self._gvkeys) - 1, 0))
+		found = gv_ok & ((self._gvkeys[idx] == gvkeys) if len(self._gvkeys) else False)
+		start, start_ok = _days(starts)
+		end, end_ok = _days(ends)
+		base = idx.astype('int64') * _KEY_SCALE + _DAY_SHIFT
+		lo = np.searchsorted(keys, base + start, side='left')
+		hi = np.searchsorted(keys, base + end, side='right')
+		counts = np.where(found & start_ok & end_ok, np.maximum(hi - lo, 0), 0)
+
+		li = np.repeat(np.arange(len(counts)), counts)
+		offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+		return li, rows[np.repeat(lo, counts) + offsets]
+
+	def announced(self, df, start_col, end_col, columns=None, gvkey_col='gvkey', how='inner'):
+		'''
+		df rows next to every quarter of their gvkey with df[start_col] <= rdq <= df[end_col]
+		'''
+
+		li, ri = self._between(self._by_rdq, df[gvkey_col], df[start_col], df[end_col])
+
+		return self._assemble(df, li, ri, columns, how)
+
+	def at_datadate(self, df, datadate_col, columns=None, gvkey_col='gvkey', how='inner'):
+		'''
+		df rows next to the quarter(s) of their gvkey with datadate equal to df[datadate_col]
+		'''
+
+		li, ri = self._between(self._by_datadate, df[gvkey_col], df[datadate_col], df[datadate_col])
+
+		return self._assemble(df, li, ri, columns, how)
+
+	def containing(self, df, date_col, lower=None, upper=None, closed='left', columns=None, gvkey_col='gvkey', how='inner',
+	               keep='last'):
+		'''
+		df rows next to the quarter whose [lower, upper] window contains df[date_col] - by default the announcement window
+		rdq_pq <= date < rdq. With several such quarters keep='last' / 'first' keeps the latest / earliest datadate and
+		keep=None all of them
+		'''
+
+		lower = lower or f'{self._rdq}_pq'
+		upper = upper or self._rdq
+		li, ri = match(df.reset_index(drop=True), self.table, date_col, lower, upper, [gvkey_col], [self._gvkey], closed)
+		if keep is not None:
+			days, _ = _days(self.table[self._datadate])
+			order = np.lexsort((ri, days[ri], li))
+			li, ri = li[order], ri[order]
+			boundary = np.r_[True, li[1:] != li[:-1]] if keep == 'first' else np.r_[li[1:] != li[:-1], True]
+			li, ri = li[boundary], ri[boundary]
+
+		return self._assemble(df, li, ri, columns, how)
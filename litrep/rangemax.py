@@ -0,0 +1,119 @@
+'''
+Range maximum over a daily panel
+
+Each security's values are laid out by date in one array, split into fixed-size blocks. Every position keeps the running
+max from the start of its block (prefix) and to the end of its block (suffix), and block maxima get a sparse table. The max
+over any date range of one security is then the max of a suffix, a sparse-table lookup over the whole blocks in between and a
+prefix, i.e. a constant number of array reads per query, with memory close to the size of the panel.
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep._keys import _DAY_SHIFT, _KEY_SCALE, _days
+
+
+class RangeMax:
+
+	def __init__(self, panel_df, id_col, value_col, date_col='date', block=64):
+
+		ids = pd.to_numeric(panel_df[id_col]).to_numpy(dtype='float64')
+		days, ok = _days(panel_df[date_col])
+		ok &= ~np.isnan(ids)
+		self.ids, codes = np.unique(ids[ok], return_inverse=True)
+		days = days[ok]
+		order = np.lexsort((days, codes))
+
+		self._comp = codes[order].astype('int64') * _KEY_SCALE + days[order] + _DAY_SHIFT
+		# Missing values never win a max (as in a groupby max)
+		values = panel_df[value_col].to_numpy(dtype='float64')[ok][order]
+		values = np.where(np.isnan(values), -np.inf, values)
+
+		n = len(values)
+		self._block = block
+		n_blocks = -(-n // block)
+		padded = np.full(n_blocks * block, -np.inf)
+		padded[:n] = values
+		blocks = padded.reshape(n_blocks, block)
+		self._prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+		self._suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+		self._values = padded
+
+		# Sparse table over block maxima: level k holds the max of 2**k blocks starting at each block
+		self._table = [blocks.max(axis=1) if n_blocks else np.array([])]
+		k = 1
+		while (1 << k) <= n_blocks:
+			prev = self._table[-1]
+			half = 1 << (k - 1)
+			self._table.append(np.maximum(prev[:-half], prev[half:]))
+			k += 1
+
+	def _positions(self, ids, starts, ends):
+
+		# Panel row range [lo, hi) of each query
+		ids = pd.to_numeric(pd.Series(np.asarray(ids)), errors='coerce').to_numpy(dtype='float64')
+		idx = np.minimum(np.searchsorted(self.ids, ids), max(len(self.ids) - 1, 0))
+		found = (self.ids[idx] == ids) if len(self.ids) else np.zeros(len(ids), dtype=bool)
+		start, start_ok = _days(starts)
+		end, end_ok = _days(ends)
+		base = idx.astype('int64') * _KEY_SCALE + _DAY_SHIFT
+		lo = np.searchsorted(self._comp, base + start, side='left')
+		hi = np.searchsorted(self._comp, base + end, side='right')
+
+		return lo, np.where(found & start_ok & end_ok, np.maximum(hi, lo), lo)
+
+	def _blocks_max(self, first, last):
+
+		# Max over whole blocks [first, last] (-inf when first > last)
+		out = np.full(len(first), -np.inf)
+		ok = first <= last
+		if ok.any():
+			length = last[ok] - first[ok] + 1
+			level = np.floor(np.log2(length)).astype('int64')
+			for k in np.unique(level):
+				sel = np.flatnonzero(ok)[level == k]
+				table = self._table[k]
+				out[sel] = np.maximum(table[first[sel]], table[last[sel] - (1 << k) + 1])
+		return out
+
+	def count(self, ids, starts, ends):
+		'''
+		Number of panel rows for each id in [start, end]
+		'''
+
+		lo, hi = self._positions(ids, starts, ends)
+		return hi - lo
+
+	def max(self, ids, starts, ends):
+		'''
+		Max of the value column for each id over [start, end] (NaN when there are no rows or all values are missing)
+		'''
+
+		lo, hi = self._positions(ids, starts, ends)
+		out = np.full(len(lo), -np.inf)
+		has = hi > lo
+		lo, last = lo[has], hi[has] - 1
+		b_lo, b_hi = lo // self._block, last // self._block
+
+		# Within one block: walk the (at most block-long) range
+		same = b_lo == b_hi
+		if same.any():
+			starts = lo[same]
+			lengths = last[same] - starts + 1
+			rows = np.repeat(np.arange(len(starts)), lengths)
+			offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+			within = np.full(len(starts), -np.inf)
+			np.maximum.at(within, rows, self._values[np.repeat(starts, lengths) + offsets])
+			res = np.full(len(lo), -np.inf)
+			res[same] = within
+		else:
+			res = np.full(len(lo), -np.inf)
+
+		# Across blocks: suffix of the first block, whole blocks in between, prefix of the last block
+		cross = ~same
+		res[cross] = np.maximum.reduce([self._suffix[lo[cross]],
+		                                self._blocks_max(b_lo[cross] + 1, b_hi[cross] - 1),
+		                                self._prefix[last[cross]]])
+		out[has] = res
+
+		return np.where(np.isneginf(out), np.nan, out)
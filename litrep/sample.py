@@ -0,0 +1,142 @@
+'''
+Control firm selection and final sample filters shared by the sample construction scripts (2, 8b) and the sensitivity grid
+
+main_df is the case x firm x Post panel of the scripts once KSLitRisk, car, the damages and the Compustat / CRSP controls are
+in. Nothing here reads WRDS, so any number of matching variants can be built from the same inputs.
+'''
+
+import numpy as np
+import pandas as pd
+
+from litrep.matching import nearest_neighbours
+from litrep.quantiles import group_qcut
+
+
+REQUIRED_COLS = ['roa', 'btm', 'log_at', 'lt_at', 'Score_t', 'car', 'duvol_PrCrRisk', 'StdDailyRet']
+
+
+def select_controls(main_df, car_bins=20, ks_bins=2, dmgs_col='log_max_dmgs', k=1, caliper=None, replace=True):
+	'''
+	Flag the control firm(s) of each case (ContrFirm = 1)
+
+	Candidates must fall in the sued firm's CAR group (car_bins quantile groups within the case) and KSLitRisk group (ks_bins
+	groups), then the closest on damages (dmgs_col) is kept (lowest gvkey on ties)
+	'''
+
+	match_df = (main_df
+	            # We care about pre-period KS and then contemporaneous CAR around class period end and Log Max Damages
+	            .query('Post == 0')
+	            .filter(['MSCAD_ID', 'gvkey', 'Sued_sample', 'KSLitRisk', 'log_at'])
+	            # Bring in right CAR and Damages info
+	            .merge(main_df.query('Post == 1')[['MSCAD_ID', 'gvkey', 'car', dmgs_col]], on=['MSCAD_ID', 'gvkey'], how='left')
+	            # Keep obs that have available data for all variables of interest --- Ensure both sued and control firms available
+	            .dropna(subset=['car', 'KSLitRisk', dmgs_col])
+	            .assign(max_sued=lambda x: x.groupby(['MSCAD_ID'])['Sued_sample'].transform('max'),
+	                    min_sued=lambda x: x.groupby(['MSCAD_ID'])['Sued_sample'].transform('min') )
+	            .query('max_sued == 1 and min_sued == 0')
+	            .drop(['max_sued'], axis=1)
+	            # Create relevant groups
+	            .sort_values(by=['MSCAD_ID', 'Sued_sample'])
+
+	            # --------------------- Groupings --------------------------
+
+	            # Returns
+	            .assign(car_gr=lambda x: group_qcut(x['car'], x['MSCAD_ID'], car_bins),
+	                    temp_gr=lambda x: np.where(x['Sued_sample'] == 1, x['car_gr'], np.nan),
+	                    sued_car_gr=lambda x: x.groupby(['MSCAD_ID'])['temp_gr'].transform('max'))
+	            .query('sued_car_gr == car_gr')
+
+	            # KS
+	            .assign(KSLitRisk_gr=lambda x: group_qcut(x['KSLitRisk'], x['MSCAD_ID'], ks_bins),
+	                    temp_gr=lambda x: np.where(x['Sued_sample'] == 1, x['KSLitRisk_gr'], np.nan),
+	                    sued_KSLitRisk_gr=lambda x: x.groupby(['MSCAD_ID'])['temp_gr'].transform('max') )
+	            .query('sued_KSLitRisk_gr == KSLitRisk_gr')
+
+	            )
+
+	# Closest damages difference within the case's CAR and KS groups
+	match_df = (nearest_neighbours(match_df.query('Sued_sample == 1'), match_df.query('Sued_sample == 0'), dmgs_col,
+	                               by=['MSCAD_ID'], control_id='gvkey', k=k, caliper=caliper, replace=replace)
+	            .assign(ContrFirm=1)
+	            .filter(['MSCAD_ID', 'gvkey', 'ContrFirm'])
+	            )
+
+	return main_df.merge(match_df, on=['MSCAD_ID', 'gvkey'], how='left')
+
+
+def matched_panel(main_df):
+	'''
+	Sued firms and their controls (ContrFirm = 1) with car and Max_Damages set to 0 pre, the case's Settled / Dismissed
+	status (Settled_sample, Dismissed_sample) and the settlement to PostMVE dummies
+	'''
+
+	main_df = (main_df
+	           .assign(car=lambda x: np.where(x['Post']==0, 0, x['car']),
+	                   Max_Damages=lambda x: np.where(x['Post']==0, 0, x['Max_Damages']))
+	           # Keep matches and sued sample only
+	           .query('Sued_sample == 1 or ContrFirm == 1')
+	           )
+
+	# Create a dummy as to whether part of settled or dismissed
+	main_df = (main_df
+	           .merge(main_df[(main_df['Post']==1) & (main_df['CASESTATUS'].notnull())][['MSCAD_ID', 'Settled', 'Dismissed']],
+	                  on=['MSCAD_ID'], how='left', suffixes=['', '_sample'])
+	           )
+
+	# Settlement to PostMVE ratio
+	return (main_df
+	        .assign(SettleToMVE=lambda x: x['SETTLEMENT_AMOUNT'] / (x['PostMVE'] * 1000), # settlement in actual $, PostMVE in $K,
+	                SettledOver05MVE=lambda x: np.where( (x['SettleToMVE'] >= 0.005) & (x['Settled'] == 1), 1, 0) )
+	        .assign(SettledOver05MVE=lambda x: np.where( (x['SettleToMVE'].isnull()) & (x['Settled'] == 1),
+	                                                     np.nan, x['SettledOver05MVE']))
+	        .assign(SettledOver05MVE=lambda x: x.groupby(['MSCAD_ID', 'gvkey'])['SettledOver05MVE'].transform('max'),
+	                SettledUnder05MVE=lambda x: np.where( (x['SettledOver05MVE'] == 0) & (x['Settled'] == 1), 1, 0),
+	                Post_SettledOver05MVE=lambda x: x['SettledOver05MVE'] * x['Post'],
+	                Post_SettledUnder05MVE=lambda x: x['SettledUnder05MVE'] * x['Post'],
+	                # 50M or 05MVE
+	                SettledOver05MVEor50M=lambda x: np.where( ( (x['SETTLEMENT_AMOUNT'] > 50000000) | (x['SettledOver05MVE'] == 1) ) &
+	                                                          (x['Settled'] == 1), 1, 0),
+	                Post_SettledOver05MVEor50M=lambda x: x['Post'] * x['SettledOver05MVEor50M'],
+	                SettledUnder05MVEor50M=lambda x: np.where( (x['SettledOver05MVEor50M'] != 1) & (x['Settled'] == 1), 1, 0),
+	                Post_SettledUnder05MVEor50M=lambda x: x['Post'] * x['SettledUnder05MVEor50M'])
+	        )
+
+
+def keep_sample(main_df, filing_start='1996-01-01', filing_end='2011-09-18', required=REQUIRED_COLS, n_firms=2):
+	'''
+	Cases filed within [filing_start, filing_end] with the sued firm and its n_firms - 1 controls, all with the required data
+	both pre and post
+	'''
+
+	return (main_df
+	        .query(f'FILING_DATE <= "{filing_end}"')
+	        .query(f'FILING_DATE >= "{filing_start}"')
+	        .query('Sued_sample == 1 or ContrFirm == 1')
+	        .dropna(subset=list(required))
+	        # Keep if they have observations both pre and post for both matched and treated
+	        .assign(count=lambda x: x.groupby(['MSCAD_ID'])['gvkey'].transform('count'))
+	        .query(f'count == {2 * n_firms}')
+	        .drop(['count'], axis=1)
+	        )
+
+
+def attrition(steps):
+	'''
+	Number of obs and cases after each (step name, dataframe) step
+	'''
+
+	return pd.DataFrame([{'step': name, 'obs': len(df), 'cases': df['MSCAD_ID'].nunique()} for name, df in steps])
+
+
+def build_sample(main_df, car_bins=20, ks_bins=2, dmgs_col='log_max_dmgs', k=1, caliper=None, replace=True,
+                 filing_start='1996-01-01', filing_end='2011-09-18', required=REQUIRED_COLS):
+	'''
+	Final sample for one set of matching parameters and its attrition counts
+	'''
+
+	matched_df = matched_panel(select_controls(main_df, car_bins, ks_bins, dmgs_col, k, caliper, replace))
+	sample_df = keep_sample(matched_df, filing_start, filing_end, required, n_firms=1 + k)
+
+	return sample_df, attrition([('inputs', main_df),
+	                             ('matched', matched_df),
+	                             ('final', sample_df)])
@@ -0,0 +1,242 @@
+'''
+Local CRSP warehouse
+
+The dated CRSP files (dsf, msf, dsi, ...) are rewritten once per vintage into uncompressed Arrow IPC files, one per calendar
+year, sorted by (permno, date). Each year file has a sidecar permno -> [start, stop) row-offset index, so a load for a few
+thousand permnos over a window memory-maps the relevant years and only touches the row ranges of those permnos.
+
+Usage:
+	python -m litrep.warehouse ingest crsp_dsf crsp_msf crsp_dsi
+	python -m litrep.warehouse bench crsp_dsf --permnos 2000 --start 1995-01-01 --end 2012-12-31
+'''
+
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from litrep import wrds
+
+
+def warehouse_loc(wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+	return f'{wrds_loc}/warehouse_{vintage}'
+
+
+def _year_path(loc, table, year):
+
+	return f'{loc}/{table}/{year}.arrow'
+
+
+def _index_path(loc, table, year):
+
+	return f'{loc}/{table}/{year}.index.npz'
+
+
+def _normalize(batch):
+
+	# Dates are stored as date32 and permnos as int32 regardless of how the extract stored them
+	cols = {}
+	for name, col in zip(batch.schema.names, batch.columns):
+		# Leftover pandas index
+		if name.startswith('__index_level'):
+			continue
+		if name == 'date':
+			if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+				col = pc.strptime(col, format='%Y-%m-%d', unit='s')
+			col = col.cast(pa.date32())
+		elif name == 'permno':
+			col = col.cast(pa.int32())
+		cols[name] = col
+
+	return pa.RecordBatch.from_arrays(list(cols.values()), names=list(cols.keys()))
+
+
+#%%
+'''
+Ingest
+'''
+
+def ingest(table, columns=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE, loc=None):
+	'''
+	Rewrite one CRSP extract into the warehouse. Memory is bounded by the largest calendar year as the file is first streamed
+	into per-year staging files and each year is then sorted on its own
+	'''
+
+	loc = loc or warehouse_loc(wrds_loc, vintage)
+	os.makedirs(f'{loc}/{table}', exist_ok=True)
+
+	# Stream the extract into per-year staging files
+	writers = {}
+	source = ds.dataset(wrds.table_path(table, wrds_loc, vintage), format='parquet')
+	for batch in source.to_batches(columns=columns):
+		batch = _normalize(batch)
+		years = pc.year(batch.column('date').cast(pa.timestamp('s'))).to_numpy(zero_copy_only=False)
+		for year in np.unique(years):
+			part = batch.filter(pa.array(years == year))
+			if year not in writers:
+				writers[year] = pa.ipc.new_file(f'{loc}/{table}/{year}.staging', part.schema)
+			writers[year].write_batch(part)
+	for writer in writers.values():
+		writer.close()
+
+	# Sort each year and write the final file plus its offset index
+	for year in sorted(writers):
+		staging = f'{loc}/{table}/{year}.staging'
+		with pa.memory_map(staging) as source_map:
+			year_tb = pa.ipc.open_file(source_map).read_all()
+		if 'permno' in year_tb.schema.names:
+			year_tb = year_tb.sort_by([('permno', 'ascending'), ('date', 'ascending')])
+		else:
+			year_tb = year_tb.sort_by([('date', 'ascending')])
+
+		with pa.OSFile(_year_path(loc, table, year), 'wb') as sink:
+			with pa.ipc.new_file(sink, year_tb.schema) as writer:
+				writer.write_table(year_tb)
+
+		if 'permno' in year_tb.schema.names:
+			permno = year_tb.column('permno').to_numpy()
+			starts = np.flatnonzero(np.r_[True, permno[1:] != permno[:-1]])
+			stops = np.r_[starts[1:], len(permno)]
+			np.savez(_index_path(loc, table, year), permno=permno[starts], start=starts, stop=stops)
+
+		del year_tb
+		os.remove(staging)
+
+
+#%%
+'''
+Load
+'''
+
+def available_years(table, loc):
+
+	return sorted(int(os.path.basename(p).split('.')[0]) for p in glob.glob(f'{loc}/{table}/*.arrow'))
+
+
+def _slices(loc, table, year, permnos):
+
+	index = np.load(_index_path(loc, table, year))
+	keep = np.isin(index['permno'], permnos)
+
+	return zip(index['start'][keep], index['stop'][keep])
+
+
+def load(table, columns=None, start=None, end=None, permnos=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE, loc=None):
+	'''
+	Same output as wrds.load_crsp. Falls back to scanning the parquet extract when the table has not been ingested
+	'''
+
+	loc = loc or warehouse_loc(wrds_loc, vintage)
+	all_years = available_years(table, loc)
+	if not all_years:
+		return wrds.load_crsp(table, columns, start, end, permnos, wrds_loc, vintage)
+
+	start = pd.Timestamp(start) if start is not None else None
+	end = pd.Timestamp(end) if end is not None else None
+	years = [y for y in all_years if (start is None or y >= start.year) and (end is None or y <= end.year)]
+	if permnos is not None:
+		permnos = np.asarray(pd.Series(list(permnos), dtype='float64').dropna(), dtype='int32')
+
+	def _open(year):
+		# Zero-copy view of the year file - only the pages behind the slices taken below are read from disk
+		year_tb = pa.ipc.open_file(pa.memory_map(_year_path(loc, table, year))).read_all()
+		if columns is not None:
+			year_tb = year_tb.select([c for c in year_tb.schema.names if c in set(columns) | {'date'}])
+		return year_tb
+
+	# Empty slice keeps the schema when nothing matches
+	pieces = [_open(all_years[0]).slice(0, 0)]
+	for year in years:
+		year_tb = _open(year)
+		if permnos is not None:
+			pieces.extend(year_tb.slice(lo, hi - lo) for lo, hi in _slices(loc, table, year, permnos))
+		else:
+			pieces.append(year_tb)
+
+	out = pa.concat_tables(pieces)
+	if start is not None:
+		out = out.filter(pc.field('date') >= pa.scalar(start.date(), type=pa.date32()))
+	if end is not None:
+		out = out.filter(pc.field('date') <= pa.scalar(end.date(), type=pa.date32()))
+	out = out.to_pandas(date_as_object=False)
+
+	return out[[c for c in columns if c in out.columns]] if columns is not None else out
+
+
+def load_dsf(columns=None, start=None, end=None, permnos=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+	return load('crsp_dsf', columns, start, end, permnos, wrds_loc, vintage)
+
+
+def load_dsi(columns=None, start=None, end=None, wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE):
+
+	return load('crsp_dsi', columns, start, end, None, wrds_loc, vintage)
+
+
+#%%
+'''
+Benchmark against the read_parquet-then-query pattern used in the scripts
+'''
+
+def bench(table, n_permnos=2000, start='1995-01-01', end='2012-12-31', columns=('permno', 'date', 'ret'),
+          wrds_loc=wrds.WRDS_LOC, vintage=wrds.VINTAGE, seed=0):
+
+	columns = list(columns)
+	loc = warehouse_loc(wrds_loc, vintage)
+	if not available_years(table, loc):
+		ingest(table, wrds_loc=wrds_loc, vintage=vintage)
+	all_permnos = np.unique(np.concatenate([np.load(_index_path(loc, table, y))['permno']
+	                                        for y in available_years(table, loc)]))
+	rel_permno_set = set(np.random.default_rng(seed).choice(all_permnos, min(n_permnos, len(all_permnos)), replace=False))
+
+	results = []
+
+	t0 = time.perf_counter()
+	old_df = (pd
+	          .read_parquet(wrds.table_path(table, wrds_loc, vintage), columns=columns)
+	          .assign(date=lambda x: pd.to_datetime(x['date']),
+	                  permno=lambda x: pd.to_numeric(x['permno'], downcast='integer'))
+	          .query('@start <= date and date <= @end and permno in @rel_permno_set')
+	          )
+	results.append(('read_parquet + query', time.perf_counter() - t0, len(old_df), old_df.memory_usage(deep=True).sum()))
+	del old_df
+
+	t0 = time.perf_counter()
+	new_df = wrds.load_crsp(table, columns, start, end, rel_permno_set, wrds_loc, vintage)
+	results.append(('pushdown scan', time.perf_counter() - t0, len(new_df), new_df.memory_usage(deep=True).sum()))
+	del new_df
+
+	t0 = time.perf_counter()
+	new_df = load(table, columns, start, end, rel_permno_set, wrds_loc, vintage)
+	results.append(('warehouse', time.perf_counter() - t0, len(new_df), new_df.memory_usage(deep=True).sum()))
+
+	return pd.DataFrame(results, columns=['method', 'seconds', 'rows', 'frame_bytes'])
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Build or benchmark the local CRSP warehouse')
+	parser.add_argument('command', choices=['ingest', 'bench'])
+	parser.add_argument('tables', nargs='+')
+	parser.add_argument('--wrds-loc', default=wrds.WRDS_LOC)
+	parser.add_argument('--vintage', default=wrds.VINTAGE)
+	parser.add_argument('--permnos', type=int, default=2000)
+	parser.add_argument('--start', default='1995-01-01')
+	parser.add_argument('--end', default='2012-12-31')
+	args = parser.parse_args()
+
+	for table in args.tables:
+		if args.command == 'ingest':
+			t0 = time.perf_counter()
+			ingest(table, wrds_loc=args.wrds_loc, vintage=args.vintage)
+			print(f'{table}: ingested in {time.perf_counter() - t0:,.1f}s')
+		else:
+			print(bench(table, args.permnos, args.start, args.end, wrds_loc=args.wrds_loc, vintage=args.vintage)
+			      .to_string(index=False))
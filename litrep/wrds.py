@@ -0,0 +1,208 @@
+'''
+Loaders for the WRDS parquet extracts
+
+Column lists and row predicates are pushed into the pyarrow dataset scan so that row groups which cannot match are skipped
+instead of decoded. All loaders return pandas DataFrames with the same dtypes the scripts used to create by hand after
+pd.read_parquet (datetime dates, numeric gvkey and permno).
+'''
+
+import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+
+WRDS_LOC = 'G:/WRDS data/zip files/202106'
+VINTAGE = '20210621'
+
+# Usual Compustat screens
+FUNDA_SCREEN = {'indfmt': 'INDL', 'datafmt': 'STD', 'popsrc': 'D', 'consol': 'C', 'curcd': 'USD'}
+FUNDQ_SCREEN = {'indfmt': 'INDL', 'datafmt': 'STD', 'popsrc': 'D', 'consol': 'C', 'curcdq': 'USD'}
+
+# Usual CCM linktable flags
+LINK_SCREEN = {'linktype': ['LU', 'LC', 'LN', 'LS'], 'linkprim': ['P', 'C']}
+
+# Identifiers stored as zero-padded strings in WRDS
+_ZERO_PADDED = {'gvkey': 6}
+
+
+def table_path(table, wrds_loc=WRDS_LOC, vintage=VINTAGE):
+
+	return f'{wrds_loc}/{table}_{vintage}.gzip'
+
+
+def _value_type(pa_type):
+
+	# Categorical columns are dictionary encoded - compare against their values
+	if pa.types.is_dictionary(pa_type):
+		return pa_type.value_type
+	return pa_type
+
+
+def _as_value(name, value, pa_type):
+
+	pa_type = _value_type(pa_type)
+
+	if pa.types.is_timestamp(pa_type):
+		return pa.scalar(pd.Timestamp(value).to_pydatetime(), type=pa_type)
+	if pa.types.is_date(pa_type):
+		return pa.scalar(pd.Timestamp(value).date(), type=pa_type)
+	if pa.types.is_string(pa_type) or pa.types.is_large_string(pa_type):
+		if isinstance(value, (datetime.date, np.datetime64)):
+			return pd.Timestamp(value).strftime('%Y-%m-%d')
+		if isinstance(value, (int, float, np.integer, np.floating)) and name in _ZERO_PADDED:
+			return str(int(value)).zfill(_ZERO_PADDED[name])
+		return str(value)
+	return pa.scalar(value).cast(pa_type)
+
+
+def _build_filter(schema, between=None, isin=None, equals=None):
+
+	expr = None
+
+	def _and(e):
+		return e if expr is None else expr & e
+
+	for name, (lower, upper) in (between or {}).items():
+		pa_type = schema.field(name).type
+		if lower is not None:
+			expr = _and(ds.field(name) >= _as_value(name, lower, pa_type))
+		if upper is not None:
+			expr = _and(ds.field(name) <= _as_value(name, upper, pa_type))
+
+	for name, values in {**(equals or {}), **(isin or {})}.items():
+		pa_type = schema.field(name).type
+		if np.ndim(values) == 0 and not isinstance(values, (set, frozenset)):
+			expr = _and(ds.field(name) == _as_value(name, values, pa_type))
+		else:
+			values = pd.unique(pd.Series(list(values)).dropna())
+			values = pa.array([_as_value(name, v, pa_type) for v in values], type=_value_type(pa_type))
+			expr = _and(ds.field(name).isin(values))
+
+	return expr
+
+
+def read(table, columns=None, between=None, isin=None, equals=None, wrds_loc=WRDS_LOC, vintage=VINTAGE):
+	'''
+	Scan a WRDS extract keeping only the requested columns and the rows that satisfy every predicate
+
+	between: {column: (lower, upper)} inclusive range, either bound can be None
+	isin:    {column: iterable} set membership (e.g. permno or gvkey sets)
+	equals:  {column: value or list of values} categorical screens
+	'''
+
+	dataset = ds.dataset(table_path(table, wrds_loc, vintage), format='parquet')
+	expr = _build_filter(dataset.schema, between, isin, equals)
+
+	return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+
+def _dates(df, cols):
+
+	for col in cols:
+		if col in df.columns:
+			df[col] = pd.to_datetime(df[col])
+	return df
+
+
+def _ids(df, cols):
+
+	for col in cols:
+		if col in df.columns:
+			df[col] = pd.to_numeric(df[col], downcast='integer')
+	return df
+
+
+#%%
+'''
+CRSP
+'''
+
+def load_crsp(table, columns=None, start=None, end=None, permnos=None, wrds_loc=WRDS_LOC, vintage=VINTAGE):
+	'''
+	Any dated CRSP file (dsf, msf, dsi, msi) restricted to [start, end] and, when given, a set of permnos
+	'''
+
+	between = {'date': (start, end)} if (start is not None or end is not None) else None
+	isin = {'permno': permnos} if permnos is not None else None
+
+	df = read(table, columns=columns, between=between, isin=isin, wrds_loc=wrds_loc, vintage=vintage)
+
+	return _ids(_dates(df, ['date']), ['permno'])
+
+
+def load_dsf(columns=None, start=None, end=None, permnos=None, wrds_loc=WRDS_LOC, vintage=VINTAGE):
+
+	return load_crsp('crsp_dsf', columns, start, end, permnos, wrds_loc, vintage)
+
+
+def load_dsi(columns=None, start=None, end=None, wrds_loc=WRDS_LOC, vintage=VINTAGE):
+
+	return load_crsp('crsp_dsi', columns, start, end, None, wrds_loc, vintage)
+
+
+def load_names(table='crsp_dsenames', columns=None, permnos=None, wrds_loc=WRDS_LOC, vintage=VINTAGE):
+
+	isin = {'permno': permnos} if permnos is not None else None
+	df = read(table, columns=columns, isin=isin, wrds_loc=wrds_loc, vintage=vintage)
+
+	return _ids(_dates(df, ['namedt', 'nameendt']), ['permno'])
+
+
+#%%
+'''
+CRSP - Compustat linktable
+'''
+
+def load_linktable(gvkeys=None, permnos=None, wrds_loc=WRDS_LOC, vintage=VINTAGE):
+	'''
+	Linktable with the usual linktype/linkprim flags, missing end dates set to the file date and lpermno renamed to permno
+	'''
+
+	isin = {}
+	if gvkeys is not None:
+		isin['gvkey'] = gvkeys
+	if permnos is not None:
+		isin['lpermno'] = permnos
+
+	df = (read('crsp_ccmxpf_linktable', isin=isin, equals=LINK_SCREEN, wrds_loc=wrds_loc, vintage=vintage)
+	      .rename(columns={'lpermno': 'permno'})
+	      .assign(linkenddt=lambda x: x['linkenddt'].fillna(pd.to_datetime(vintage))))
+
+	return _ids(_dates(df, ['linkdt', 'linkenddt']), ['gvkey', 'permno'])
+
+
+#%%
+'''
+Compustat
+'''
+
+def load_funda(columns=None, gvkeys=None, between=None, screen=FUNDA_SCREEN, numeric_gvkey=True, wrds_loc=WRDS_LOC,
+               vintage=VINTAGE):
+	'''
+	Annual Compustat with the usual INDL/STD/D/C/USD screen applied during the scan (screen columns are not returned unless
+	requested)
+	'''
+
+	isin = {'gvkey': gvkeys} if gvkeys is not None else None
+	df = _dates(read('comp_funda', columns=columns, between=between, isin=isin, equals=screen, wrds_loc=wrds_loc,
+	                 vintage=vintage),
+	            ['datadate'])
+
+	return _ids(df, ['gvkey']) if numeric_gvkey else df
+
+
+def load_fundq(columns=None, gvkeys=None, between=None, screen=FUNDQ_SCREEN, numeric_gvkey=True, wrds_loc=WRDS_LOC,
+               vintage=VINTAGE):
+	'''
+	Quarterly Compustat with the usual screen applied during the scan
+	'''
+
+	isin = {'gvkey': gvkeys} if gvkeys is not None else None
+	df = _dates(read('comp_fundq', columns=columns, between=between, isin=isin, equals=screen, wrds_loc=wrds_loc,
+	                 vintage=vintage),
+	            ['datadate', 'rdq'])
+
+	return _ids(df, ['gvkey']) if numeric_gvkey else df
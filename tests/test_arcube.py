@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from litrep import arcube, wrds
+from litrep.arcube import ARCube
+
+
+def _crsp(loc):
+
+	rng = np.random.default_rng(0)
+	dates = pd.bdate_range('1999-12-01', '2001-03-31')
+	dsi_df = pd.DataFrame({'date': dates, 'vwretd': rng.normal(0, 0.01, len(dates))})
+	# Permnos listed part of the period and missing returns
+	dsf_df = (pd.DataFrame({'permno': np.arange(10001, 10013)})
+	          .merge(dsi_df[['date']], how='cross')
+	          .sample(frac=0.8, random_state=0)
+	          .assign(ret=lambda x: rng.normal(0, 0.03, len(x)))
+	          .sort_values(by=['permno', 'date'])
+	          .reset_index(drop=True))
+	dsf_df.loc[dsf_df.sample(frac=0.05, random_state=1).index, 'ret'] = np.nan
+	dsi_df.to_parquet(wrds.table_path('crsp_dsi', loc, 'test'))
+	dsf_df.to_parquet(wrds.table_path('crsp_dsf', loc, 'test'))
+
+	return dsi_df, dsf_df
+
+
+def test_values_and_window_returns_match_ret_less_vwretd(tmp_path):
+
+	dsi_df, dsf_df = _crsp(tmp_path)
+	arcube.build(start='2000-01-01', wrds_loc=tmp_path, vintage='test', block_rows=5)
+	cube = ARCube.open(tmp_path, 'test')
+
+	# The scripts: dsf merged with dsi, ar = ret - vwretd
+	ar_df = (dsf_df
+	         .merge(dsi_df, on=['date'], how='inner')
+	         .query('date >= "2000-01-01"')
+	         .assign(ar=lambda x: x['ret'] - x['vwretd']))
+	np.testing.assert_allclose(cube.values(ar_df['permno'], ar_df['date']), ar_df['ar'], rtol=1e-6, atol=1e-7)
+
+	# Not in the cube: unknown permno, weekend, before the start
+	assert np.isnan(cube.values([99999, 10001, 10001], pd.to_datetime(['2000-03-01', '2000-03-04', '1999-12-15']))).all()
+
+	rng = np.random.default_rng(1)
+	start = pd.Timestamp('1999-12-20') + pd.to_timedelta(rng.integers(0, 450, 200), unit='D')
+	windows_df = pd.DataFrame({'window': range(0, 200),
+	                           'permno': rng.integers(10001, 10014, 200),
+	                           'start': start,
+	                           'end': start + pd.to_timedelta(rng.integers(-2, 40, 200), unit='D')})
+	window_df = (windows_df
+	             .merge(ar_df, on=['permno'], how='inner')
+	             .query('start <= date and date <= end')
+	             .groupby(['window'])
+	             .agg(car=('ar', 'sum'), n=('ar', 'count'), compounded=('ar', lambda x: np.prod(1 + x.dropna()) - 1))
+	             .reindex(windows_df['window']))
+
+	# Missing without returns
+	expected = window_df['car'].where(window_df['n'] > 0)
+	np.testing.assert_allclose(cube.car(windows_df['permno'], windows_df['start'], windows_df['end']), expected, rtol=1e-6,
+	                           atol=1e-7)
+	has = window_df['n'].to_numpy() > 0
+	out = cube.compounded(windows_df['permno'], windows_df['start'], windows_df['end'])
+	np.testing.assert_allclose(out[has], window_df['compounded'][has], rtol=1e-5, atol=1e-7)
+
+
+def test_panel_is_the_days_with_a_return(tmp_path):
+
+	dsi_df, dsf_df = _crsp(tmp_path)
+	arcube.build(start='2000-01-01', wrds_loc=tmp_path, vintage='test', block_rows=5)
+	cube = ARCube.open(tmp_path, 'test')
+
+	expected = (dsf_df
+	            .merge(dsi_df, on=['date'], how='inner')
+	            .query('permno in [10003, 10007] and "2000-06-01" <= date <= "2000-12-31"')
+	            .dropna(subset=['ret'])
+	            .assign(ar=lambda x: x['ret'] - x['vwretd'])
+	            .sort_values(by=['permno', 'date']))
+	panel_df = cube.panel({10003, 10007, 55555}, '2000-06-01', '2000-12-31', block_rows=1)
+
+	np.testing.assert_array_equal(panel_df['permno'], expected['permno'])
+	np.testing.assert_array_equal(panel_df['date'].to_numpy(dtype='datetime64[ns]'),
+	                              expected['date'].to_numpy(dtype='datetime64[ns]'))
+	np.testing.assert_allclose(panel_df['ar'], expected['ar'], rtol=1e-6, atol=1e-7)
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from litrep.calendar import TradingCalendar
+from litrep.intervals import asof_join
+
+
+def _dsi():
+
+	# Business days with a two-week closure
+	dates = pd.bdate_range('2000-01-03', '2000-06-30')
+	return pd.DataFrame({'date': dates[(dates < '2000-03-01') | (dates > '2000-03-14')]})
+
+
+def _dates():
+
+	rng = np.random.default_rng(0)
+	dates = pd.Series(pd.Timestamp('1999-12-20') + pd.to_timedelta(rng.integers(0, 210, 300), unit='D'))
+	dates[:5] = pd.NaT
+	return dates
+
+
+def test_next_and_prev_match_scanning_dsi():
+
+	dsi_df = _dsi()
+	cal = TradingCalendar(dsi_df['date'])
+	dates = _dates()
+	trading = dsi_df['date']
+
+	def _scan(date, side, inclusive):
+		if pd.isnull(date):
+			return pd.NaT
+		if side == 'next':
+			found = trading[trading >= date] if inclusive else trading[trading > date]
+			return found.min()
+		found = trading[trading <= date] if inclusive else trading[trading < date]
+		return found.max()
+
+	for inclusive in [True, False]:
+		expected = pd.to_datetime(pd.Series([_scan(d, 'next', inclusive) for d in dates]))
+		np.testing.assert_array_equal(cal.next_trading_day(dates, inclusive), expected.to_numpy(dtype='datetime64[ns]'))
+		expected = pd.to_datetime(pd.Series([_scan(d, 'prev', inclusive) for d in dates]))
+		np.testing.assert_array_equal(cal.prev_trading_day(dates, inclusive), expected.to_numpy(dtype='datetime64[ns]'))
+
+	# Ten calendar days at most, as the event anchors
+	expected = pd.to_datetime(pd.Series([_scan(d, 'next', True) for d in dates]))
+	expected = expected.where(expected - dates.reset_index(drop=True) <= pd.Timedelta(days=10))
+	np.testing.assert_array_equal(cal.next_trading_day(dates, within=10), expected.to_numpy(dtype='datetime64[ns]'))
+
+
+def test_day_arithmetic_matches_tr_day_numbers():
+
+	# The scripts numbered dsi days (tr_day) and took differences
+	dsi_df = _dsi().assign(tr_day=lambda x: range(0, len(x)))
+	cal = TradingCalendar(dsi_df['date'])
+	start, end = _dates(), _dates().sample(frac=1, random_state=1).reset_index(drop=True)
+
+	expected = [np.nan if pd.isnull(s) or pd.isnull(e) else ((dsi_df['date'] >= s) & (dsi_df['date'] <= e)).sum()
+	            for s, e in zip(start, end)]
+	np.testing.assert_array_equal(cal.trading_days_between(start, end), expected)
+
+	day = dsi_df.set_index('date')['tr_day']
+	first = cal.next_trading_day(start)
+	for n in [-3, 0, 5]:
+		expected = [pd.NaT if pd.isnull(f) or not 0 <= day[f] + n < len(day) else dsi_df['date'].iloc[day[f] + n]
+		            for f in first]
+		np.testing.assert_array_equal(cal.shift_trading_days(start, n),
+		                              pd.to_datetime(pd.Series(expected)).to_numpy(dtype='datetime64[ns]'))
+
+
+def test_expand_matches_daily_panel_on_dsi():
+
+	dsi_df = _dsi()
+	cal = TradingCalendar(dsi_df['date'])
+	start = _dates()
+	df = pd.DataFrame({'id': range(0, len(start)), 'start': start, 'end': start + pd.Timedelta(days=15)})
+
+	expected = (pd
+	            .concat([df.assign(date=lambda x: x['start'] + pd.DateOffset(days=i)) for i in range(0, 16)])
+	            .merge(dsi_df, on=['date'], how='inner')
+	            .sort_values(by=['id', 'date'])
+	            .reset_index(drop=True))
+	pd.testing.assert_frame_equal(cal.expand(df, 'start', 'end'), expected, check_dtype=False)
+
+
+def test_asof_join_matches_shifted_copies():
+
+	rng = np.random.default_rng(2)
+	dsf_df = (_dsi()
+	          .merge(pd.DataFrame({'permno': [1, 2, 3]}), how='cross')
+	          .sample(frac=0.8, random_state=0)
+	          .assign(cfacshr=lambda x: rng.random(len(x)))
+	          .sort_values(by=['permno', 'date'])
+	          .reset_index(drop=True))
+	events_df = pd.DataFrame({'permno': rng.integers(1, 5, 200), 'event': _dates()[:200]}).assign(id=lambda x: range(0, len(x)))
+
+	# 3b: latest factor in the 10 days up to and including the event
+	expected = (pd
+	            .concat([events_df.assign(date=lambda x: x['event'] - pd.DateOffset(days=i)) for i in range(0, 10)])
+	            .merge(dsf_df, on=['permno', 'date'], how='inner')
+	            .sort_values(by=['id', 'date'])
+	            .drop_duplicates(subset=['id'], keep='last')
+	            .set_index('id')['cfacshr']
+	            .reindex(events_df['id']))
+	out_df = asof_join(events_df, dsf_df, 'event', on='permno', direction='backward', within=9)
+	np.testing.assert_array_equal(out_df['cfacshr'].to_numpy(), expected.to_numpy())
+
+	# 7a: first value in the 15 days after the event
+	expected = (pd
+	            .concat([events_df.assign(date=lambda x: x['event'] + pd.DateOffset(days=i)) for i in range(1, 16)])
+	            .merge(dsf_df, on=['permno', 'date'], how='inner')
+	            .sort_values(by=['id', 'date'])
+	            .drop_duplicates(subset=['id'], keep='first'))
+	out_df = asof_join(events_df, dsf_df, 'event', on='permno', direction='forward', inclusive=False, within=15, how='inner')
+	np.testing.assert_array_equal(out_df['id'].to_numpy(), expected['id'].to_numpy())
+	np.testing.assert_array_equal(out_df['cfacshr'].to_numpy(), expected['cfacshr'].to_numpy())
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from litrep.candidates import candidate_pairs
+
+
+def _cross_product(cases_df, eligible_df, period):
+
+	# Every case merged with every firm of the same period, kept if the firm is there in all of the case's periods
+	cases_df = cases_df.dropna(subset=['MSCAD_ID'] + period).drop_duplicates()
+	return (cases_df
+	        .merge(eligible_df.dropna().drop_duplicates(), on=period, how='inner')
+	        .assign(n=lambda x: x.groupby(['MSCAD_ID', 'gvkey'])[period[0]].transform('count'),
+	                needed=lambda x: x['MSCAD_ID'].map(cases_df.groupby(['MSCAD_ID']).size()))
+	        .query('n == needed')
+	        .filter(['MSCAD_ID', 'gvkey'])
+	        .drop_duplicates()
+	        .sort_values(by=['MSCAD_ID', 'gvkey'])
+	        .reset_index(drop=True))
+
+
+def _tables():
+
+	rng = np.random.default_rng(0)
+	# Cases with one to three survey years, firms eligible in a random subset of years
+	cases_df = (pd.DataFrame({'MSCAD_ID': np.repeat(np.arange(80), 3),
+	                          'DateOfPub_t': 2000 + rng.integers(0, 8, 240),
+	                          'Post': np.tile([0, 1, 1], 80)})
+	            .sample(frac=0.8, random_state=0)
+	            .sort_values(by=['MSCAD_ID']))
+	eligible_df = pd.DataFrame({'gvkey': rng.integers(0, 120, 1500).astype('float64'),
+	                            'DateOfPub_t': 2000 + rng.integers(0, 8, 1500),
+	                            'Post': rng.integers(0, 2, 1500)})
+	eligible_df.loc[:5, 'gvkey'] = np.nan
+	return cases_df, eligible_df
+
+
+def test_matches_cross_product_screen():
+
+	cases_df, eligible_df = _tables()
+	for period in [['DateOfPub_t'], ['DateOfPub_t', 'Post']]:
+		out_df = (candidate_pairs(cases_df[['MSCAD_ID'] + period], eligible_df[['gvkey'] + period], period=period)
+		          .sort_values(by=['MSCAD_ID', 'gvkey'])
+		          .reset_index(drop=True))
+		expected = _cross_product(cases_df[['MSCAD_ID'] + period], eligible_df[['gvkey'] + period], period)
+
+		assert len(expected) > 0
+		pd.testing.assert_frame_equal(out_df, expected, check_dtype=False)
+
+
+def test_no_eligible_firms():
+
+	cases_df, eligible_df = _tables()
+	out_df = candidate_pairs(cases_df, eligible_df.query('DateOfPub_t < 2000'))
+
+	assert out_df.empty
+	assert list(out_df.columns) == ['MSCAD_ID', 'gvkey']
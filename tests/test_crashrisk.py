@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+
+from litrep.crashrisk import MARKET_COLS, group_ols
+
+
+@pytest.mark.filterwarnings('ignore:The design matrix is rank-deficient')
+def test_matches_statsmodels_by_group():
+
+	rng = np.random.default_rng(0)
+	df = pd.DataFrame({'gvkey': np.repeat(np.arange(30), 52), 'fyear': 2005})
+	df[MARKET_COLS] = rng.normal(0, 0.02, size=(len(df), len(MARKET_COLS)))
+	df['cum_ret'] = df[MARKET_COLS].to_numpy() @ rng.normal(size=len(MARKET_COLS)) + rng.normal(0, 0.03, len(df))
+	# Rank deficient firm-year (constant regressor)
+	df.loc[df['gvkey'] == 0, 'weekly_vwretd_t'] = 0.01
+	df = df.sample(frac=1, random_state=0)
+
+	out_df = group_ols(df, 'cum_ret', MARKET_COLS, ['gvkey', 'fyear'])
+
+	expected = pd.concat([sm.OLS(g['cum_ret'], sm.add_constant(g[MARKET_COLS], has_constant='add')).fit().resid
+	                      for _, g in df.groupby(['gvkey', 'fyear'])])
+	np.testing.assert_allclose(out_df['resid'].to_numpy(), expected.reindex(df.index).to_numpy(), atol=1e-12)
+	np.testing.assert_allclose(out_df['fitted'] + out_df['resid'], df['cum_ret'])
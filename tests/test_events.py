@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+from litrep.events import EventStudy, window_name
+
+
+def _data():
+
+	rng = np.random.default_rng(0)
+	# Trading days with a market closure of more than ten days in March
+	days = pd.bdate_range('2000-01-03', '2000-06-30')
+	days = days[(days < '2000-03-01') | (days > '2000-03-14')]
+	dsi_df = pd.DataFrame({'date': days, 'vwretd': rng.normal(0, 0.01, len(days))})
+
+	# Daily records of five firms: some days without a record, some with a missing return and one firm without any
+	# return in May
+	dsf_df = pd.DataFrame({'gvkey': np.repeat(np.arange(1, 6), len(days)), 'date': np.tile(days, 5)})
+	dsf_df['ret'] = rng.normal(0, 0.02, len(dsf_df))
+	dsf_df['MVE'] = rng.uniform(100, 200, len(dsf_df))
+	dsf_df.loc[rng.random(len(dsf_df)) < 0.05, 'ret'] = np.nan
+	dsf_df.loc[(dsf_df['gvkey'] == 5) & (dsf_df['date'].dt.month == 5), 'ret'] = np.nan
+	dsf_df = dsf_df[rng.random(len(dsf_df)) > 0.05].reset_index(drop=True)
+
+	# Weekends, the closure, the first and last days (windows running off the calendar) and the firm without returns
+	dates = pd.to_datetime(['2000-01-01', '2000-01-03', '2000-02-12', '2000-02-26', '2000-02-29', '2000-03-01', '2000-03-04',
+	                        '2000-04-15', '2000-05-10', '2000-06-28', '2000-06-30', '2000-07-04'])
+	events_df = pd.DataFrame({'gvkey': np.tile(np.arange(1, 6), len(dates)), 'date': np.repeat(dates, 5)})
+	delay = pd.to_timedelta(rng.integers(-5, 60, len(events_df)), unit='D')
+	events_df = events_df.assign(MSCAD_ID=np.arange(len(events_df)), FILING_DATE=events_df['date'] + delay)
+
+	return dsi_df, dsf_df, events_df
+
+
+def _anchors(events_df, dsi_df, date_col):
+
+	# First trading day within the ten days from the date (expand by 10 days, merge dsi, keep the earliest)
+	dsi_df = dsi_df.assign(tr_day=np.arange(len(dsi_df)))
+	return (events_df
+	        .assign(date=lambda x: [pd.date_range(d, d + pd.DateOffset(days=10)) for d in x[date_col]])
+	        .explode('date')
+	        .assign(date=lambda x: pd.to_datetime(x['date']))
+	        .merge(dsi_df, on='date', how='left')
+	        .dropna(subset=['tr_day'])
+	        .sort_values(by=['MSCAD_ID', 'date'])
+	        .drop_duplicates(subset=['MSCAD_ID'], keep='first')
+	        .filter(['MSCAD_ID', 'gvkey', 'tr_day'])
+	        )
+
+
+def _get_car(events_df, dsi_df, dsf_df, date_col, pre, post):
+
+	# get_car of 7b: window days merged on tr_day, inner merge with dsf and a groupby sum
+	dsi_df = dsi_df.assign(tr_day=np.arange(len(dsi_df)))
+	anchors_df = _anchors(events_df, dsi_df, date_col)
+	car_df = (pd
+	          .concat([anchors_df.assign(tr_day=lambda x: x['tr_day'] + i) for i in range(pre, post + 1)])
+	          .merge(dsi_df, on='tr_day', how='left')
+	          .merge(dsf_df, on=['gvkey', 'date'], how='inner')
+	          .assign(ar=lambda x: x['ret'] - x['vwretd'])
+	          .groupby(['MSCAD_ID'], as_index=False).agg(car=('ar', 'sum'))
+	          )
+
+	return events_df.merge(car_df, on=['MSCAD_ID'], how='left')['car']
+
+
+def test_car_matches_get_car():
+
+	dsi_df, dsf_df, events_df = _data()
+	windows = [(-10, -2), (-1, 1), (2, 10), (11, 60)]
+	# Returns, or abnormal returns as given with missing values (the cube looked up on the dsf days)
+	studies = [EventStudy(dsi_df, dsf_df, id_col='gvkey'),
+	           EventStudy(dsi_df, dsf_df.merge(dsi_df, on='date').assign(ar=lambda x: x['ret'] - x['vwretd'])
+	                                    .drop(['ret', 'vwretd'], axis=1), id_col='gvkey', ar='ar')]
+
+	for study in studies:
+		for date_col in ['date', 'FILING_DATE']:
+			out_df = study.car(events_df, date_col, windows)
+			for pre, post in windows:
+				np.testing.assert_allclose(out_df[window_name('CAR', pre, post)],
+				                           _get_car(events_df, dsi_df, dsf_df, date_col, pre, post), atol=1e-12)
+
+	# A window with records but no return sums to 0, an event without a trading day in ten days is missing
+	out_df = studies[0].car(events_df, 'date', [(-1, 1)])
+	assert (out_df.loc[(events_df['gvkey'] == 5) & (events_df['date'] == '2000-05-10'), 'CAR_m1_p1'] == 0).all()
+	assert out_df.loc[events_df['date'] == '2000-03-01', 'CAR_m1_p1'].isna().all()
+
+
+def test_paths_and_value_at_match_get_daily_ar():
+
+	dsi_df, dsf_df, events_df = _data()
+	study = EventStudy(dsi_df, dsf_df, id_col='gvkey')
+	dsi_df = dsi_df.assign(tr_day=np.arange(len(dsi_df)))
+	anchors_df = _anchors(events_df, dsi_df, 'date')
+
+	# get_daily_ar of 5: every window day (left merges), cumulative sum of the daily ARs
+	expected = (pd
+	            .concat([anchors_df.assign(tr_day=lambda x: x['tr_day'] + i, rel_day=i) for i in range(-5, 6)])
+	            .merge(dsi_df, on='tr_day', how='left')
+	            .merge(dsf_df, on=['gvkey', 'date'], how='left')
+	            .sort_values(by=['MSCAD_ID', 'date'])
+	            .assign(ar=lambda x: x['ret'] - x['vwretd'],
+	                    car=lambda x: x.groupby(['MSCAD_ID'])['ar'].cumsum())
+	            .sort_values(by=['MSCAD_ID', 'rel_day'])
+	            .filter(['MSCAD_ID', 'rel_day', 'date', 'ar', 'car'])
+	            .astype({'date': 'datetime64[ns]'})
+	            .reset_index(drop=True)
+	            )
+	out_df = (study
+	          .paths(events_df[['MSCAD_ID', 'gvkey', 'date']], 'date', -5, 5)
+	          .sort_values(by=['MSCAD_ID', 'rel_day'])
+	          .filter(['MSCAD_ID', 'rel_day', 'date', 'ar', 'car'])
+	          .astype({'date': 'datetime64[ns]'})
+	          .reset_index(drop=True)
+	          )
+	pd.testing.assert_frame_equal(out_df, expected, check_dtype=False, atol=1e-12)
+
+	# MVE the trading day before the window
+	expected = (anchors_df
+	            .assign(tr_day=lambda x: x['tr_day'] - 6)
+	            .merge(dsi_df, on='tr_day', how='left')
+	            .merge(dsf_df, on=['gvkey', 'date'], how='left')
+	            .set_index('MSCAD_ID')['MVE']
+	            .reindex(events_df['MSCAD_ID'])
+	            )
+	np.testing.assert_array_equal(study.value_at(events_df, 'date', -6, 'MVE').to_numpy(), expected.to_numpy())
+
+
+def test_delay_to_filing_trdays():
+
+	dsi_df, dsf_df, events_df = _data()
+	study = EventStudy(dsi_df, dsf_df, id_col='gvkey')
+
+	# delay_to_filing_trdays of 7b: dsi days from CPE to filing, less one
+	expected = [len(dsi_df.query('@cpe <= date and date <= @fil')) - 1
+	            for cpe, fil in zip(events_df['date'], events_df['FILING_DATE'])]
+	delay = study.calendar.trading_days_between(events_df['date'], events_df['FILING_DATE']) - 1
+
+	np.testing.assert_array_equal(delay, expected)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from litrep.fundamentals import Fundamentals
+
+
+def _comp():
+
+	rng = np.random.default_rng(0)
+	# Yearly fiscal year ends with some fiscal year-end changes and missing years
+	comp_df = (pd.DataFrame({'gvkey': np.repeat(np.arange(1, 31), 10), 'fyear': np.tile(np.arange(1995, 2005), 30)})
+	           .assign(month=lambda x: np.where((x['gvkey'] % 5 == 0) & (x['fyear'] >= 2000), 9,
+	                                            np.where(x['gvkey'] % 3 == 0, 6, 12)),
+	                   datadate=lambda x: (pd.to_datetime({'year': x['fyear'], 'month': x['month'], 'day': 1})
+	                                       + pd.offsets.MonthEnd(0)),
+	                   at=lambda x: rng.lognormal(5, 1, len(x)),
+	                   roa=lambda x: rng.normal(0, 0.1, len(x)))
+	           .drop(['month'], axis=1)
+	           .sample(frac=0.85, random_state=0)
+	           .reset_index(drop=True))
+	return comp_df
+
+
+def test_lookup_matches_datadate_range_join():
+
+	comp_df = _comp()
+	rng = np.random.default_rng(1)
+	panel_df = pd.DataFrame({'gvkey': rng.integers(0, 32, 1000),
+	                         'date': pd.Timestamp('1995-01-01') + pd.to_timedelta(rng.integers(0, 3900, 1000), unit='D')})
+	panel_df = panel_df.assign(row=lambda x: range(0, len(x)))
+
+	# Scripts 2 / 8b before: next year's datadate (or 12 months), prior year columns, then a merge on gvkey and a query
+	ref_df = (comp_df
+	          .merge(comp_df[['gvkey', 'fyear', 'datadate']]
+	                 .assign(fyear=lambda x: x['fyear']-1)
+	                 .rename(columns={'datadate': 'ny_datadate'}),
+	                 on=['gvkey', 'fyear'], how='left')
+	          .assign(ny_datadate=lambda x: x['ny_datadate'].fillna(x['datadate'] + pd.offsets.DateOffset(months=12)))
+	          .merge(comp_df[['gvkey', 'fyear', 'at', 'roa', 'datadate']]
+	                 .assign(fyear=lambda x: x['fyear']+1)
+	                 .rename(columns={'at': 'py_at', 'roa': 'py_roa', 'datadate': 'py_datadate'}),
+	                 on=['gvkey', 'fyear'], how='left'))
+	expected = (panel_df
+	            .merge(ref_df, on=['gvkey'], how='left')
+	            .query('datadate <= date and date < ny_datadate'))
+	assert not expected['row'].duplicated().any()
+	expected = expected.set_index('row').reindex(panel_df['row'])
+
+	columns = ['fyear', 'datadate', 'at', 'py_at', 'py_roa', 'py_datadate']
+	out_df = Fundamentals(comp_df).lookup(panel_df, 'date', columns)
+	for col in columns:
+		np.testing.assert_array_equal(out_df[col].to_numpy(), expected[col].to_numpy(), err_msg=col)
+
+	inner_df = Fundamentals(comp_df).lookup(panel_df, 'date', columns, how='inner')
+	np.testing.assert_array_equal(inner_df['row'], expected.dropna(subset=['fyear']).index)
+
+
+def test_assign_sees_prior_and_next_year_columns():
+
+	comp_df = _comp()
+	funda = Fundamentals(comp_df).assign(at_gr=lambda x: x['at'] / x['py_at'] - 1)
+
+	expected = (comp_df
+	            .merge(comp_df[['gvkey', 'fyear', 'at']].assign(fyear=lambda x: x['fyear']+1), on=['gvkey', 'fyear'],
+	                   how='left', suffixes=['', '_py'])
+	            .assign(at_gr=lambda x: x['at'] / x['at_py'] - 1))
+	np.testing.assert_array_equal(funda['at_gr'].to_numpy(), expected['at_gr'].to_numpy())
+
+	expected = comp_df.merge(comp_df[['gvkey', 'fyear', 'at']].assign(fyear=lambda x: x['fyear']-1), on=['gvkey', 'fyear'],
+	                         how='left', suffixes=['', '_ny'])
+	np.testing.assert_array_equal(funda['ny_at'].to_numpy(), expected['at_ny'].to_numpy())
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from litrep.industries import BHAGAT, FF48, RangeTable, classify, dummies, sic2
+
+
+def _siccd():
+
+	rng = np.random.default_rng(0)
+	siccd = pd.Series(rng.integers(100, 9999, 5000).astype('float64'))
+	# Every range edge and missing codes
+	edges = [b for rs in FF48.values() for lower, upper in rs for b in (lower - 1, lower, upper, upper + 1)]
+	return pd.concat([siccd, pd.Series(edges, dtype='float64'), pd.Series([np.nan] * 5)], ignore_index=True)
+
+
+def test_fps_and_bhagat_match_where_chains():
+
+	x = pd.DataFrame({'siccd': _siccd()})
+	# '1. KS Litigation Risk.py' before
+	expected = (x
+	            .assign(FPS = lambda x: np.where( ( (2833<=x["siccd"]) & (x["siccd"]<=2836) ) |
+	                                              ( (8731<=x["siccd"]) & (x["siccd"]<=8734) ) |
+	                                              ( (3570<=x["siccd"]) & (x["siccd"]<=3577) ) |
+	                                              ( (7370<=x["siccd"]) & (x["siccd"]<=7374) ) |
+	                                              ( (3600<=x["siccd"]) & (x["siccd"]<=3674) ) |
+	                                              ( (5200<=x["siccd"]) & (x["siccd"]<=5961) ) ,
+	                                              1,0),
+	                    Biotech=lambda x: np.where( (2833 <= x['siccd']) & (x['siccd'] <= 2836), 1, 0),
+	                    CompHrdw=lambda x: np.where( (3570 <= x['siccd']) & (x['siccd'] <= 3577), 1, 0),
+	                    Electronics=lambda x: np.where( (3600 <= x['siccd']) & (x['siccd'] <= 3674), 1, 0),
+	                    Retail=lambda x: np.where( (5200 <= x['siccd']) & (x['siccd'] <= 5961), 1, 0),
+	                    CompSoft=lambda x: np.where( (7371 <= x['siccd']) & (x['siccd'] <= 7379), 1, 0))
+	            )
+
+	np.testing.assert_array_equal(classify(x['siccd'], 'fps'), expected['FPS'])
+	pd.testing.assert_frame_equal(dummies(x['siccd'], 'bhagat'), expected[list(BHAGAT)], check_dtype=False)
+
+
+def test_sic2_matches_floor_division():
+
+	siccd = _siccd()
+	np.testing.assert_array_equal(sic2(siccd), siccd // 100)
+	np.testing.assert_array_equal(classify(siccd, 'sic2'), siccd // 100)
+
+
+def test_ff48_matches_range_scan():
+
+	siccd = _siccd()
+	expected = pd.Series(48.0, index=siccd.index).where(siccd.notnull())
+	for industry, ranges in FF48.items():
+		for lower, upper in ranges:
+			expected[(lower <= siccd) & (siccd <= upper)] = industry
+
+	np.testing.assert_array_equal(classify(siccd, 'ff48'), expected)
+
+
+def test_overlapping_ranges_are_rejected():
+
+	with pytest.raises(ValueError):
+		RangeTable({'A': [(100, 199)], 'B': [(150, 250)]})
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from litrep.intervals import interval_join
+
+
+def _tables():
+
+	rng = np.random.default_rng(0)
+	day = pd.Timestamp('2000-01-01')
+	left = pd.DataFrame({'gvkey': rng.integers(0, 20, 300).astype('float64'),
+	                     'date': day + pd.to_timedelta(rng.integers(0, 400, 300), unit='D')})
+	lower = day + pd.to_timedelta(rng.integers(0, 400, 500), unit='D')
+	right = pd.DataFrame({'gvkey': rng.integers(0, 20, 500).astype('float64'),
+	                      'lower': lower,
+	                      'upper': lower + pd.to_timedelta(rng.integers(0, 60, 500), unit='D'),
+	                      'value': np.arange(500)})
+	# Missing keys and dates never match
+	left.loc[:4, 'gvkey'] = np.nan
+	right.loc[:4, 'upper'] = pd.NaT
+	return left, right
+
+
+def test_matches_merge_and_filter():
+
+	left, right = _tables()
+	bounds = {'both': ('>=', '<='), 'left': ('>=', '<'), 'right': ('>', '<='), 'neither': ('>', '<')}
+
+	for closed, (lo_op, hi_op) in bounds.items():
+		expected = (left
+		            .reset_index()
+		            .merge(right, on=['gvkey'], how='inner')
+		            .query(f'date {lo_op} lower and date {hi_op} upper')
+		            .sort_values(by=['index', 'lower', 'value'])
+		            .drop(['index'], axis=1)
+		            .reset_index(drop=True))
+		out_df = interval_join(left, right, 'date', 'lower', 'upper', on='gvkey', closed=closed, how='inner')
+
+		# Left row order, then lower bound
+		pd.testing.assert_frame_equal(out_df, expected, check_dtype=False)
+
+
+def test_left_join_keeps_one_match_per_row():
+
+	left, right = _tables()
+	out_df = interval_join(left, right, 'date', 'lower', 'upper', on='gvkey', keep='first')
+
+	expected = (left
+	            .reset_index()
+	            .merge(right, on=['gvkey'], how='inner')
+	            .query('date >= lower and date <= upper')
+	            .sort_values(by=['index', 'lower', 'value'])
+	            .drop_duplicates(subset=['index'], keep='first')
+	            .set_index('index')
+	            .reindex(left.index))
+
+	assert len(out_df) == len(left)
+	np.testing.assert_array_equal(out_df['value'].to_numpy(dtype='float64'), expected['value'].to_numpy(dtype='float64'))
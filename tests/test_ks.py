@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from litrep.ks import MonthlyReturns
+
+
+def _crsp():
+
+	rng = np.random.default_rng(0)
+	month_ends = pd.date_range('1995-01-31', '1999-12-31', freq='ME')
+	# Dates are the last trading day of the month, as in msf / msi
+	msf_df = (pd.DataFrame({'permno': np.arange(1, 7)})
+	          .merge(pd.DataFrame({'month': month_ends}), how='cross')
+	          .sample(frac=0.9, random_state=0)
+	          .assign(date=lambda x: x['month'] - pd.to_timedelta(rng.integers(0, 3, len(x)), unit='D'),
+	                  ret=lambda x: rng.normal(0.01, 0.1, len(x)),
+	                  vol=lambda x: rng.integers(1000, 5000, len(x)).astype('float64'),
+	                  cfacshr=lambda x: rng.choice([1.0, 2.0], len(x)),
+	                  shrout=lambda x: rng.integers(100, 500, len(x)).astype('float64'),
+	                  prc=lambda x: rng.normal(20, 5, len(x)))
+	          .drop(['month'], axis=1)
+	          .sort_values(by=['permno', 'date'])
+	          .reset_index(drop=True))
+	for col, frac in [('ret', 0.05), ('cfacshr', 0.1), ('shrout', 0.05), ('vol', 0.05)]:
+		msf_df.loc[msf_df.sample(frac=frac, random_state=1).index, col] = np.nan
+	msi_df = pd.DataFrame({'date': month_ends, 'vwretd': rng.normal(0.01, 0.04, len(month_ends))})
+	return msf_df, msi_df
+
+
+def _groupby(windows_df, msf_df, msi_df):
+
+	# '1. KS Litigation Risk.py' before: each window expanded to month ends, msf / msi merged in and summarized
+	months = [pd.DataFrame({'window': w, 'permno': p, 'date': pd.date_range(s, e, freq='ME')})
+	          for w, p, s, e in windows_df[['window', 'permno', 'start', 'end']].itertuples(index=False)]
+	ts_df = (pd.concat(months)
+	         .merge(msf_df.assign(date=lambda x: x['date'] + pd.offsets.MonthEnd(0),
+	                              dollar_turnover=lambda x: x['prc'].abs() * x['vol']), on=['permno', 'date'], how='inner')
+	         .merge(msi_df.assign(date=lambda x: x['date'] + pd.offsets.MonthEnd(0)), on=['date'], how='left'))
+	shr_df = (ts_df
+	          .filter(['window', 'date', 'cfacshr', 'shrout'])
+	          .sort_values(by=['window', 'date'])
+	          .dropna()
+	          .drop_duplicates(subset=['window'], keep='first')
+	          .rename(columns={'cfacshr': 'startingcfacshr', 'shrout': 'startingshrout'})
+	          .drop(['date'], axis=1))
+	ts_df = (ts_df
+	         .assign(ret_adj=lambda x: x['ret'] - x['vwretd'],
+	                 log_ret=lambda x: np.log(1 + x['ret']),
+	                 log_vwretd=lambda x: np.log(1 + x['vwretd']))
+	         .merge(shr_df, on=['window'], how='left')
+	         .assign(vol=lambda x: np.where(x['cfacshr'] != x['startingcfacshr'],
+	                                        x['vol'] * (x['cfacshr'] / x['startingcfacshr']), x['vol']))
+	         .assign(turnover=lambda x: x['vol'] / (10 * x['startingshrout']),
+	                 dollar_turnover_sc=lambda x: x['dollar_turnover'] / (x['startingshrout'] * 1000))
+	         .groupby(['window'])
+	         .agg(car=('ret_adj', 'sum'), sum_log_ret=('log_ret', 'sum'), sum_log_vwretd=('log_vwretd', 'sum'),
+	              std_ret=('ret', 'std'), ret_skewness=('ret', 'skew'), turnover=('turnover', 'sum'),
+	              dollar_turnover_sc=('dollar_turnover_sc', 'sum'))
+	         .assign(bhar=lambda x: np.exp(x['sum_log_ret']) - np.exp(x['sum_log_vwretd'])))
+
+	return ts_df.reindex(windows_df['window'])
+
+
+def test_window_matches_monthly_groupby():
+
+	msf_df, msi_df = _crsp()
+	rng = np.random.default_rng(1)
+	# Fiscal-year windows, short windows (std / skewness need 2 / 3 months) and a permno without data
+	start = pd.Timestamp('1995-01-01') + pd.to_timedelta(rng.integers(0, 1700, 300), unit='D')
+	windows_df = pd.DataFrame({'window': range(0, 300),
+	                           'permno': rng.integers(1, 8, 300),
+	                           'start': start,
+	                           'end': start + pd.to_timedelta(rng.choice([20, 45, 75, 364], 300), unit='D')})
+
+	out_df = MonthlyReturns(msf_df, msi_df).window(windows_df['permno'], windows_df['start'], windows_df['end'])
+	expected = _groupby(windows_df, msf_df, msi_df)
+
+	assert expected['car'].notnull().sum() > 200
+	for col in ['car', 'bhar', 'std_ret', 'ret_skewness', 'turnover', 'dollar_turnover_sc']:
+		np.testing.assert_allclose(out_df[col].to_numpy(), expected[col].to_numpy(), rtol=1e-8, atol=1e-12, err_msg=col)
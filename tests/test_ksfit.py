@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+
+from litrep import ksfit
+
+
+def _design():
+
+	rng = np.random.default_rng(0)
+	n = 3000
+	df = pd.DataFrame(rng.normal(size=(n, len(ksfit.TERMS))), columns=ksfit.TERMS)
+	df['fyear'] = rng.integers(2000, 2010, n)
+	index = -3 + df[ksfit.TERMS].to_numpy() @ rng.normal(0, 0.5, len(ksfit.TERMS))
+	return df.assign(sued=(rng.random(n) < 1 / (1 + np.exp(-index))).astype('int64'))
+
+
+def test_fit_matches_statsmodels_logit():
+
+	design_df = _design()
+	coef_df = ksfit.fit(design_df)
+
+	result = sm.Logit(design_df['sued'], sm.add_constant(design_df[ksfit.TERMS])).fit(disp=0)
+	np.testing.assert_allclose(coef_df['coef'], result.params.to_numpy(), rtol=1e-6)
+	np.testing.assert_allclose(coef_df['se'], result.bse.to_numpy(), rtol=1e-6)
+	assert coef_df['converged'].all()
+
+
+def test_rolling_fits_use_prior_years_only():
+
+	design_df = _design()
+	rolling_df = ksfit.fit_rolling(design_df, years=[2006, 2008], window=3)
+
+	for year in [2006, 2008]:
+		expected = ksfit.fit(design_df[design_df['fyear'].between(year - 3, year - 1)])
+		np.testing.assert_allclose(rolling_df.query(f'fyear == {year}')['coef'], expected['coef'])
+
+
+def test_design_sued_in_fiscal_year():
+
+	features_df = pd.DataFrame({'gvkey': ['001000', '001000', '002000'],
+	                            'fyear': [2001, 2002, 2001],
+	                            'datadate_py': pd.to_datetime(['2000-12-31', '2001-12-31', '2000-06-30']),
+	                            'datadate': pd.to_datetime(['2001-12-31', '2002-12-31', '2001-06-30'])})
+	features_df[ksfit.TERMS] = 1.0
+	# A filing on a datadate belongs to the year ending then, not to the next one
+	filings_df = pd.DataFrame({'GVKEY': [1000, 2000, 2000, 3000],
+	                           'FILING_DATE': pd.to_datetime(['2001-12-31', '2000-06-30', '2001-06-30', '2001-03-01'])})
+
+	design_df = ksfit.design(features_df, filings_df, gvkey='GVKEY')
+
+	assert design_df['sued'].tolist() == [1, 0, 1]
+
+
+def test_fitted_model_needs_the_table(tmp_path):
+
+	with pytest.raises(FileNotFoundError):
+		ksfit.load_coefficients(tmp_path / 'missing.gzip', 'rolling')
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from litrep.linktable import LinkResolver
+
+
+def _links():
+
+	rng = np.random.default_rng(0)
+	day = pd.Timestamp('2000-01-01')
+	# Several links per gvkey, overlapping, with permnos shared across gvkeys
+	linkdt = day + pd.to_timedelta(rng.integers(0, 300, 40), unit='D')
+	return pd.DataFrame({'gvkey': rng.integers(0, 10, 40),
+	                     'permno': rng.integers(100, 115, 40),
+	                     'linkdt': linkdt,
+	                     'linkenddt': linkdt + pd.to_timedelta(rng.integers(0, 120, 40), unit='D')})
+
+
+def _daily(links_df):
+
+	# The daily link panel the scripts merged on (one row per link and calendar day)
+	days = (links_df['linkenddt'] - links_df['linkdt']).dt.days.to_numpy() + 1
+	return pd.DataFrame({'gvkey': np.repeat(links_df['gvkey'].to_numpy(), days),
+	                     'permno': np.repeat(links_df['permno'].to_numpy(), days),
+	                     'date': np.repeat(links_df['linkdt'].to_numpy(), days)
+	                             + pd.to_timedelta(np.arange(days.sum()) - np.repeat(np.cumsum(days) - days, days), unit='D')})
+
+
+def _queries():
+
+	rng = np.random.default_rng(1)
+	df = pd.DataFrame({'gvkey': rng.integers(0, 12, 500).astype('float64'),
+	                   'permno': rng.integers(98, 117, 500).astype('float64'),
+	                   'date': pd.Timestamp('1999-12-01') + pd.to_timedelta(rng.integers(0, 480, 500), unit='D')})
+	df.loc[:4, 'gvkey'] = np.nan
+	df.loc[5:9, 'date'] = pd.NaT
+	return df
+
+
+def test_prefer_matches_sorted_daily_panel():
+
+	links_df = _links()
+	link = LinkResolver(links_df)
+	daily_df = _daily(links_df)
+	query_df = _queries()
+
+	for key, value, lookup in [('gvkey', 'permno', link.permno), ('permno', 'gvkey', link.gvkey)]:
+		merged = (query_df[[key, 'date']]
+		          .reset_index()
+		          .merge(daily_df[[key, value, 'date']], on=[key, 'date'], how='inner')
+		          .sort_values(by=['index', value]))
+		for prefer, keep in [('lowest', 'first'), ('highest', 'last')]:
+			expected = (merged
+			            .drop_duplicates(subset=['index'], keep=keep)
+			            .set_index('index')[value]
+			            .reindex(query_df.index))
+			out = lookup(query_df[key].to_numpy(), query_df['date'].to_numpy(), prefer)
+			np.testing.assert_array_equal(out, expected.to_numpy(dtype='float64'))
+
+
+def test_merge_all_matches_daily_panel_merge():
+
+	links_df = _links()
+	link = LinkResolver(links_df)
+	daily_df = _daily(links_df)
+	query_df = _queries()[['gvkey', 'date']].assign(row=lambda x: range(0, len(x)))
+
+	inner_df = link.merge_permno(query_df, prefer='all', how='inner')
+	expected = (query_df
+	            .merge(daily_df[['gvkey', 'permno', 'date']], on=['gvkey', 'date'], how='inner')
+	            .sort_values(by=['row', 'permno']))
+	np.testing.assert_array_equal(inner_df[['row', 'permno']].to_numpy(dtype='float64'),
+	                              expected[['row', 'permno']].to_numpy(dtype='float64'))
+
+	# Left merge: unmatched rows stay, in their original order
+	left_df = link.merge_permno(query_df, prefer='all', how='left')
+	assert left_df['row'].is_monotonic_increasing
+	assert set(left_df['row']) == set(query_df['row'])
+	assert len(left_df) == len(inner_df) + (~query_df['row'].isin(inner_df['row'])).sum()
+
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from litrep.matching import nearest_neighbours
+
+
+def _sorted_match(treated_df, controls_df):
+
+	# Matching as the scripts did it: sort the case x candidate table by distance and gvkey, keep the first row per case
+	return (treated_df
+	        .rename(columns={'d': 'sued_d'})
+	        .merge(controls_df, on=['MSCAD_ID'], how='inner')
+	        .assign(d_diff=lambda x: np.abs(x['d'] - x['sued_d']))
+	        .sort_values(by=['MSCAD_ID', 'd_diff', 'gvkey'])
+	        .drop_duplicates(subset=['MSCAD_ID'], keep='first')
+	        .filter(['MSCAD_ID', 'gvkey'])
+	        .reset_index(drop=True)
+	        )
+
+
+def test_treated_value_above_all_controls():
+
+	controls_df = pd.DataFrame({'MSCAD_ID': [0, 0, 1, 1], 'd': [1, 2, 1.5, 2.5], 'gvkey': [1, 2, 3, 4]})
+	treated_df = pd.DataFrame({'MSCAD_ID': [0, 1, 1, 1], 'd': [9, 3, 4, 5]})
+
+	match_df = nearest_neighbours(treated_df, controls_df, 'd', by=['MSCAD_ID'], control_id='gvkey')
+
+	assert match_df['treated'].tolist() == [0, 1, 2, 3]
+	assert match_df['gvkey'].tolist() == [2, 4, 4, 4]
+
+
+def test_matches_sort_and_drop_duplicates():
+
+	rng = np.random.default_rng(0)
+	for _ in range(300):
+		n_cases = rng.integers(1, 6)
+		controls_df = pd.DataFrame({'MSCAD_ID': rng.integers(0, n_cases, 20),
+		                            'd': rng.integers(0, 8, 20).astype('float64')})
+		controls_df['gvkey'] = rng.permutation(len(controls_df))
+		treated_df = pd.DataFrame({'MSCAD_ID': np.arange(n_cases), 'd': rng.integers(-3, 12, n_cases).astype('float64')})
+
+		match_df = (nearest_neighbours(treated_df, controls_df, 'd', by=['MSCAD_ID'], control_id='gvkey')
+		            .filter(['MSCAD_ID', 'gvkey'])
+		            .reset_index(drop=True))
+
+		pd.testing.assert_frame_equal(match_df, _sorted_match(treated_df, controls_df), check_dtype=False)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from litrep.panels import shift
+
+
+def _panel():
+
+	# Firm-years with gaps (a missing year must not give the year before)
+	rng = np.random.default_rng(0)
+	df = pd.DataFrame({'gvkey': np.repeat(np.arange(40), 8), 'fyear': np.tile(np.arange(2000, 2008), 40)})
+	df = df[rng.random(len(df)) < 0.7].sample(frac=1, random_state=0)
+	return df.assign(at=rng.normal(size=len(df)), sale=rng.normal(size=len(df)))
+
+
+def test_matches_shifted_merge():
+
+	df = _panel()
+
+	for k, suffix in [(1, '_py'), (2, '_lag2'), (-1, '_lead1')]:
+		expected = (df
+		            .merge(df[['gvkey', 'fyear', 'at', 'sale']].assign(fyear=lambda x: x['fyear'] + k),
+		                   on=['gvkey', 'fyear'], how='left', suffixes=['', suffix]))
+		out_df = shift(df, ['at', 'sale'], 'gvkey', 'fyear', k, suffix)
+
+		pd.testing.assert_frame_equal(out_df.reset_index(drop=True), expected)
+
+
+def test_inner_keeps_rows_with_all_periods():
+
+	df = _panel()
+	out_df = shift(df, 'at', 'gvkey', 'fyear', [1, 2], ['_py', '_py2'], how='inner')
+
+	expected = (df
+	            .merge(df[['gvkey', 'fyear', 'at']].assign(fyear=lambda x: x['fyear'] + 1), on=['gvkey', 'fyear'],
+	                   suffixes=['', '_py'])
+	            .merge(df[['gvkey', 'fyear', 'at']].assign(fyear=lambda x: x['fyear'] + 2).rename(columns={'at': 'at_py2'}),
+	                   on=['gvkey', 'fyear']))
+
+	pd.testing.assert_frame_equal(out_df.reset_index(drop=True), expected)
+
+
+def test_duplicated_periods_bring_in_the_first_row():
+
+	df = pd.DataFrame({'gvkey': [1, 1, 1, 2], 'Year': [2000, 2001, 2001, 2001], 'Industry': ['A', 'B', 'C', 'D']})
+	out_df = shift(df, 'Industry', 'gvkey', 'Year', -1, '_ny')
+
+	assert len(out_df) == len(df)
+	assert out_df['Industry_ny'].iloc[0] == 'B'
+	assert out_df['Industry_ny'].iloc[1:].isna().all()
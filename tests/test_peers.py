@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from litrep import arcube, wrds
+from litrep.arcube import ARCube
+from litrep.panels import expand
+from litrep.peers import IndustryPeers
+
+
+def _cube(loc):
+
+	rng = np.random.default_rng(0)
+	dates = pd.bdate_range('2000-01-03', '2001-06-29')
+	dsi_df = pd.DataFrame({'date': dates, 'vwretd': rng.normal(0, 0.01, len(dates))})
+	dsf_df = (pd.DataFrame({'permno': np.arange(10001, 10031)})
+	          .merge(dsi_df[['date']], how='cross')
+	          .sample(frac=0.8, random_state=0)
+	          .assign(ret=lambda x: rng.normal(0, 0.03, len(x)))
+	          .sort_values(by=['permno', 'date'])
+	          .reset_index(drop=True))
+	dsf_df.loc[dsf_df.sample(frac=0.05, random_state=1).index, 'ret'] = np.nan
+	dsi_df.to_parquet(wrds.table_path('crsp_dsi', loc, 'test'))
+	dsf_df.to_parquet(wrds.table_path('crsp_dsf', loc, 'test'))
+	arcube.build(start='2000-01-01', wrds_loc=loc, vintage='test', block_rows=7)
+
+	return ARCube.open(loc, 'test'), dsi_df, dsf_df
+
+
+def _names():
+
+	# Name histories with industry changes, gaps and missing codes (and a permno without returns)
+	rng = np.random.default_rng(2)
+	rows = []
+	for permno in list(range(10001, 10031)) + [77777]:
+		start = pd.Timestamp('1999-06-01')
+		while start < pd.Timestamp('2001-06-30'):
+			end = start + pd.Timedelta(days=int(rng.integers(30, 400)))
+			rows.append((permno, start, end, rng.choice([28, 35, 36, np.nan], p=[0.4, 0.3, 0.25, 0.05])))
+			start = end + pd.Timedelta(days=int(rng.choice([1, 1, 1, 40])))
+	return pd.DataFrame(rows, columns=['permno', 'namedt', 'nameendt', 'sic2'])
+
+
+def test_summed_is_zero_without_returns(tmp_path):
+
+	cube, dsi_df, dsf_df = _cube(tmp_path)
+	ar_df = dsf_df.merge(dsi_df, on=['date'], how='inner').assign(ar=lambda x: x['ret'] - x['vwretd'])
+
+	rng = np.random.default_rng(1)
+	start = pd.Timestamp('1999-12-20') + pd.to_timedelta(rng.integers(0, 560, 300), unit='D')
+	windows_df = pd.DataFrame({'window': range(0, 300),
+	                           'permno': rng.integers(10001, 10033, 300),
+	                           'start': start,
+	                           'end': start + pd.to_timedelta(rng.integers(-2, 20, 300), unit='D')})
+	expected = (windows_df
+	            .merge(ar_df, on=['permno'], how='inner')
+	            .query('start <= date and date <= end')
+	            .groupby(['window'])['ar'].sum()
+	            .reindex(windows_df['window'])
+	            .fillna(0)
+	            .where(windows_df['permno'].isin(dsf_df['permno']).to_numpy()))
+
+	out = cube.summed(windows_df['permno'], windows_df['start'], windows_df['end'])
+	np.testing.assert_allclose(out, expected, rtol=1e-6, atol=1e-7)
+
+
+def test_car_matches_daily_industry_panel(tmp_path):
+
+	cube, _, _ = _cube(tmp_path)
+	names_df = _names()
+	rng = np.random.default_rng(3)
+	end = pd.Timestamp('2000-02-01') + pd.to_timedelta(rng.integers(0, 480, 200), unit='D')
+	input_df = pd.DataFrame({'MSCAD_ID': range(0, 200),
+	                         'gvkey': range(0, 200),
+	                         'sic2': rng.choice([28, 35, 36, 99, np.nan], 200),
+	                         'start_date': end - pd.DateOffset(months=1) + pd.DateOffset(days=1),
+	                         'end_date': end})
+	# Cases sharing an industry and window
+	input_df.loc[[3, 4], ['sic2', 'start_date', 'end_date']] = input_df.loc[5, ['sic2', 'start_date', 'end_date']].to_numpy()
+
+	# '3a. Industry returns around CPE.py' before: every day of the window merged with the permnos in the industry that day.
+	# A missing sic2 is no industry (the merge used to pool the missing codes together)
+	names_ts_df = expand(names_df.dropna(subset=['sic2']), 'namedt', 'nameendt', 'D')
+	expected = (expand(input_df.dropna(subset=['sic2']), 'start_date', 'end_date', 'D')
+	            .merge(names_ts_df, on=['date', 'sic2'], how='inner')
+	            .assign(ar=lambda x: cube.values(x['permno'], x['date']))
+	            .groupby(['MSCAD_ID', 'gvkey', 'permno'], as_index=False)['ar'].sum()
+	            .groupby(['MSCAD_ID'])
+	            .agg(mean=('ar', 'mean'), median=('ar', 'median'), n=('ar', 'size'))
+	            .reindex(input_df['MSCAD_ID']))
+
+	out_df = IndustryPeers(names_df, cube).car(input_df, 'sic2', 'start_date', 'end_date')
+
+	assert expected['n'].notnull().sum() > 100
+	np.testing.assert_allclose(out_df['mean'], expected['mean'], rtol=1e-6, atol=1e-6)
+	np.testing.assert_allclose(out_df['median'], expected['median'], rtol=1e-6, atol=1e-6)
+	np.testing.assert_array_equal(out_df['n'], expected['n'].fillna(0))
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from litrep.quantiles import group_qcut
+
+
+def test_matches_qcut_within_groups():
+
+	rng = np.random.default_rng(0)
+	df = pd.DataFrame({'MSCAD_ID': np.repeat(np.arange(50), rng.integers(20, 60, 50))})
+	df['car'] = rng.normal(size=len(df))
+	df.loc[rng.random(len(df)) < 0.05, 'car'] = np.nan
+
+	for q in [2, 5, 20]:
+		expected = (df
+		            .groupby('MSCAD_ID')['car']
+		            .transform(lambda y: pd.qcut(y, q, labels=range(1, q + 1)).astype('float64'))
+		            .to_numpy())
+		np.testing.assert_array_equal(group_qcut(df['car'], df['MSCAD_ID'], q), expected)
+
+
+def test_repeated_edges():
+
+	values = pd.Series([1., 1., 1., 1., 2., 3.])
+	groups = pd.Series([0, 0, 0, 0, 0, 0])
+
+	with pytest.raises(ValueError):
+		group_qcut(values, groups, 4)
+
+	expected = pd.qcut(values, 4, labels=False, duplicates='drop').to_numpy() + 1
+	np.testing.assert_array_equal(group_qcut(values, groups, 4, duplicates='drop'), expected)
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from litrep.quarters import QuarterIndex
+
+
+def _fundq():
+
+	rng = np.random.default_rng(0)
+	# Quarters of 20 firms with missing quarters, missing rdq and mve, announced 20 to 60 days after the quarter end
+	fundq_df = (pd.DataFrame({'gvkey': np.repeat(np.arange(1, 21), 24), 'fyq': np.tile(np.arange(8000, 8024), 20)})
+	            .assign(datadate=lambda x: pd.to_datetime({'year': 2000 + (x['fyq'] - 8000) // 4,
+	                                                       'month': 3 * ((x['fyq'] - 8000) % 4) + 3, 'day': 1})
+	                                       + pd.offsets.MonthEnd(0),
+	                    rdq=lambda x: x['datadate'] + pd.to_timedelta(rng.integers(20, 60, len(x)), unit='D'),
+	                    mve=lambda x: rng.lognormal(5, 1, len(x)),
+	                    fyearq=lambda x: 2000 + (x['fyq'] - 8000) // 4)
+	            .sample(frac=0.9, random_state=0)
+	            .reset_index(drop=True))
+	fundq_df.loc[fundq_df.sample(frac=0.05, random_state=1).index, 'rdq'] = pd.NaT
+	fundq_df.loc[fundq_df.sample(frac=0.05, random_state=2).index, 'mve'] = np.nan
+	return fundq_df
+
+
+def _neighbours(fundq_df):
+
+	# '3c. Insider Trading.py' before
+	return (fundq_df
+	        .merge(fundq_df[['gvkey', 'fyq', 'mve', 'datadate', 'rdq']].assign(fyq=lambda x: x['fyq'] + 1),
+	               on=['gvkey', 'fyq'], how='left', suffixes=['', '_pq'])
+	        .merge(fundq_df[['gvkey', 'fyq', 'datadate']].assign(fyq=lambda x: x['fyq'] - 1),
+	               on=['gvkey', 'fyq'], how='left', suffixes=['', '_nq'])
+	        .assign(datadate_pq=lambda x: x['datadate_pq'].fillna(x['datadate'] - pd.DateOffset(months=3)),
+	                datadate_nq=lambda x: x['datadate_nq'].fillna(x['datadate'] + pd.DateOffset(months=3)) )
+	        .dropna(subset=['mve_pq', 'rdq_pq', 'rdq'])
+	        .reset_index(drop=True))
+
+
+def _events():
+
+	rng = np.random.default_rng(3)
+	return pd.DataFrame({'id': range(0, 600),
+	                     'gvkey': rng.integers(0, 22, 600),
+	                     'date': pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 2200, 600), unit='D')})
+
+
+def test_neighbouring_quarters_match_self_merges():
+
+	fundq_df = _fundq()
+	quarters = QuarterIndex(fundq_df, mve='mve', dropna=['mve_pq', 'rdq_pq', 'rdq'])
+	expected = _neighbours(fundq_df)
+
+	for col in ['gvkey', 'fyq', 'datadate', 'datadate_pq', 'datadate_nq', 'rdq_pq', 'mve_pq']:
+		np.testing.assert_array_equal(quarters[col].to_numpy(), expected[col].to_numpy(), err_msg=col)
+
+
+def test_containing_matches_merge_and_query():
+
+	fundq_df = _fundq()
+	quarters = QuarterIndex(fundq_df, mve='mve', dropna=['mve_pq', 'rdq_pq', 'rdq'])
+	events_df = _events()
+
+	expected = (events_df
+	            .merge(_neighbours(fundq_df), on=['gvkey'], how='inner')
+	            .query('rdq_pq <= date and date < rdq')
+	            # If multiple for whatever reason, keep the latest datadate
+	            .sort_values(by=['id', 'datadate'])
+	            .drop_duplicates(subset=['id'], keep='last')
+	            .reset_index(drop=True))
+	out_df = quarters.containing(events_df, 'date', columns=['datadate', 'mve_pq', 'rdq_pq', 'rdq', 'fyq'])
+
+	assert len(expected) > 100
+	pd.testing.assert_frame_equal(out_df, expected[out_df.columns], check_dtype=False)
+
+
+def test_containing_all_and_at_datadate_match_script_4():
+
+	# Windows long enough to overlap the next quarter's
+	fundq_df = _fundq().assign(nq_datadate=lambda x: x['datadate'] + pd.DateOffset(months=4))
+	quarters = QuarterIndex(fundq_df, fyq=None)
+	events_df = _events().assign(datadate=lambda x: x['date'] + pd.offsets.QuarterEnd(0))
+	temp_df = pd.merge(events_df, fundq_df, on=['gvkey'], how='left', suffixes=('_orig', '_q'))
+
+	# Post: rdq <= date <= nq_datadate, every such quarter
+	expected = (temp_df[(temp_df['rdq'] <= temp_df['date']) & (temp_df['date'] <= temp_df['nq_datadate'])]
+	            .sort_values(by=['id', 'datadate_q'], kind='stable'))
+	assert expected['id'].duplicated().any()
+	out_df = quarters.containing(events_df, 'date', lower='rdq', upper='nq_datadate', closed='both', columns=['mve', 'fyq'],
+	                             keep=None)
+	np.testing.assert_array_equal(out_df[['id', 'fyq']].to_numpy(dtype='float64'),
+	                              expected[['id', 'fyq']].to_numpy(dtype='float64'))
+
+	# Pre: the quarter ending on the datadate
+	expected = temp_df[temp_df['datadate_orig'] == temp_df['datadate_q']].sort_values(by=['id'], kind='stable')
+	assert len(expected) > 100
+	out_df = quarters.at_datadate(events_df, 'datadate', columns=['mve', 'fyq'])
+	np.testing.assert_array_equal(out_df[['id', 'fyq']].to_numpy(dtype='float64'),
+	                              expected[['id', 'fyq']].to_numpy(dtype='float64'))
+
+
+def test_announced_matches_daily_panel():
+
+	fundq_df = _fundq()
+	quarters = QuarterIndex(fundq_df)
+	panel_df = _events().assign(start_date=lambda x: x['date'] - pd.DateOffset(days=9), end_date=lambda x: x['date'])
+
+	# '3b. Negative Earnings Surprise.py' before: 10 days up to the end date, merged with the quarters on rdq
+	expected = (pd
+	            .concat([panel_df.assign(rdq=lambda x: x['end_date'] - pd.DateOffset(days=i)) for i in range(0, 10)])
+	            .merge(fundq_df[['gvkey', 'rdq', 'datadate']], on=['gvkey', 'rdq'], how='inner')
+	            .sort_values(by=['id', 'rdq', 'datadate']))
+	out_df = (quarters
+	          .announced(panel_df, 'start_date', 'end_date', columns=['rdq', 'datadate'])
+	          .sort_values(by=['id', 'rdq', 'datadate']))
+
+	assert len(expected) > 50
+	np.testing.assert_array_equal(out_df[['id', 'rdq', 'datadate']].to_numpy(), expected[['id', 'rdq', 'datadate']].to_numpy())
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from litrep.linktable import LinkResolver
+from litrep.rangemax import RangeMax
+
+
+def _dsf():
+
+	rng = np.random.default_rng(0)
+	dates = pd.bdate_range('2000-01-03', '2001-12-31')
+	dsf_df = (pd.DataFrame({'permno': np.arange(100, 112)})
+	          .merge(pd.DataFrame({'date': dates}), how='cross')
+	          .sample(frac=0.9, random_state=0)
+	          .assign(MVE=lambda x: rng.lognormal(5, 1, len(x))))
+	dsf_df.loc[dsf_df.sample(frac=0.05, random_state=1).index, 'MVE'] = np.nan
+	return dsf_df
+
+
+def _windows():
+
+	rng = np.random.default_rng(1)
+	start = pd.Timestamp('1999-12-01') + pd.to_timedelta(rng.integers(0, 760, 400), unit='D')
+	windows_df = pd.DataFrame({'permno': rng.integers(98, 114, 400).astype('float64'),
+	                           'start': start,
+	                           'end': start + pd.to_timedelta(rng.integers(-3, 200, 400), unit='D')})
+	windows_df.loc[:3, 'end'] = pd.NaT
+	return windows_df
+
+
+def test_max_matches_groupby_max():
+
+	dsf_df = _dsf()
+	windows_df = _windows().assign(window=lambda x: range(0, len(x)))
+	expected = (windows_df
+	            .merge(dsf_df, on=['permno'], how='inner')
+	            .query('start <= date and date <= end')
+	            .groupby(['window'])
+	            .agg(Max_MVE=('MVE', 'max'), n_days=('date', 'count'))
+	            .reindex(windows_df['window']))
+
+	# Small blocks so that windows run within one block, across two and across many
+	for block in [1, 3, 8, 64]:
+		mve_index = RangeMax(dsf_df, 'permno', 'MVE', block=block)
+		np.testing.assert_array_equal(mve_index.max(windows_df['permno'], windows_df['start'], windows_df['end']),
+		                              expected['Max_MVE'].to_numpy())
+		np.testing.assert_array_equal(mve_index.count(windows_df['permno'], windows_df['start'], windows_df['end']),
+		                              expected['n_days'].fillna(0).to_numpy())
+
+
+def test_class_period_max_mve_matches_daily_panel():
+
+	rng = np.random.default_rng(2)
+	linkdt = pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 600, 30), unit='D')
+	links_df = pd.DataFrame({'gvkey': rng.integers(0, 8, 30),
+	                         'permno': rng.integers(100, 112, 30),
+	                         'linkdt': linkdt,
+	                         'linkenddt': linkdt + pd.to_timedelta(rng.integers(0, 200, 30), unit='D')})
+	link = LinkResolver(links_df)
+	dsf_df = _dsf()
+	start = pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 600, 60), unit='D')
+	dmg_df = pd.DataFrame({'MSCAD_ID': range(0, 60),
+	                       'gvkey': rng.integers(0, 8, 60),
+	                       'start_date': start,
+	                       'end_date': start + pd.to_timedelta(rng.integers(0, 150, 60), unit='D')})
+
+	# Scripts 2 / 8b before: a daily panel of each period, the lowest permno on each day, then a groupby max
+	days = (dmg_df['end_date'] - dmg_df['start_date']).dt.days.to_numpy() + 1
+	expected = (dmg_df
+	            .iloc[np.repeat(np.arange(len(dmg_df)), days)]
+	            .assign(date=lambda x: x['start_date'] + pd.to_timedelta(np.arange(days.sum())
+	                                                                      - np.repeat(np.cumsum(days) - days, days), unit='D'))
+	            .pipe(link.merge_permno, 'date')
+	            .merge(dsf_df, on=['permno', 'date'], how='inner')
+	            .groupby(['MSCAD_ID', 'end_date'], as_index=False).agg(Max_MVE=('MVE', 'max')))
+
+	mve_index = RangeMax(dsf_df, 'permno', 'MVE', block=8)
+	out_df = (dmg_df
+	          .pipe(link.permno_spans, 'start_date', 'end_date')
+	          .assign(Max_MVE=lambda x: mve_index.max(x['permno'], x['span_start'], x['span_end']),
+	                  n_days=lambda x: mve_index.count(x['permno'], x['span_start'], x['span_end']))
+	          .query('n_days > 0')
+	          .groupby(['MSCAD_ID', 'end_date'], as_index=False).agg(Max_MVE=('Max_MVE', 'max')))
+
+	pd.testing.assert_frame_equal(out_df, expected)